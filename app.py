@@ -1,27 +1,19 @@
-import PIL
 import streamlit as st
 from PIL import Image
 import settings 
 import helper   
 import database   
+import metrics
+import history_export
 from zoneinfo import ZoneInfo
 from pathlib import Path
 import time     
-import av       
 import re
 import threading
 import queue
-from datetime import datetime
-import streamlit_webrtc
-
-# Import komponen dari streamlit-webrtc
-from streamlit_webrtc import (
-    VideoTransformerBase,
-    webrtc_streamer,
-    WebRtcMode,
-)
+from datetime import datetime, timedelta
 
-# Impor library yang diperlukan untuk komunikasi antar-thread
+# Modul berat (ultralytics, av, streamlit_webrtc, pandas) baru di-import di halaman yang membutuhkannya
 
 
 # --- Konfigurasi Halaman dan Pemuatan Model ---
@@ -32,22 +24,35 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Inisialisasi database
+# Inisialisasi database (sekali per proses, bukan setiap rerun)
+@st.cache_resource
+def init_database_cached():
+    with helper.timed_phase("inisialisasi database"):
+        database.init_db()
+    return True
+
 try:
-    database.init_db()
+    init_database_cached()
 except Exception as e:
     st.sidebar.warning(f"Tidak dapat menginisialisasi DB (mungkin sudah ada).")
 
-
+# Endpoint /metrics dan/atau file metrik Prometheus (sekali per proses, jika diatur di settings)
 @st.cache_resource
-def load_model_cached():
-    model = helper.load_yolo_model()
+def start_metrics_exporter_cached():
+    metrics.start_metrics_exporter()
+    return True
+
+start_metrics_exporter_cached()
+
+
+def load_model(model_name=settings.DEFAULT_MODEL_NAME):
+    """Memuat model dari registry di helper (model yang sudah dimuat tetap tersimpan di memori)."""
+    # Semua pilihan, termasuk model default, lewat use_model agar model aktif dan namanya selalu sinkron
+    model = helper.use_model(model_name)
     if model is None:
         st.error("Model YOLOv11 gagal dimuat. Periksa path model dan instalasi library yang dibutuhkan (misal: ultralytics).")
     return model
 
-MODEL = load_model_cached()
-
 
 # --- Controller untuk Menyimpan Frame dari Webcam ---
 class FrameSaveController:
@@ -213,58 +218,11 @@ st.sidebar.markdown('<div class="sidebar-header-custom"><h2>👷 SiDetek APD</h2
 
 page = st.sidebar.selectbox(
     "Pilih Halaman Navigasi:",
-    ["🏠 Beranda", "🔎 Deteksi APD", "📜 Riwayat Deteksi"],
+    ["🏠 Beranda", "🔎 Deteksi APD", "🎥 Multi Kamera", "📜 Riwayat Deteksi", "📈 Tren Kepatuhan"],
     key='page_selector'
 )
 
 
-# --- Kelas VideoTransformer ---
-class APDVideoTransformer(VideoTransformerBase):
-
-    # Modifikasi __init__ untuk menerima controller
-    def __init__(self, controller, confidence_threshold=0.35):
-        self.confidence_threshold = confidence_threshold
-        self.model = MODEL
-        self.controller = controller # Simpan instance controller
-
-    def update_confidence(self, new_confidence):
-        self.confidence_threshold = new_confidence
-
-    def recv(self, frame: av.VideoFrame) -> av.VideoFrame:
-        image_np_bgr = frame.to_ndarray(format="bgr24")
-
-        if self.model is None:
-            return frame
-
-        try:
-            image_np_rgb = image_np_bgr[:, :, ::-1] # Konversi BGR ke RGB
-            image_pil = Image.fromarray(image_np_rgb)
-
-            result_image_pil, detections = helper.perform_detection(
-                image_pil,
-                self.confidence_threshold
-            )
-
-            # Periksa apakah ada permintaan untuk menyimpan frame
-            if self.controller.check_and_reset_request():
-                frame_name = f"Webcam Capture {datetime.now(ZoneInfo('Asia/Jakarta')).strftime('%Y-%m-%d %H_%M_%S')}.png"
-
-                # Panggil fungsi helper untuk menyimpan ke DB
-                saved_record = helper.save_detection_to_db(
-                    original_image_name=frame_name,
-                    original_image_pil=image_pil,       
-                    detected_image_pil=result_image_pil,
-                    detections_data_list=detections
-                )
-                self.controller.result_queue.put(saved_record)
-
-            return av.VideoFrame.from_image(result_image_pil)
-
-        except Exception as e:
-            print(f"Error processing webcam frame in APDVideoTransformer.recv: {e}")
-            return frame
-
-
 # --- Konten Halaman ---
 
 if page == "🏠 Beranda":
@@ -290,12 +248,12 @@ if page == "🏠 Beranda":
 
     with col1:
         default_image_path = str(settings.DEFAULT_IMAGE)
-        default_image = PIL.Image.open(default_image_path)
+        default_image = Image.open(default_image_path)
         st.image(default_image_path, caption="Uploaded Image", use_container_width=True)
     
     with col2:
         default_detected_image_path = str(settings.DEFAULT_DETECT_IMAGE)
-        default_detected_image = PIL.Image.open(default_detected_image_path)
+        default_detected_image = Image.open(default_detected_image_path)
         st.image(default_detected_image_path, caption='Detected Image', use_container_width=True)
 
 
@@ -309,14 +267,122 @@ elif page == "🔎 Deteksi APD":
         key="source_type_selector_radio"
     )
     st.sidebar.markdown("---")
+    selected_model_name = settings.DEFAULT_MODEL_NAME
+    if len(settings.MODEL_WEIGHTS) > 1:
+        selected_model_name = st.sidebar.selectbox("🧠 Model Deteksi", list(settings.MODEL_WEIGHTS), key="model_selector")
+    with st.spinner("⏳ Memuat model deteksi..."):
+        MODEL = load_model(selected_model_name)
     confidence_thresh_slider = st.sidebar.slider("🎯 Ambang Kepercayaan Deteksi (%)", 0, 100, 40, 5) / 100
+    if source_type == "📹 Deteksi Realtime via Webcam":
+        webcam_mode_labels = {
+            settings.WEBCAM_MODE_LATEST_FRAME: "⚡ Frame Terbaru (buang frame usang)",
+            settings.WEBCAM_MODE_TRACKING: "🎯 Deteksi Tiap N Frame + Tracking",
+            settings.WEBCAM_MODE_EVERY_FRAME: "🐢 Deteksi Setiap Frame",
+        }
+        webcam_mode = st.sidebar.radio(
+            "Mode Pemrosesan Webcam:",
+            list(webcam_mode_labels),
+            index=list(webcam_mode_labels).index(settings.WEBCAM_DEFAULT_MODE),
+            format_func=webcam_mode_labels.get,
+            help="Perubahan mode berlaku setelah kamera dimulai ulang (STOP lalu START).",
+            key="webcam_mode_selector"
+        )
+        target_fps_slider = st.sidebar.slider(
+            "🎞️ Target FPS Inferensi", 1, settings.WEBCAM_MAX_TARGET_FPS,
+            settings.WEBCAM_DEFAULT_TARGET_FPS, 1,
+            disabled=webcam_mode == settings.WEBCAM_MODE_EVERY_FRAME
+        )
+        detect_interval_option = st.sidebar.select_slider(
+            "🔁 Interval Deteksi (frame)",
+            options=["Adaptif"] + list(range(1, settings.WEBCAM_MAX_DETECT_INTERVAL + 1)),
+            value="Adaptif",
+            disabled=webcam_mode != settings.WEBCAM_MODE_TRACKING
+        )
+        detect_interval = None if detect_interval_option == "Adaptif" else detect_interval_option
 
     if source_type == "🖼️ Unggah Gambar":
         st.subheader("🖼️ Unggah Gambar Pekerja Konstruksi")
-        uploaded_image_file = st.file_uploader(
+        tiled_mode_label = st.sidebar.selectbox(
+            "🧩 Inferensi Tile (foto resolusi tinggi)",
+            ["Otomatis", "Selalu", "Nonaktif"],
+            help=f"Mode otomatis aktif jika sisi terpanjang gambar melebihi {settings.TILED_INFERENCE_MIN_SIDE} px.",
+            key="tiled_mode_selector"
+        )
+        tiled_mode = {"Otomatis": None, "Selalu": True, "Nonaktif": False}[tiled_mode_label]
+        cache_stats_placeholder = st.sidebar.empty()
+        batch_size_slider = st.sidebar.slider(
+            "📦 Ukuran Batch Inferensi", 1, settings.DETECTION_MAX_BATCH_SIZE,
+            settings.DETECTION_BATCH_SIZE, 1
+        )
+        uploaded_image_files = st.file_uploader(
             "Seret & lepas file gambar di sini, atau klik untuk memilih (Format: JPG, JPEG, PNG)",
-            type=["jpg", "jpeg", "png"]
+            type=["jpg", "jpeg", "png"],
+            accept_multiple_files=True
         )
+        uploaded_image_file = uploaded_image_files[0] if len(uploaded_image_files) == 1 else None
+
+        if len(uploaded_image_files) > 1:
+            st.markdown(f"<div class='custom-card'><h5>{len(uploaded_image_files)} gambar siap dideteksi.</h5></div>", unsafe_allow_html=True)
+
+            if st.button("🚀 Mulai Deteksi APD pada Semua Gambar", key="detect_batch_button"):
+                if MODEL is None:
+                    st.error("⚠️ Model deteksi tidak berhasil dimuat. Tidak dapat melanjutkan.")
+                else:
+                    total_files = len(uploaded_image_files)
+                    progress_bar = st.progress(0, text="🕵️ Memulai deteksi batch...")
+                    results_container = st.container()
+                    batch_counts = {}
+                    pending_records = []
+                    saved_ids = []
+                    failed_names = []
+
+                    def flush_pending_records():
+                        record_ids = helper.save_detections_batch_to_db(pending_records)
+                        if record_ids is None:
+                            failed_names.extend(record[0] for record in pending_records)
+                        else:
+                            saved_ids.extend(record_ids)
+                        pending_records.clear()
+
+                    try:
+                        images_iter = (Image.open(f) for f in uploaded_image_files)
+                        for idx, original_image_pil, result_image_pil, detections in helper.perform_detection_batch(
+                            images_iter, confidence_thresh_slider, batch_size_slider
+                        ):
+                            file_name = uploaded_image_files[idx].name
+                            for det in detections:
+                                normalized_label = str(det['label']).strip().capitalize() or "Tidak_Diketahui"
+                                batch_counts[normalized_label] = batch_counts.get(normalized_label, 0) + 1
+
+                            with results_container:
+                                with st.expander(f"📌 {file_name} — {len(detections)} objek terdeteksi"):
+                                    st.image(result_image_pil, caption=file_name, use_container_width=True)
+                                    st.json(detections)
+
+                            pending_records.append((file_name, original_image_pil, result_image_pil, detections))
+                            if len(pending_records) >= batch_size_slider:
+                                flush_pending_records()
+                            progress_bar.progress((idx + 1) / total_files, text=f"🕵️ Memproses gambar {idx + 1}/{total_files}...")
+
+                        if pending_records:
+                            flush_pending_records()
+                        progress_bar.progress(1.0, text="✅ Deteksi batch selesai.")
+                    except Exception as e:
+                        st.error(f"Terjadi kesalahan saat memproses batch gambar: {e}")
+                        print(f"Error di halaman deteksi gambar (batch): {e}")
+
+                    if batch_counts:
+                        st.markdown("<div class='custom-card'><h3>📊 Ringkasan Hasil Deteksi Batch</h3></div>", unsafe_allow_html=True)
+                        cols_per_row = 3
+                        metric_cols = st.columns(cols_per_row)
+                        for item_idx, (lbl, count) in enumerate(batch_counts.items()):
+                            with metric_cols[item_idx % cols_per_row]:
+                                st.metric(label=lbl, value=count)
+
+                    if saved_ids:
+                        st.success(f"✅ {len(saved_ids)} hasil deteksi berhasil disimpan ke database!")
+                    if failed_names:
+                        st.error(f"❌ Gagal menyimpan {len(failed_names)} hasil deteksi ke database: {', '.join(failed_names)}")
 
         if uploaded_image_file is not None:
             try:
@@ -328,64 +394,90 @@ elif page == "🔎 Deteksi APD":
                     st.markdown("<div class='custom-card'><h5>Gambar Asli yang Diunggah:</h5></div>", unsafe_allow_html=True)
                     st.image(original_image_pil, caption=f"Nama file: {original_image_name}", use_container_width=True)
 
+                # Gambar yang sudah dideteksi diingat di session_state, sehingga setiap rerun (mis.
+                # slider ambang digeser) cukup memfilter box dari cache deteksi lalu menggambar ulang
+                image_key = (original_image_name, helper.image_content_hash(original_image_pil))
                 if st.button("🚀 Mulai Deteksi APD pada Gambar Ini", key="detect_image_button"):
                     if MODEL is None:
                         st.error("⚠️ Model deteksi tidak berhasil dimuat. Tidak dapat melanjutkan.")
                     else:
-                        with st.spinner("🕵️ Sedang menganalisis gambar, mohon tunggu..."):
-                            result_image_pil, detections = helper.perform_detection(original_image_pil, confidence_thresh_slider)
-                            
-                            with col_img_upload2:
-                                st.markdown("<div class='custom-card'><h5>Gambar Hasil Deteksi:</h5></div>", unsafe_allow_html=True)
-                                st.image(result_image_pil, caption="Gambar dengan anotasi deteksi", use_container_width=True)
-
-                            if detections:
-                                st.markdown("---")
-                                st.markdown("<div class='custom-card'><h3>📊 Ringkasan Hasil Deteksi dari Gambar</h3></div>", unsafe_allow_html=True)
-                                detected_counts = {}
-                                for det_idx, det in enumerate(detections):
-                                    label = det['label']
-                                    normalized_label = str(label).strip().capitalize()
-                                    if not normalized_label:
-                                        normalized_label = "Tidak_Diketahui"
-                                    detected_counts[normalized_label] = detected_counts.get(normalized_label, 0) + 1
-                                
-                                if detected_counts:
-                                    num_metrics = len(detected_counts)
-                                    cols_per_row = 3
-                                    metric_cols = st.columns(cols_per_row)
-                                    
-                                    col_idx = 0
-                                    for item_idx, (lbl, count) in enumerate(detected_counts.items()):
-                                        with metric_cols[col_idx % cols_per_row]:
-                                            st.metric(label=lbl, value=count)
-                                        col_idx += 1
-                                else:
-                                    st.info("Tidak ada objek APD yang terdeteksi dengan jelas pada gambar ini.")
-
-                                with st.expander("Lihat Detail Data Deteksi (Format JSON)"):
-                                    st.json(detections)
-                                
-                                saved_record = helper.save_detection_to_db(
-                                    original_image_name=original_image_name,
-                                    original_image_pil=original_image_pil,
-                                    detected_image_pil=result_image_pil,
-                                    detections_data_list=detections
-                                )
-                                if saved_record:
-                                    st.success(f"✅ Hasil deteksi berhasil disimpan ke database! (ID Record: {saved_record.id})")
-                                else:
-                                    st.error("❌ Gagal menyimpan hasil deteksi ke database.")
+                        st.session_state.single_image_key = image_key
+                        st.session_state.single_image_saved = {}
+
+                if MODEL is not None and st.session_state.get('single_image_key') == image_key:
+                    with st.spinner("🕵️ Sedang menganalisis gambar, mohon tunggu..."):
+                        result_image_pil, detections = helper.perform_detection(
+                            original_image_pil, confidence_thresh_slider, use_cache=True, tiled=tiled_mode
+                        )
+
+                    with col_img_upload2:
+                        st.markdown("<div class='custom-card'><h5>Gambar Hasil Deteksi:</h5></div>", unsafe_allow_html=True)
+                        st.image(result_image_pil, caption="Gambar dengan anotasi deteksi", use_container_width=True)
+
+                    if detections:
+                        st.markdown("---")
+                        st.markdown("<div class='custom-card'><h3>📊 Ringkasan Hasil Deteksi dari Gambar</h3></div>", unsafe_allow_html=True)
+                        detected_counts = {}
+                        for det_idx, det in enumerate(detections):
+                            label = det['label']
+                            normalized_label = str(label).strip().capitalize()
+                            if not normalized_label:
+                                normalized_label = "Tidak_Diketahui"
+                            detected_counts[normalized_label] = detected_counts.get(normalized_label, 0) + 1
+
+                        if detected_counts:
+                            num_metrics = len(detected_counts)
+                            cols_per_row = 3
+                            metric_cols = st.columns(cols_per_row)
+
+                            col_idx = 0
+                            for item_idx, (lbl, count) in enumerate(detected_counts.items()):
+                                with metric_cols[col_idx % cols_per_row]:
+                                    st.metric(label=lbl, value=count)
+                                col_idx += 1
+                        else:
+                            st.info("Tidak ada objek APD yang terdeteksi dengan jelas pada gambar ini.")
+
+                        with st.expander("Lihat Detail Data Deteksi (Format JSON)"):
+                            st.json(detections)
+
+                        # Satu hasil (gambar + ambang + mode tile) hanya disimpan sekali
+                        save_key = (confidence_thresh_slider, tiled_mode)
+                        saved_record_id = st.session_state.single_image_saved.get(save_key)
+                        if saved_record_id is not None:
+                            st.success(f"✅ Hasil deteksi ini sudah tersimpan di database. (ID Record: {saved_record_id})")
+                        elif st.button("💾 Simpan Hasil Deteksi ke Database", key="save_image_detection_button"):
+                            saved_record = helper.save_detection_to_db(
+                                original_image_name=original_image_name,
+                                original_image_pil=original_image_pil,
+                                detected_image_pil=result_image_pil,
+                                detections_data_list=detections
+                            )
+                            if saved_record:
+                                st.session_state.single_image_saved[save_key] = saved_record.id
+                                st.success(f"✅ Hasil deteksi berhasil disimpan ke database! (ID Record: {saved_record.id})")
                             else:
-                                st.info("ℹ️ Tidak ada APD yang terdeteksi pada gambar dengan ambang kepercayaan yang dipilih.")
+                                st.error("❌ Gagal menyimpan hasil deteksi ke database.")
+                    else:
+                        st.info("ℹ️ Tidak ada APD yang terdeteksi pada gambar dengan ambang kepercayaan yang dipilih.")
             except Exception as e:
                 st.error(f"Terjadi kesalahan saat memproses gambar yang diunggah: {e}")
                 print(f"Error di halaman deteksi gambar (upload): {e}")
 
+        # Statistik cache ditampilkan setelah deteksi pada rerun ini selesai
+        cache_stats = helper.DETECTION_CACHE.stats()
+        cache_stats_placeholder.caption(
+            f"🗃️ Cache hasil deteksi: {cache_stats['hits']} hit / {cache_stats['misses']} miss "
+            f"({cache_stats['entries']} entri, {cache_stats['bytes'] / 1024:.0f} KB)"
+        )
+
     elif source_type == "📹 Deteksi Realtime via Webcam":
         st.subheader("📹 Deteksi APD Langsung dari Webcam")
         st.info("Klik tombol 'START' di bawah untuk mengaktifkan kamera. Pastikan Anda memberikan izin akses kamera pada browser.")
 
+        from streamlit_webrtc import webrtc_streamer, WebRtcMode
+        from webcam import APDVideoTransformer
+
         # Ambil controller dari session state
         frame_saver_controller = st.session_state.frame_save_controller
 
@@ -394,7 +486,14 @@ elif page == "🔎 Deteksi APD":
             webrtc_ctx = webrtc_streamer(
                 key="apd-detection-webcam",
                 mode=WebRtcMode.SENDRECV,
-                video_processor_factory=lambda: APDVideoTransformer(controller=frame_saver_controller, confidence_threshold=confidence_thresh_slider),
+                video_processor_factory=lambda: APDVideoTransformer(
+                    controller=frame_saver_controller,
+                    model=MODEL,
+                    confidence_threshold=confidence_thresh_slider,
+                    processing_mode=webcam_mode,
+                    target_fps=target_fps_slider,
+                    detect_interval=detect_interval
+                ),
                 rtc_configuration={
                     "iceServers": [
                         {"urls": "stun:stun.l.google.com:19302"},
@@ -409,6 +508,12 @@ elif page == "🔎 Deteksi APD":
                 async_processing=True,
             )
             st.markdown('</div>', unsafe_allow_html=True)
+
+        # Terapkan pengaturan sidebar terbaru ke processor yang sedang berjalan
+        if webrtc_ctx.video_processor:
+            webrtc_ctx.video_processor.update_confidence(confidence_thresh_slider)
+            webrtc_ctx.video_processor.update_target_fps(target_fps_slider)
+            webrtc_ctx.video_processor.update_detect_interval(detect_interval)
         
         # Periksa queue untuk setiap hasil penyimpanan yang telah selesai
         try:
@@ -427,10 +532,47 @@ elif page == "🔎 Deteksi APD":
                 st.toast("✅ Frame berhasil disimpan ke riwayat!")
             
             st.success("Kamera aktif dan deteksi sedang berjalan.")
+            worker_stats = webrtc_ctx.video_processor.get_stats() if webrtc_ctx.video_processor else None
+            if worker_stats and 'processed' in worker_stats:
+                st.caption(f"Frame diproses: {worker_stats['processed']} | Frame dibuang: {worker_stats['dropped']}")
+            elif worker_stats:
+                st.caption(
+                    f"Frame dideteksi: {worker_stats['detected']} | Frame dari tracker: {worker_stats['tracked']} "
+                    f"| Interval deteksi saat ini: {worker_stats['interval']} frame"
+                )
             st.caption("Untuk menghentikan, klik tombol 'STOP' pada pemutar video.")
         else:
             st.info("Kamera tidak aktif. Klik 'START' pada pemutar video di atas untuk memulai.")
 
+        # Panel performa: latensi per tahap dari metrik bergulir, diperbarui setiap rerun
+        with st.sidebar.expander("📊 Performa Pipeline", expanded=False):
+            stage_stats = metrics.METRICS.snapshot()
+            frame_stats = stage_stats.get('webcam.frame')
+            st.metric("FPS Stream", f"{frame_stats['rate_per_second']:.1f}" if frame_stats else "-")
+            if stage_stats:
+                st.dataframe(
+                    [
+                        {'Tahap': stage_name, 'p50 (ms)': round(stats['p50_ms'], 1),
+                         'p95 (ms)': round(stats['p95_ms'], 1), 'Jumlah': stats['count']}
+                        for stage_name, stats in stage_stats.items()
+                    ],
+                    hide_index=True, use_container_width=True
+                )
+            for gauge_name, gauge_value in metrics.METRICS.gauge_values().items():
+                st.caption(f"{gauge_name}: {gauge_value:.0f}")
+            st.button("🔄 Segarkan Metrik", key="refresh_metrics_button")
+
+            profile_frame_count = st.number_input(
+                "Jumlah frame untuk profiling", min_value=10, max_value=1000,
+                value=settings.PROFILE_DEFAULT_FRAMES, step=10, key="profile_frame_count_input"
+            )
+            if st.button("🧪 Rekam Profil cProfile", key="start_profile_button", disabled=metrics.PROFILER.is_active()):
+                metrics.PROFILER.request(profile_frame_count)
+            if metrics.PROFILER.is_active():
+                st.caption(f"Merekam profil... sisa {metrics.PROFILER.remaining_frames()} frame.")
+            elif metrics.PROFILER.last_profile_path:
+                st.caption(f"Profil terakhir: {metrics.PROFILER.last_profile_path}")
+
 
         st.markdown("""
         ---
@@ -440,11 +582,121 @@ elif page == "🔎 Deteksi APD":
         """)
 
 
+elif page == "🎥 Multi Kamera":
+    st.header("🎥 Deteksi APD dari Banyak Kamera")
+    st.markdown("Semua kamera dilayani oleh satu scheduler yang menggabungkan frame lintas kamera menjadi satu batch inferensi. File video lokal dapat dipakai sebagai pengganti kamera.")
+
+    import multicam
+
+    st.sidebar.markdown("---")
+    with st.spinner("⏳ Memuat model deteksi..."):
+        MODEL = load_model()
+    multicam_confidence = st.sidebar.slider("🎯 Ambang Kepercayaan Deteksi (%)", 0, 100, 40, 5, key="multicam_confidence_slider") / 100
+    multicam_sources_text = st.sidebar.text_area(
+        "📡 Sumber Kamera (satu per baris)",
+        value="\n".join(settings.MULTICAM_SOURCES),
+        help="URL RTSP (rtsp://...) atau path file video lokal.",
+        key="multicam_sources_input"
+    )
+    multicam_loop = st.sidebar.checkbox("🔁 Ulangi file video lokal", value=True, key="multicam_loop_checkbox")
+    multicam_sources = [line.strip() for line in multicam_sources_text.splitlines() if line.strip()]
+
+    session = st.session_state.get('multicam_session')
+    col_start, col_stop = st.columns(2)
+    with col_start:
+        if st.button("▶️ Mulai", disabled=session is not None or not multicam_sources or MODEL is None, use_container_width=True):
+            session = multicam.MultiCameraSession(multicam_sources, multicam_confidence, loop=multicam_loop)
+            st.session_state.multicam_session = session
+    with col_stop:
+        if st.button("⏹️ Hentikan", disabled=session is None, use_container_width=True):
+            session.stop()
+            st.session_state.multicam_session = session = None
+
+    if session is None:
+        st.info("Masukkan sumber kamera di sidebar lalu klik 'Mulai'.")
+    else:
+        session.update_confidence(multicam_confidence)
+        stats_placeholder = st.empty()
+        stream_ids = session.scheduler.stream_ids()
+        grid_columns = st.columns(min(len(stream_ids), 3))
+        frame_placeholders = {}
+        for index, stream_id in enumerate(stream_ids):
+            with grid_columns[index % len(grid_columns)]:
+                frame_placeholders[stream_id] = st.empty()
+
+        # Perbarui tampilan sampai sesi berhenti; interaksi widget menghentikan loop ini lewat rerun
+        while True:
+            stats = session.stats()
+            for stream_id, placeholder in frame_placeholders.items():
+                stream_stats = stats['streams'][stream_id]
+                latest = session.scheduler.latest_result(stream_id)
+                caption = (
+                    f"{stream_id} - {stream_stats['source']} | diproses {stream_stats['processed']}, "
+                    f"dibuang {stream_stats['dropped']}, latensi {stream_stats['avg_latency_ms']:.0f} ms"
+                )
+                if latest is not None:
+                    image_bgr, detections, _, _ = latest
+                    annotated_bgr = helper.draw_detections_ndarray(image_bgr.copy(), detections)
+                    placeholder.image(annotated_bgr, channels="BGR", caption=caption, use_container_width=True)
+                else:
+                    placeholder.info(f"Menunggu frame... ({caption})")
+            stats_placeholder.caption(
+                f"Batch inferensi: {stats['batches']} | rata-rata {stats['avg_batch_size']:.1f} frame per batch"
+            )
+            if not session.is_running():
+                st.warning("Semua sumber berhenti. Klik 'Hentikan' untuk menutup sesi.")
+                break
+            time.sleep(1 / settings.MULTICAM_DISPLAY_FPS)
+
+
 elif page == "📜 Riwayat Deteksi":
     st.header("📜 Riwayat Hasil Deteksi APD dari Unggahan Gambar")
     st.markdown("Berikut adalah daftar deteksi yang telah dilakukan dan disimpan (hanya dari unggahan gambar), diurutkan dari yang terbaru.")
 
-    history_records = helper.get_all_detection_results_from_db()
+    # Filter dan ukuran halaman di sidebar
+    st.sidebar.markdown("---")
+    history_page_size = st.sidebar.selectbox(
+        "📄 Jumlah Record per Halaman",
+        settings.HISTORY_PAGE_SIZES,
+        index=settings.HISTORY_PAGE_SIZES.index(settings.HISTORY_DEFAULT_PAGE_SIZE),
+        key="history_page_size_selector"
+    )
+    history_date_range = st.sidebar.date_input("📅 Rentang Tanggal Deteksi", value=(), key="history_date_range_input")
+    history_start_datetime = None
+    history_end_datetime = None
+    if len(history_date_range) >= 1:
+        history_start_datetime = datetime.combine(history_date_range[0], datetime.min.time())
+        history_end_datetime = datetime.combine(history_date_range[-1], datetime.min.time()) + timedelta(days=1)
+
+    history_labels = st.sidebar.multiselect("🏷️ Filter Label Deteksi", helper.get_detection_labels(), key="history_label_filter")
+
+    # Reset posisi halaman jika filter berubah
+    history_filter_key = (history_page_size, history_start_datetime, history_end_datetime, tuple(history_labels))
+    if st.session_state.get('history_filter_key') != history_filter_key:
+        st.session_state.history_filter_key = history_filter_key
+        st.session_state.history_cursor_stack = [None]
+
+    total_history_records = helper.count_detection_results(history_start_datetime, history_end_datetime, history_labels)
+    history_records, next_history_cursor = helper.get_detection_results_page(
+        page_size=history_page_size,
+        cursor=st.session_state.history_cursor_stack[-1],
+        start_datetime=history_start_datetime,
+        end_datetime=history_end_datetime,
+        labels=history_labels
+    )
+
+    # Tampilkan hasil penghapusan massal dari rerun sebelumnya
+    if 'history_delete_message' in st.session_state:
+        message_type, message_text = st.session_state.pop('history_delete_message')
+        if message_type == "success":
+            st.success(message_text)
+        else:
+            st.error(message_text)
+
+    if not history_records and len(st.session_state.history_cursor_stack) > 1:
+        # Halaman ini kosong (mis. record terakhirnya dihapus), kembali ke halaman sebelumnya
+        st.session_state.history_cursor_stack.pop()
+        st.rerun()
 
     if not history_records:
         st.info("ℹ️ Belum ada riwayat deteksi yang tersimpan di database.")
@@ -459,20 +711,93 @@ elif page == "📜 Riwayat Deteksi":
             col_confirm1, col_confirm2, col_confirm_spacer = st.columns([1,1,2])
             with col_confirm1:
                 if st.button("🔴 Ya, Hapus Semua", key="confirm_delete_all_action_button", type="primary"):
-                    deleted_count = 0
-                    for record_to_delete in list(history_records):
-                        if helper.delete_detection_record_from_db(record_to_delete.id):
-                            deleted_count +=1
-                    st.success(f"Berhasil menghapus {deleted_count} record riwayat.")
+                    delete_result = helper.delete_detection_records(
+                        delete_all=True,
+                        full_vacuum=st.session_state.get('full_vacuum_checkbox', False)
+                    )
+                    if delete_result is None:
+                        st.session_state.history_delete_message = ("error", "❌ Gagal menghapus riwayat deteksi.")
+                    else:
+                        freed_mb = (delete_result['freed_db_bytes'] + delete_result['freed_image_bytes']) / 1e6
+                        st.session_state.history_delete_message = (
+                            "success",
+                            f"Berhasil menghapus {delete_result['deleted']} record riwayat. "
+                            f"Ruang penyimpanan dibebaskan: {freed_mb:.2f} MB."
+                        )
                     st.session_state.confirm_delete_all_visible = False
+                    st.session_state.history_cursor_stack = [None]
                     st.rerun()
             with col_confirm2:
                 if st.button("🟢 Batalkan", key="cancel_delete_all_action_button", type="secondary"):
                     st.session_state.confirm_delete_all_visible = False
                     st.rerun()
+            st.checkbox(
+                "🧹 Jalankan VACUUM penuh (lebih lambat, memadatkan seluruh file database)",
+                key="full_vacuum_checkbox"
+            )
             st.markdown("---")
 
-        st.markdown(f"Total deteksi tersimpan: **{len(history_records)}**")
+        # Ekspor memakai filter tanggal/label yang sama dengan daftar riwayat
+        with st.expander("📦 Ekspor Riwayat (ZIP)"):
+            st.caption(f"{total_history_records} record sesuai filter akan diekspor beserta gambar dan manifest deteksi.")
+            export_format = st.radio(
+                "Format manifest", settings.EXPORT_MANIFEST_FORMATS, horizontal=True, key="history_export_format"
+            )
+            export_include_images = st.checkbox("Sertakan gambar", value=True, key="history_export_include_images")
+            if st.button("📦 Siapkan Ekspor", key="history_export_button"):
+                export_path = history_export.default_export_path(export_format)
+                export_progress = st.progress(0.0, text="Mengekspor riwayat...")
+                try:
+                    export_summary = history_export.export_history_zip(
+                        export_path, history_start_datetime, history_end_datetime, history_labels,
+                        manifest_format=export_format, include_images=export_include_images,
+                        progress_callback=lambda done: export_progress.progress(
+                            min(done / max(total_history_records, 1), 1.0), text=f"{done}/{total_history_records} record"
+                        )
+                    )
+                    st.session_state.history_export_result = (export_path, export_summary)
+                except Exception as e:
+                    st.error(f"❌ Gagal mengekspor riwayat: {e}")
+
+            if 'history_export_result' in st.session_state:
+                export_path, export_summary = st.session_state.history_export_result
+                if export_path.exists():
+                    st.success(
+                        f"Ekspor selesai: {export_summary['records']} record, {export_summary['objects']} objek, "
+                        f"{export_summary['images']} gambar. File: `{export_path}`"
+                    )
+                    # Tombol unduh membaca seluruh file ke memori server; ekspor besar cukup diambil dari disk
+                    if export_path.stat().st_size <= settings.EXPORT_UI_MAX_DOWNLOAD_MB * 1e6:
+                        with open(export_path, 'rb') as export_file:
+                            st.download_button(
+                                "⬇️ Unduh ZIP", export_file, file_name=export_path.name,
+                                mime="application/zip", key="history_export_download"
+                            )
+                    else:
+                        st.info("File terlalu besar untuk diunduh lewat browser; ambil langsung dari folder exports/ di server.")
+
+        # Ringkasan per label dihitung dengan agregat SQL pada tabel detection_objects
+        label_summary = helper.count_detections_by_label(history_start_datetime, history_end_datetime)
+        if label_summary:
+            with st.expander("📊 Ringkasan Deteksi per Label"):
+                cols_per_row = 3
+                summary_cols = st.columns(cols_per_row)
+                for item_idx, (lbl, counts) in enumerate(label_summary.items()):
+                    with summary_cols[item_idx % cols_per_row]:
+                        st.metric(label=lbl, value=counts['objects'], delta=f"{counts['images']} gambar", delta_color="off")
+
+        history_page_number = len(st.session_state.history_cursor_stack)
+        st.markdown(f"Total deteksi tersimpan: **{total_history_records}** — Halaman **{history_page_number}**")
+
+        col_prev_page, col_next_page, _ = st.columns([1,1,4])
+        with col_prev_page:
+            if st.button("⬅️ Sebelumnya", key="history_prev_page_button", disabled=history_page_number <= 1):
+                st.session_state.history_cursor_stack.pop()
+                st.rerun()
+        with col_next_page:
+            if st.button("Berikutnya ➡️", key="history_next_page_button", disabled=next_history_cursor is None):
+                st.session_state.history_cursor_stack.append(next_history_cursor)
+                st.rerun()
         st.markdown("---")
 
         for record_idx, record in enumerate(history_records):
@@ -484,12 +809,16 @@ elif page == "📜 Riwayat Deteksi":
                 if record.original_image_name:
                     st.write(f"**Nama File Asli:** `{record.original_image_name}`")
 
+                # Thumbnail dikirim apa adanya (tanpa decode/encode ulang)
+                show_full_resolution = st.checkbox("🔍 Tampilkan Resolusi Penuh", key=f"full_resolution_{record.id}")
                 col_hist_img1, col_hist_img2 = st.columns(2)
                 try:
                     with col_hist_img1:
                         st.markdown("<h6>Gambar Asli:</h6>", unsafe_allow_html=True)
-                        original_img_pil = helper.blob_to_pil(record.original_image_blob)
-                        st.image(original_img_pil, use_container_width=True, output_format='PNG')
+                        if show_full_resolution:
+                            st.image(helper.get_original_image_bytes(record), use_container_width=True)
+                        else:
+                            st.image(helper.get_original_thumbnail_bytes(record), width=settings.THUMBNAIL_MAX_WIDTH)
                 except Exception as e:
                     with col_hist_img1:
                         st.warning(f"Gagal menampilkan gambar asli: {e}")
@@ -497,8 +826,10 @@ elif page == "📜 Riwayat Deteksi":
                 try:
                     with col_hist_img2:
                         st.markdown("<h6>Gambar Hasil Deteksi:</h6>", unsafe_allow_html=True)
-                        detected_img_pil = helper.blob_to_pil(record.detected_image_blob)
-                        st.image(detected_img_pil, use_container_width=True, output_format='PNG')
+                        if show_full_resolution:
+                            st.image(helper.get_detected_image_bytes(record), use_container_width=True)
+                        else:
+                            st.image(helper.get_detected_thumbnail_bytes(record), width=settings.THUMBNAIL_MAX_WIDTH)
                 except Exception as e:
                     with col_hist_img2:
                         st.warning(f"Gagal menampilkan gambar hasil deteksi: {e}")
@@ -531,6 +862,56 @@ elif page == "📜 Riwayat Deteksi":
                 st.markdown(f"</div>", unsafe_allow_html=True)
                 st.markdown("---")
 
+elif page == "📈 Tren Kepatuhan":
+    st.header("📈 Tren Kepatuhan Penggunaan APD")
+    st.markdown("Grafik di bawah dihitung dari tabel rollup per jam/hari, sehingga tetap cepat berapa pun jumlah riwayat yang tersimpan.")
+
+    st.sidebar.markdown("---")
+    rollup_period_label = st.sidebar.radio("🕒 Periode Agregasi", ["Per Hari", "Per Jam"], key="rollup_period_selector")
+    rollup_period = 'day' if rollup_period_label == "Per Hari" else 'hour'
+    default_start_date = datetime.now(ZoneInfo("Asia/Jakarta")).date() - timedelta(days=settings.DASHBOARD_DEFAULT_DAYS)
+    dashboard_date_range = st.sidebar.date_input(
+        "📅 Rentang Tanggal", value=(default_start_date, datetime.now(ZoneInfo("Asia/Jakarta")).date()),
+        key="dashboard_date_range_input"
+    )
+    dashboard_start_datetime = None
+    dashboard_end_datetime = None
+    if len(dashboard_date_range) >= 1:
+        dashboard_start_datetime = datetime.combine(dashboard_date_range[0], datetime.min.time())
+        dashboard_end_datetime = datetime.combine(dashboard_date_range[-1], datetime.min.time()) + timedelta(days=1)
+
+    rollup_rows = helper.get_rollup_series(rollup_period, dashboard_start_datetime, dashboard_end_datetime)
+    import pandas as pd
+
+    if not rollup_rows:
+        st.info("ℹ️ Belum ada data deteksi pada rentang waktu ini.")
+    else:
+        object_counts = pd.DataFrame(
+            [(period_start, label, object_count) for period_start, label, object_count, _ in rollup_rows if label != database.ROLLUP_ALL_LABEL],
+            columns=["Waktu", "Label", "Jumlah"]
+        )
+        image_counts = pd.DataFrame(
+            [(period_start, label, image_count) for period_start, label, _, image_count in rollup_rows],
+            columns=["Waktu", "Label", "Jumlah"]
+        ).pivot(index="Waktu", columns="Label", values="Jumlah").fillna(0)
+        total_images = image_counts.pop(database.ROLLUP_ALL_LABEL) if database.ROLLUP_ALL_LABEL in image_counts else None
+
+        col_total1, col_total2 = st.columns(2)
+        with col_total1:
+            st.metric("Total Gambar Dianalisis", int(total_images.sum()) if total_images is not None else 0)
+        with col_total2:
+            st.metric("Total Objek Terdeteksi", int(object_counts["Jumlah"].sum()))
+
+        st.markdown("<div class='custom-card'><h3>📊 Jumlah Objek Terdeteksi per Label</h3></div>", unsafe_allow_html=True)
+        if not object_counts.empty:
+            st.line_chart(object_counts.pivot(index="Waktu", columns="Label", values="Jumlah").fillna(0))
+        else:
+            st.info("Tidak ada objek terdeteksi pada rentang waktu ini.")
+
+        if total_images is not None and not image_counts.empty:
+            st.markdown("<div class='custom-card'><h3>✅ Persentase Gambar yang Memuat Label</h3></div>", unsafe_allow_html=True)
+            st.line_chart(image_counts.div(total_images, axis=0).mul(100).round(1))
+
 # --- Footer
 st.markdown("---")
 st.markdown("<p style='text-align: center; color: #777; font-size: 0.9rem;'>© 2024-2025 Aplikasi Deteksi APD | Dikembangkan dengan Streamlit oleh ANDIKA SATRIA PUTRA</p>", unsafe_allow_html=True)
\ No newline at end of file
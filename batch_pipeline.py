@@ -0,0 +1,347 @@
+"""Pipeline pemrosesan batch tanpa UI: decode -> inferensi -> encode -> simpan.
+
+Setiap tahap berjalan di thread sendiri dan dihubungkan dengan antrian berukuran terbatas,
+sehingga decoding video, inferensi, encoding gambar dan penulisan database saling tumpang
+tindih. Antrian yang penuh menahan tahap sebelumnya (backpressure) agar memori tetap stabil.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from PIL import Image
+import settings
+import helper
+
+
+_END = object() # Penanda akhir aliran, diteruskan dari tahap ke tahap
+
+def _frame_items(batch):
+    """Item frame dalam batch (tanpa penanda akhir aliran dan penanda 'source_done')."""
+    return [item for item in batch if item is not _END and not item.get('source_done')]
+
+
+# --- Progres yang Bisa Dilanjutkan ---
+class BatchProgress:
+    """Mencatat sumber yang sudah selesai dan frame terakhir yang tersimpan per video.
+
+    Disimpan ke file JSON setelah setiap batch tersimpan, sehingga proses yang terhenti
+    bisa dilanjutkan tanpa mengulang frame yang sudah diproses. Progres dipisah per target
+    output (lihat output_target), jadi sumber yang sama boleh diproses ulang ke database
+    atau file JSONL lain. restart=True hanya mengosongkan progres target ini.
+    """
+
+    def __init__(self, path, target, restart=False):
+        self.path = Path(path)
+        self.target = target
+        self.completed = set()
+        self.last_frames = {}
+        self._other_targets = {}
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            # File progres format lama (tanpa 'targets') tidak tahu target output-nya, jadi diabaikan
+            self._other_targets = data.get('targets', {})
+            current = self._other_targets.pop(target, {})
+            if not restart:
+                self.completed = set(current.get('completed', []))
+                self.last_frames = current.get('frames', {})
+
+    def is_completed(self, source_key):
+        return source_key in self.completed
+
+    def last_frame(self, source_key):
+        return self.last_frames.get(source_key, -1)
+
+    def mark_frame(self, source_key, frame_index):
+        self.last_frames[source_key] = max(frame_index, self.last_frame(source_key))
+
+    def mark_completed(self, source_key):
+        self.completed.add(source_key)
+        self.last_frames.pop(source_key, None)
+
+    def save(self):
+        current = {'completed': sorted(self.completed), 'frames': self.last_frames}
+        data = {'targets': {**self._other_targets, self.target: current}}
+        # Tulis ke file sementara lalu rename agar file progres tidak pernah setengah jadi
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+
+# --- Statistik Throughput per Tahap ---
+class StageStats:
+    """Jumlah frame dan waktu kerja (tanpa waktu menunggu antrian) satu tahap."""
+
+    def __init__(self, name):
+        self.name = name
+        self.frame_count = 0
+        self.busy_seconds = 0.0
+
+    def add(self, frame_count, busy_seconds):
+        self.frame_count += frame_count
+        self.busy_seconds += busy_seconds
+
+    def fps(self):
+        return self.frame_count / self.busy_seconds if self.busy_seconds > 0 else 0.0
+
+
+def discover_sources(input_path):
+    """Daftar file gambar/video yang akan diproses dari sebuah file atau direktori (rekursif)."""
+    input_path = Path(input_path)
+    supported = settings.BATCH_IMAGE_EXTENSIONS + settings.BATCH_VIDEO_EXTENSIONS
+    if input_path.is_file():
+        if input_path.suffix.lower() not in supported:
+            raise ValueError(f"Format file tidak didukung: {input_path.name}")
+        return [input_path]
+    if not input_path.is_dir():
+        raise FileNotFoundError(f"Sumber tidak ditemukan: {input_path}")
+    return sorted(path for path in input_path.rglob('*') if path.is_file() and path.suffix.lower() in supported)
+
+
+# --- Pipeline ---
+class BatchPipeline:
+    """Menjalankan decode, inferensi, encode dan simpan sebagai empat thread yang berjalan bersamaan.
+
+    Item yang mengalir berupa dict per frame; penanda 'source_done' ikut mengalir sesuai urutan
+    sehingga tahap simpan tahu kapan satu sumber selesai seluruhnya.
+    """
+
+    STAGE_NAMES = ('decode', 'inferensi', 'encode', 'simpan')
+
+    def __init__(self, sources, progress, confidence_threshold=0.35, output_jsonl=None, save_to_db=True,
+                 frame_step=settings.BATCH_VIDEO_FRAME_STEP, batch_size=settings.DETECTION_BATCH_SIZE,
+                 queue_size=settings.BATCH_STAGE_QUEUE_SIZE):
+        self.sources = sources
+        self.progress = progress
+        self.confidence_threshold = confidence_threshold
+        self.output_jsonl = output_jsonl
+        self.save_to_db = save_to_db
+        self.frame_step = max(int(frame_step), 1)
+        self.batch_size = max(int(batch_size), 1)
+        self.stats = {name: StageStats(name) for name in self.STAGE_NAMES}
+        self.error = None
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in range(len(self.STAGE_NAMES) - 1)]
+        self._stop_event = threading.Event()
+        self._jsonl_file = None
+
+    def run(self):
+        """Menjalankan pipeline sampai semua sumber selesai. Mengembalikan ringkasan throughput."""
+        started_at = time.perf_counter()
+        if self.output_jsonl:
+            # Mode append agar proses yang dilanjutkan tidak menimpa hasil sebelumnya
+            self._jsonl_file = open(self.output_jsonl, 'a', encoding='utf-8')
+        decode_queue, infer_queue, encode_queue = self._queues
+        threads = [
+            threading.Thread(target=self._guard, args=('decode', self._decode_stage, decode_queue), daemon=True),
+            threading.Thread(target=self._guard, args=(
+                'inferensi', self._batch_stage, 'inferensi', decode_queue, infer_queue, self._infer_batch
+            ), daemon=True),
+            threading.Thread(target=self._guard, args=(
+                'encode', self._batch_stage, 'encode', infer_queue, encode_queue, self._encode_batch
+            ), daemon=True),
+            threading.Thread(target=self._guard, args=(
+                'simpan', self._batch_stage, 'simpan', encode_queue, None, self._persist_batch
+            ), daemon=True),
+        ]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            if self._jsonl_file is not None:
+                self._jsonl_file.close()
+
+        elapsed = time.perf_counter() - started_at
+        frame_count = self.stats['simpan'].frame_count
+        return {
+            'frames': frame_count,
+            'elapsed_seconds': elapsed,
+            'overall_fps': frame_count / elapsed if elapsed > 0 else 0.0,
+            'stage_fps': {name: stats.fps() for name, stats in self.stats.items()},
+            'error': self.error,
+        }
+
+    def _guard(self, stage_name, stage_fn, *args):
+        # Error di satu tahap menghentikan seluruh pipeline; progres hanya mencatat yang sudah tersimpan
+        try:
+            stage_fn(*args)
+        except Exception as e:
+            print(f"Error pada tahap {stage_name}: {e}")
+            self.error = f"{stage_name}: {e}"
+            self._stop_event.set()
+
+    def _put(self, target_queue, item):
+        while not self._stop_event.is_set():
+            try:
+                target_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get_batch(self, source_queue, max_items):
+        """Menunggu satu item lalu mengambil item lain yang sudah tersedia, hingga max_items frame."""
+        batch = []
+        while not self._stop_event.is_set():
+            try:
+                batch.append(source_queue.get(timeout=0.1))
+                break
+            except queue.Empty:
+                continue
+        frame_count = len(_frame_items(batch))
+        while batch and batch[-1] is not _END and frame_count < max_items:
+            try:
+                item = source_queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            if _frame_items([item]):
+                frame_count += 1
+        return batch
+
+    # --- Tahap 1: Decode ---
+    def _decode_stage(self, output_queue):
+        stats = self.stats['decode']
+        for source in self.sources:
+            source_key = str(source.resolve())
+            if self.progress.is_completed(source_key):
+                print(f"Lewati {source.name}: sudah diproses.")
+                continue
+
+            started_at = time.perf_counter()
+            try:
+                for item in self._decode_source(source, source_key):
+                    stats.add(1, time.perf_counter() - started_at)
+                    if not self._put(output_queue, item):
+                        return
+                    started_at = time.perf_counter()
+            except Exception as e:
+                # File rusak tidak menghentikan batch; sumber ini tidak ditandai selesai
+                print(f"Error decode {source.name}, dilewati: {e}")
+                continue
+            if not self._put(output_queue, {'source': source_key, 'source_done': True}):
+                return
+        self._put(output_queue, _END)
+
+    def _decode_source(self, source, source_key):
+        if source.suffix.lower() in settings.BATCH_IMAGE_EXTENSIONS:
+            image_pil = Image.open(source)
+            image_pil.load() # Decode di tahap ini, bukan tertunda sampai inferensi
+            yield {'source': source_key, 'frame_index': 0, 'pts': None, 'name': source.name, 'image': image_pil}
+            return
+
+        import av # Hanya dibutuhkan untuk sumber video
+        last_done = self.progress.last_frame(source_key)
+        with av.open(str(source)) as container:
+            stream = container.streams.video[0]
+            stream.thread_type = 'AUTO' # Decoding multi-thread di dalam FFmpeg
+            for frame_index, frame in enumerate(container.decode(stream)):
+                if frame_index <= last_done or frame_index % self.frame_step:
+                    continue
+                yield {
+                    'source': source_key,
+                    'frame_index': frame_index,
+                    'pts': float(frame.time) if frame.time is not None else None,
+                    'name': f"{source.name}#{frame_index}",
+                    'image': frame.to_image(),
+                }
+
+    # --- Tahap 2-4: Inferensi, Encode, Simpan ---
+    def _batch_stage(self, stage_name, input_queue, output_queue, process_batch):
+        stats = self.stats[stage_name]
+        while not self._stop_event.is_set():
+            batch = self._get_batch(input_queue, self.batch_size)
+            started_at = time.perf_counter()
+            process_batch(batch)
+            stats.add(len(_frame_items(batch)), time.perf_counter() - started_at)
+            if output_queue is not None:
+                for item in batch:
+                    if not self._put(output_queue, item):
+                        return
+            if batch and batch[-1] is _END:
+                return
+
+    def _infer_batch(self, batch):
+        frame_items = _frame_items(batch)
+        if not frame_items:
+            return
+        detections = helper.perform_detection_batch(
+            [item['image'] for item in frame_items], self.confidence_threshold,
+            batch_size=len(frame_items), render=False
+        )
+        for index, _, _, detections_data in detections:
+            frame_items[index]['detections'] = detections_data
+
+    def _encode_batch(self, batch):
+        frame_items = _frame_items(batch)
+        if self.save_to_db:
+            records = [
+                (
+                    item['name'], item['image'],
+                    helper.draw_detections(item['image'], item['detections']), item['detections']
+                )
+                for item in frame_items
+            ]
+            for item, record in zip(frame_items, helper.build_detection_records(records)):
+                item['record'] = record
+        for item in frame_items:
+            item['image'] = None # Gambar tidak dibutuhkan lagi; lepaskan memorinya lebih awal
+
+    def _persist_batch(self, batch):
+        frame_items = _frame_items(batch)
+        record_ids = [None] * len(frame_items)
+        if self.save_to_db and frame_items:
+            record_ids = helper.persist_detection_records([item['record'] for item in frame_items])
+            if record_ids is None:
+                raise RuntimeError("gagal menyimpan batch ke database")
+
+        for item, record_id in zip(frame_items, record_ids):
+            if self._jsonl_file is not None:
+                self._jsonl_file.write(json.dumps({
+                    'source': item['source'],
+                    'frame_index': item['frame_index'],
+                    'pts': item['pts'],
+                    'name': item['name'],
+                    'record_id': record_id,
+                    'detections': item['detections'],
+                }) + '\n')
+        if self._jsonl_file is not None:
+            self._jsonl_file.flush()
+
+        # Urutan item dijaga di semua tahap, jadi progres per sumber cukup berupa frame terakhir
+        for item in batch:
+            if item is _END:
+                continue
+            if item.get('source_done'):
+                self.progress.mark_completed(item['source'])
+            else:
+                self.progress.mark_frame(item['source'], item['frame_index'])
+        if batch:
+            self.progress.save()
+
+
+def output_target(save_to_db, output_jsonl):
+    """Identitas tujuan hasil batch (database dan/atau file JSONL), dipakai sebagai kunci progres."""
+    targets = []
+    if save_to_db:
+        targets.append(f"db:{settings.DATABASE_URL}")
+    if output_jsonl:
+        targets.append(f"jsonl:{Path(output_jsonl).resolve()}")
+    return '+'.join(targets) or 'none'
+
+
+def run_batch(input_path, confidence_threshold=0.35, output_jsonl=None, save_to_db=True,
+              frame_step=settings.BATCH_VIDEO_FRAME_STEP, batch_size=settings.DETECTION_BATCH_SIZE,
+              progress_file=settings.BATCH_PROGRESS_FILE, restart=False):
+    """Memproses semua gambar/video di input_path. Model harus sudah dimuat (helper.load_yolo_model)."""
+    progress = BatchProgress(progress_file, output_target(save_to_db, output_jsonl), restart=restart)
+    pipeline = BatchPipeline(
+        discover_sources(input_path), progress,
+        confidence_threshold=confidence_threshold, output_jsonl=output_jsonl, save_to_db=save_to_db,
+        frame_step=frame_step, batch_size=batch_size
+    )
+    return pipeline.run()
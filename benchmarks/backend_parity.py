@@ -0,0 +1,89 @@
+"""Cek kesetaraan deteksi dan kecepatan backend inferensi terhadap PyTorch.
+
+Jalankan dari direktori proyek:
+    python -m benchmarks.backend_parity --backend onnx [--images assets/] [--repeat 10]
+"""
+import argparse
+import time
+from pathlib import Path
+import numpy as np
+from PIL import Image
+from ultralytics import YOLO
+import settings
+import helper
+from tracker import box_iou
+
+
+def match_detections(reference, candidate, iou_tolerance, confidence_tolerance):
+    """Menghitung jumlah deteksi referensi yang punya pasangan pada kandidat (kelas sama, IoU dan confidence dalam toleransi)."""
+    ref_cls, ref_conf, ref_xyxy = reference
+    cand_cls, cand_conf, cand_xyxy = candidate
+    used = np.zeros(len(cand_cls), dtype=bool)
+    matched = 0
+    for cls_id, conf, box in zip(ref_cls, ref_conf, ref_xyxy):
+        same_class = (cand_cls == cls_id) & ~used
+        ious = np.where(same_class, box_iou(box, cand_xyxy.astype(float)), 0.0)
+        if len(ious) == 0:
+            continue
+        best = int(np.argmax(ious))
+        if ious[best] >= iou_tolerance and abs(cand_conf[best] - conf) <= confidence_tolerance:
+            used[best] = True
+            matched += 1
+    return matched
+
+
+def timed_predict(model, image_pil, confidence, repeat):
+    model(image_pil, conf=confidence, verbose=False) # Warm-up
+    durations = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        results = model(image_pil, conf=confidence, verbose=False)
+        durations.append(time.perf_counter() - started_at)
+    return results[0], float(np.median(durations))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bandingkan backend inferensi dengan PyTorch.")
+    parser.add_argument("--backend", choices=[b for b in settings.INFERENCE_BACKENDS if b != 'pytorch'], required=True)
+    parser.add_argument("--images", type=Path, default=settings.IMAGES_DIR, help="Direktori gambar uji.")
+    parser.add_argument("--confidence", type=float, default=0.35)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--iou-tolerance", type=float, default=0.9)
+    parser.add_argument("--confidence-tolerance", type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    helper.configure_inference_threads(settings.INFERENCE_THREADS)
+    reference_model = YOLO(str(settings.DETECTION_MODEL_PATH))
+    candidate_model = YOLO(str(helper.export_model(args.backend)), task='detect')
+
+    total_reference = total_candidate = total_matched = 0
+    reference_time = candidate_time = 0.0
+    image_paths = sorted(p for p in args.images.iterdir() if p.suffix.lower() in ('.jpg', '.jpeg', '.png'))
+    for image_path in image_paths:
+        image_pil = Image.open(image_path).convert('RGB')
+        reference_result, reference_seconds = timed_predict(reference_model, image_pil, args.confidence, args.repeat)
+        candidate_result, candidate_seconds = timed_predict(candidate_model, image_pil, args.confidence, args.repeat)
+        reference = helper._result_to_arrays(reference_result)
+        candidate = helper._result_to_arrays(candidate_result)
+        matched = match_detections(reference, candidate, args.iou_tolerance, args.confidence_tolerance)
+
+        total_reference += len(reference[0])
+        total_candidate += len(candidate[0])
+        total_matched += matched
+        reference_time += reference_seconds
+        candidate_time += candidate_seconds
+        print(
+            f"{image_path.name}: pytorch={len(reference[0])} {args.backend}={len(candidate[0])} cocok={matched} | "
+            f"{reference_seconds * 1000:.1f} ms vs {candidate_seconds * 1000:.1f} ms"
+        )
+
+    match_rate = total_matched / total_reference if total_reference else 1.0
+    parity_ok = match_rate == 1.0 and total_candidate == total_reference
+    print(f"\nKecocokan deteksi: {total_matched}/{total_reference} ({match_rate:.1%}), deteksi {args.backend}: {total_candidate}")
+    print(f"Speedup {args.backend} vs pytorch: {reference_time / max(candidate_time, 1e-9):.2f}x")
+    print("PARITY OK" if parity_ok else "PARITY GAGAL: deteksi berbeda melebihi toleransi")
+    return 0 if parity_ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,51 @@
+"""Benchmark codec gambar: waktu encode dan ukuran hasil per codec pada gambar di assets/.
+
+Jalankan dari direktori proyek:
+    python -m benchmarks.codec_benchmark [--repeat 5]
+"""
+import argparse
+import time
+from PIL import Image
+import settings
+from image_codec import encode_image
+
+CODECS = {
+    'PNG (level 1)': {'format': 'PNG', 'compress_level': 1},
+    'PNG (level 6)': {'format': 'PNG', 'compress_level': 6},
+    'PNG (level 9)': {'format': 'PNG', 'compress_level': 9},
+    'JPEG q85': {'format': 'JPEG', 'quality': 85},
+    'JPEG q92': {'format': 'JPEG', 'quality': 92},
+    'WEBP q80': {'format': 'WEBP', 'quality': 80},
+    'WEBP q90': {'format': 'WEBP', 'quality': 90},
+}
+
+
+def benchmark_image(image_pil, repeat):
+    rows = []
+    for codec_name, codec in CODECS.items():
+        durations = []
+        for _ in range(repeat):
+            started_at = time.perf_counter()
+            image_bytes, _ = encode_image(image_pil, codec)
+            durations.append(time.perf_counter() - started_at)
+        rows.append((codec_name, min(durations) * 1000, len(image_bytes) / 1024))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark codec gambar pada aset bawaan.")
+    parser.add_argument("--repeat", type=int, default=5, help="Jumlah pengulangan per codec (diambil yang tercepat).")
+    args = parser.parse_args(argv)
+
+    image_paths = sorted(p for p in settings.IMAGES_DIR.iterdir() if p.suffix.lower() in ('.jpg', '.jpeg', '.png'))
+    for image_path in image_paths:
+        # Muat ulang ke RGB tanpa atribut format agar sama seperti frame webcam/hasil anotasi
+        image_pil = Image.open(image_path).convert('RGB')
+        print(f"\n{image_path.name} ({image_pil.width}x{image_pil.height})")
+        print(f"{'Codec':<16}{'Encode (ms)':>14}{'Ukuran (KB)':>14}")
+        for codec_name, encode_ms, size_kb in benchmark_image(image_pil, args.repeat):
+            print(f"{codec_name:<16}{encode_ms:>14.1f}{size_kb:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""Benchmark jalur panas aplikasi dengan model YOLO palsu yang deterministik.
+
+Model palsu menghasilkan jumlah box yang bisa diatur, jadi benchmark berjalan di mesin CPU
+tanpa bobot model asli. Database dan image store memakai direktori sementara.
+
+Jalankan dari direktori proyek:
+    python -m benchmarks.hot_paths --output baseline.json
+    python -m benchmarks.hot_paths --compare baseline.json [--threshold 0.15]
+"""
+import argparse
+import json
+import os
+import platform
+import queue
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+# Database dan image store benchmark dipisah dari data aplikasi; harus di-set sebelum settings di-import
+_WORKDIR = tempfile.mkdtemp(prefix="sidetek-bench-")
+os.environ['SIDETEK_DATABASE_URL'] = f"sqlite:///{_WORKDIR}/benchmark.db"
+os.environ['SIDETEK_IMAGE_STORE_DIR'] = os.path.join(_WORKDIR, "image_store")
+
+import numpy as np
+from PIL import Image
+import settings
+import database
+import helper
+from database import DetectionHistory
+
+
+# --- Model YOLO Palsu ---
+class FakeBoxes:
+    """Meniru ultralytics Boxes secukupnya: cls, conf, xyxy, len(), cpu() dan numpy()."""
+
+    def __init__(self, cls, conf, xyxy):
+        self.cls = cls
+        self.conf = conf
+        self.xyxy = xyxy
+
+    def __len__(self):
+        return len(self.cls)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self
+
+
+class FakeResult:
+    def __init__(self, image_bgr, boxes, names):
+        self.orig_img = image_bgr
+        self.boxes = boxes
+        self.names = names
+
+    def plot(self):
+        """Menggambar kerangka box ke salinan gambar, mendekati biaya results.plot()."""
+        annotated = self.orig_img.copy()
+        for x1, y1, x2, y2 in self.boxes.xyxy.astype(int):
+            annotated[y1:y1 + 2, x1:x2] = (0, 255, 0)
+            annotated[max(y2 - 2, y1):y2, x1:x2] = (0, 255, 0)
+            annotated[y1:y2, x1:x1 + 2] = (0, 255, 0)
+            annotated[y1:y2, max(x2 - 2, x1):x2] = (0, 255, 0)
+        return annotated
+
+
+class FakeYOLO:
+    """Model palsu dengan antarmuka pemanggilan yang sama seperti ultralytics YOLO.
+
+    Box dibangkitkan dari seed dan ukuran gambar, sehingga gambar yang sama selalu
+    menghasilkan deteksi yang sama.
+    """
+
+    names = {0: 'Safety-Helmet', 1: 'Reflective-Jacket', 2: 'No-Helmet', 3: 'No-Jacket'}
+
+    def __init__(self, box_count=10, seed=0):
+        self.box_count = box_count
+        self.seed = seed
+
+    def __call__(self, source, conf=0.25, verbose=False, **kwargs):
+        sources = source if isinstance(source, list) else [source]
+        return [self._predict(self._to_bgr(image), conf) for image in sources]
+
+    @staticmethod
+    def _to_bgr(image):
+        if isinstance(image, np.ndarray):
+            return image
+        return np.ascontiguousarray(np.asarray(image.convert('RGB'))[..., ::-1])
+
+    def _predict(self, image_bgr, confidence_threshold):
+        height, width = image_bgr.shape[:2]
+        rng = np.random.default_rng(self.seed + height * 7919 + width)
+        top_left = rng.uniform(0, 0.8, size=(self.box_count, 2)) * (width, height)
+        sizes = rng.uniform(0.05, 0.2, size=(self.box_count, 2)) * (width, height)
+        xyxy = np.concatenate([top_left, np.minimum(top_left + sizes, (width - 1, height - 1))], axis=1)
+        confidences = rng.uniform(0.05, 0.99, size=self.box_count)
+        class_ids = rng.integers(0, len(self.names), size=self.box_count).astype(np.float32)
+        keep = confidences >= confidence_threshold
+        return FakeResult(image_bgr, FakeBoxes(class_ids[keep], confidences[keep], xyxy[keep]), self.names)
+
+
+class _NoSaveController:
+    """Pengganti FrameSaveController app.py tanpa permintaan simpan."""
+
+    def __init__(self):
+        self.result_queue = queue.Queue()
+
+    def check_and_reset_request(self):
+        return False
+
+
+# --- Pengukuran ---
+def measure(fn, repeat, warmup=1):
+    """Menjalankan fn berulang kali dan mengembalikan ringkasan durasi dalam milidetik."""
+    for _ in range(warmup):
+        fn()
+    durations = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        fn()
+        durations.append((time.perf_counter() - started_at) * 1000)
+    return summarize(durations)
+
+
+def summarize(durations_ms):
+    durations_ms = np.array(durations_ms)
+    return {
+        'median_ms': float(np.median(durations_ms)),
+        'p95_ms': float(np.percentile(durations_ms, 95)),
+        'min_ms': float(durations_ms.min()),
+        'samples': len(durations_ms),
+    }
+
+
+def populate_records(record_count, image_pil, detections_data, chunk_size=500):
+    """Mengisi database dengan record identik; gambar di-encode sekali lalu hash-nya dipakai ulang."""
+    template = helper.build_detection_records([("benchmark.jpg", image_pil, image_pil, detections_data)])[0]
+    columns = [column.name for column in DetectionHistory.__table__.columns if column.name not in ('id', 'timestamp')]
+    for start in range(0, record_count, chunk_size):
+        records = []
+        for _ in range(min(chunk_size, record_count - start)):
+            timestamp = datetime.now(template.timestamp.tzinfo)
+            records.append(DetectionHistory(
+                **{name: getattr(template, name) for name in columns},
+                timestamp=timestamp,
+                objects=helper._build_detection_objects(detections_data, timestamp)
+            ))
+        helper.persist_detection_records(records)
+
+
+def run_benchmarks(box_count, repeat, record_counts):
+    helper.MODEL_YOLO = FakeYOLO(box_count)
+    helper.ACTIVE_MODEL_NAME = 'benchmark-fake'
+    database.init_db()
+
+    image_pil = Image.open(settings.DEFAULT_IMAGE)
+    image_pil.load()
+    image_bgr = FakeYOLO._to_bgr(image_pil)
+    results = {}
+
+    # Deteksi: ekstraksi hasil saja, lalu dengan plotting
+    results['perform_detection.extract'] = measure(
+        lambda: helper.perform_detection(image_pil, render=False, use_cache=False, tiled=False), repeat
+    )
+    results['perform_detection.plot'] = measure(
+        lambda: helper.perform_detection(image_pil, render=True, use_cache=False, tiled=False), repeat
+    )
+    results['perform_detection.cached_refilter'] = measure(
+        lambda: helper.perform_detection(image_pil, confidence_threshold=0.5, render=True, use_cache=True), repeat
+    )
+
+    # Jalur frame webcam (mode setiap frame, sinkron)
+    import av
+    from webcam import APDVideoTransformer
+    transformer = APDVideoTransformer(
+        controller=_NoSaveController(), model=helper.MODEL_YOLO,
+        processing_mode=settings.WEBCAM_MODE_EVERY_FRAME
+    )
+    video_frame = av.VideoFrame.from_ndarray(image_bgr, format="bgr24")
+    results['webcam.recv'] = measure(lambda: transformer.recv(video_frame), repeat)
+
+    # Konversi gambar <-> BLOB
+    image_blob = helper.pil_to_blob(image_pil)
+    results['pil_to_blob'] = measure(lambda: helper.pil_to_blob(image_pil), repeat)
+    results['blob_to_pil'] = measure(lambda: helper.blob_to_pil(image_blob).load(), repeat)
+
+    # Simpan satu hasil deteksi (encode + image store + commit)
+    detected_image_pil, detections_data = helper.perform_detection(image_pil, use_cache=False, tiled=False)
+    results['save_detection_to_db'] = measure(
+        lambda: helper.save_detection_to_db("benchmark.jpg", image_pil, detected_image_pil, detections_data), repeat
+    )
+    helper.delete_detection_records(delete_all=True)
+
+    # Ambil dan hapus seluruh riwayat pada beberapa ukuran database
+    for record_count in record_counts:
+        populate_records(record_count, image_pil, detections_data)
+        results[f'get_all_detection_results_from_db.{record_count}'] = measure(
+            helper.get_all_detection_results_from_db, max(repeat // 5, 3)
+        )
+        results[f'get_detection_results_page.{record_count}'] = measure(
+            lambda: helper.get_detection_results_page(settings.HISTORY_DEFAULT_PAGE_SIZE), repeat
+        )
+        started_at = time.perf_counter()
+        helper.delete_detection_records(delete_all=True)
+        results[f'delete_all.{record_count}'] = summarize([(time.perf_counter() - started_at) * 1000])
+    return results
+
+
+# --- Perbandingan dengan Baseline ---
+def compare_results(current, baseline, threshold):
+    """Mengembalikan daftar (nama, median baseline, median sekarang, rasio, regresi?)."""
+    rows = []
+    for name, stats in current.items():
+        if name not in baseline:
+            continue
+        baseline_median = baseline[name]['median_ms']
+        ratio = stats['median_ms'] / baseline_median if baseline_median > 0 else 1.0
+        rows.append((name, baseline_median, stats['median_ms'], ratio, ratio > 1 + threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark jalur panas dengan model YOLO palsu.")
+    parser.add_argument("--boxes", type=int, default=20, help="Jumlah box per gambar dari model palsu.")
+    parser.add_argument("--repeat", type=int, default=20, help="Jumlah pengulangan per benchmark.")
+    parser.add_argument("--records", type=int, nargs="+", default=[1000, 10000], help="Ukuran database untuk benchmark ambil/hapus.")
+    parser.add_argument("--output", help="Simpan hasil sebagai JSON (mis. untuk baseline).")
+    parser.add_argument("--compare", help="File JSON baseline untuk dibandingkan.")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Kenaikan median yang dianggap regresi (0.15 = 15%%).")
+    args = parser.parse_args(argv)
+
+    try:
+        results = run_benchmarks(args.boxes, args.repeat, args.records)
+    finally:
+        database.engine.dispose()
+        helper.ENCODE_POOL.shutdown(wait=True)
+        shutil.rmtree(_WORKDIR, ignore_errors=True)
+
+    print(f"{'Benchmark':<45} {'median':>10} {'p95':>10} {'min':>10}")
+    for name, stats in results.items():
+        print(f"{name:<45} {stats['median_ms']:>8.2f}ms {stats['p95_ms']:>8.2f}ms {stats['min_ms']:>8.2f}ms")
+
+    if args.output:
+        report = {
+            'meta': {
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'machine': platform.platform(),
+                'boxes': args.boxes,
+                'repeat': args.repeat,
+            },
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nHasil disimpan ke {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        rows = compare_results(results, baseline, args.threshold)
+        print(f"\n{'Benchmark':<45} {'baseline':>10} {'sekarang':>10} {'rasio':>7}")
+        for name, baseline_median, current_median, ratio, regressed in rows:
+            flag = "  REGRESI" if regressed else ""
+            print(f"{name:<45} {baseline_median:>8.2f}ms {current_median:>8.2f}ms {ratio:>6.2f}x{flag}")
+        regressions = [row for row in rows if row[4]]
+        if regressions:
+            print(f"\n{len(regressions)} benchmark melambat lebih dari {args.threshold:.0%} dibanding baseline.")
+            return 1
+        print("\nTidak ada regresi dibanding baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,62 @@
+"""Uji beban layanan HTTP inferensi: latensi p50/p99 dan throughput (req/s).
+
+Jalankan layanan terlebih dahulu (python -m sidetek serve), lalu dari direktori proyek:
+    python -m benchmarks.load_test [--url http://127.0.0.1:8502/detect] [--concurrency 16] [--requests 500]
+"""
+import argparse
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+import settings
+
+
+def send_request(url, image_bytes, timeout):
+    request = urllib.request.Request(url, data=image_bytes, headers={'Content-Type': 'application/octet-stream'})
+    started_at = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, TimeoutError):
+        status = 'error'
+    return status, time.perf_counter() - started_at
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Uji beban layanan HTTP inferensi APD.")
+    parser.add_argument("--url", default=f"http://{settings.SERVICE_HOST}:{settings.SERVICE_PORT}/detect")
+    parser.add_argument("--image", type=Path, default=settings.DEFAULT_IMAGE, help="Gambar yang dikirim berulang.")
+    parser.add_argument("--concurrency", type=int, default=16, help="Jumlah klien paralel.")
+    parser.add_argument("--requests", type=int, default=500, help="Total permintaan.")
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args(argv)
+
+    image_bytes = args.image.read_bytes()
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        responses = list(pool.map(
+            lambda _: send_request(args.url, image_bytes, args.timeout), range(args.requests)
+        ))
+    elapsed = time.perf_counter() - started_at
+
+    status_counts = Counter(status for status, _ in responses)
+    latencies_ms = np.array([duration for status, duration in responses if status == 200]) * 1000
+    print(f"Permintaan: {args.requests} dengan {args.concurrency} klien paralel dalam {elapsed:.1f} s")
+    print("Status: " + ", ".join(f"{status}={count}" for status, count in sorted(status_counts.items(), key=str)))
+    if len(latencies_ms):
+        print(
+            f"Latensi sukses: p50 {np.percentile(latencies_ms, 50):.1f} ms | "
+            f"p99 {np.percentile(latencies_ms, 99):.1f} ms | maks {latencies_ms.max():.1f} ms"
+        )
+    print(f"Throughput sukses: {status_counts.get(200, 0) / elapsed:.1f} req/s")
+    return 0 if status_counts.get(200) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,7 +1,7 @@
-from sqlalchemy import Column, Integer, String, BLOB, DateTime, JSON, create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import Column, Integer, Float, String, BLOB, DateTime, JSON, ForeignKey, Index, UniqueConstraint, create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker, declarative_base, relationship
 from datetime import datetime, timezone
-import settings 
+import settings
 from zoneinfo import ZoneInfo
 
 Base = declarative_base()
@@ -10,16 +10,159 @@ class DetectionHistory(Base):
     __tablename__ = "detection_history"
 
     id = Column(Integer, primary_key=True, index=True)
-    timestamp = Column(DateTime, default=lambda: datetime.now(ZoneInfo("Asia/Jakarta")))
-    original_image_name = Column(String, nullable=True) 
-    original_image_blob = Column(BLOB, nullable=False) 
-    detected_image_blob = Column(BLOB, nullable=False) 
-    detections_data = Column(JSON) 
+    timestamp = Column(DateTime, default=lambda: datetime.now(ZoneInfo("Asia/Jakarta")), index=True)
+    original_image_name = Column(String, nullable=True)
+    # Kolom BLOB hanya untuk data lama; gambar baru disimpan di image store
+    original_image_blob = Column(BLOB, nullable=True)
+    detected_image_blob = Column(BLOB, nullable=True)
+    original_image_hash = Column(String(64), nullable=True, index=True)
+    original_image_size = Column(Integer, nullable=True)
+    original_image_format = Column(String(8), nullable=True)
+    detected_image_hash = Column(String(64), nullable=True, index=True)
+    detected_image_size = Column(Integer, nullable=True)
+    detected_image_format = Column(String(8), nullable=True)
+    # Thumbnail ringan untuk halaman riwayat (juga di image store)
+    original_thumb_hash = Column(String(64), nullable=True)
+    detected_thumb_hash = Column(String(64), nullable=True)
+    thumbnail_format = Column(String(8), nullable=True)
+    detections_data = Column(JSON)
+
+    objects = relationship("DetectionObject", back_populates="record", cascade="all, delete-orphan", passive_deletes=True)
+
+class DetectionObject(Base):
+    """Satu baris per objek terdeteksi, untuk query kepatuhan berbasis SQL (per label/waktu)."""
+    __tablename__ = "detection_objects"
+
+    id = Column(Integer, primary_key=True)
+    record_id = Column(Integer, ForeignKey("detection_history.id", ondelete="CASCADE"), nullable=False, index=True)
+    label = Column(String, nullable=False)
+    confidence = Column(Float, nullable=False)
+    x1 = Column(Integer)
+    y1 = Column(Integer)
+    x2 = Column(Integer)
+    y2 = Column(Integer)
+    track_id = Column(Integer, nullable=True) # Identitas pekerja dari tracker webcam
+    timestamp = Column(DateTime, nullable=False, index=True) # Disalin dari record induk
+
+    record = relationship("DetectionHistory", back_populates="objects")
+
+    __table_args__ = (
+        Index("ix_detection_objects_label_timestamp", "label", "timestamp"),
+    )
+
+# Label khusus pada rollup untuk total semua gambar/objek dalam satu periode
+ROLLUP_ALL_LABEL = '*'
+
+class DetectionRollup(Base):
+    """Agregat jumlah objek dan gambar per label per jam/hari, diperbarui setiap simpan/hapus."""
+    __tablename__ = "detection_rollups"
+
+    id = Column(Integer, primary_key=True)
+    period = Column(String(8), nullable=False) # 'hour' atau 'day'
+    period_start = Column(DateTime, nullable=False)
+    label = Column(String, nullable=False)
+    object_count = Column(Integer, nullable=False, default=0)
+    image_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("period", "period_start", "label", name="uq_detection_rollups_bucket"),
+    )
 
 # Engine dan SessionLocal
 engine = settings.engine
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def init_db():
-    """Membuat tabel database jika belum ada."""
+    """Membuat tabel database jika belum ada, lalu menyesuaikan skema database lama."""
     Base.metadata.create_all(bind=engine)
+    migrate_schema()
+    if not incremental_auto_vacuum_enabled():
+        print("Database belum memakai auto_vacuum INCREMENTAL; jalankan `python -m sidetek vacuum` "
+              "agar ruang bekas record yang dihapus bisa dikembalikan.")
+
+def incremental_auto_vacuum_enabled():
+    with engine.connect() as conn:
+        return conn.execute(text("PRAGMA auto_vacuum")).scalar() == 2 # 2 = INCREMENTAL
+
+def enable_incremental_auto_vacuum():
+    """Mode auto_vacuum INCREMENTAL memungkinkan ruang kosong dikembalikan setelah penghapusan.
+
+    Database baru mendapatkannya dari hook koneksi (settings); database lama hanya bisa
+    dikonversi dengan VACUUM penuh. Karena bisa lama dan mengunci database, konversi ini
+    hanya dijalankan lewat `python -m sidetek vacuum`. Mengembalikan False jika sudah aktif.
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if conn.execute(text("PRAGMA auto_vacuum")).scalar() == 2:
+            return False
+        conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+        conn.execute(text("VACUUM"))
+        return True
+
+def migrate_schema():
+    """Menyesuaikan tabel di database lama dengan model saat ini.
+
+    Kolom baru ditambahkan dengan ALTER TABLE dan index yang belum ada dibuat.
+    """
+    _rebuild_legacy_history_table()
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing_columns = {col['name'] for col in inspect(conn).get_columns(table.name)}
+            missing_columns = [col for col in table.columns if col.name not in existing_columns]
+            for col in missing_columns:
+                col_type = col.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {col.name} {col_type}"))
+            if missing_columns:
+                print(f"Kolom baru pada {table.name}: {', '.join(col.name for col in missing_columns)}.")
+            # create_all tidak menambah index ke tabel yang sudah ada (mis. index timestamp)
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
+def _rebuild_legacy_history_table():
+    """SQLite tidak bisa mengubah constraint NOT NULL, jadi jika kolom BLOB lama di
+    detection_history masih NOT NULL, tabel dibangun ulang dan datanya disalin."""
+    table = DetectionHistory.__table__
+    existing_columns = {col['name']: col for col in inspect(engine).get_columns(table.name)}
+    blob_not_nullable = any(
+        not existing_columns[name]['nullable']
+        for name in ('original_image_blob', 'detected_image_blob')
+        if name in existing_columns
+    )
+    if blob_not_nullable:
+        _rebuild_table(table, existing_columns)
+    _repair_dangling_foreign_keys()
+
+def _repair_dangling_foreign_keys():
+    """Versi sebelumnya membangun ulang detection_history tanpa legacy_alter_table, sehingga
+    foreign key detection_objects ikut diarahkan ke tabel legacy yang kemudian dihapus."""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        foreign_keys = inspector.get_foreign_keys(table.name)
+        if any(fk['referred_table'] not in existing_tables for fk in foreign_keys):
+            existing_columns = {col['name']: col for col in inspector.get_columns(table.name)}
+            _rebuild_table(table, existing_columns)
+
+def _rebuild_table(table, existing_columns):
+    """Membangun ulang tabel mengikuti model lalu menyalin datanya dari tabel lama."""
+    legacy_table = f"{table.name}_legacy"
+    common_columns = ", ".join(name for name in existing_columns if name in table.columns)
+    with engine.begin() as conn:
+        # Tanpa legacy_alter_table, SQLite >= 3.26 ikut mengubah foreign key tabel lain
+        # (mis. detection_objects) agar menunjuk ke tabel legacy yang akan dihapus
+        conn.execute(text("PRAGMA legacy_alter_table = ON"))
+        try:
+            conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {legacy_table}"))
+            # Index lama ikut terbawa ke tabel legacy; hapus agar nama index bisa dibuat ulang
+            for index in inspect(conn).get_indexes(legacy_table):
+                conn.execute(text(f"DROP INDEX IF EXISTS {index['name']}"))
+            table.create(bind=conn)
+            conn.execute(text(
+                f"INSERT INTO {table.name} ({common_columns}) SELECT {common_columns} FROM {legacy_table}"
+            ))
+            conn.execute(text(f"DROP TABLE {legacy_table}"))
+        finally:
+            # Koneksi kembali ke pool, jadi pragma dikembalikan ke nilai bawaan
+            conn.execute(text("PRAGMA legacy_alter_table = OFF"))
+    print(f"Tabel {table.name} dibangun ulang mengikuti skema terbaru.")
@@ -1,63 +1,572 @@
 from PIL import Image
 import io
 import base64
-from ultralytics import YOLO # Asumsi menggunakan ultralytics untuk YOLOv11
+import hashlib
+import os
+from pathlib import Path
+import numpy as np
+from itertools import islice
+from collections import Counter, defaultdict
+import threading
+import time
+import atexit
+from contextlib import contextmanager
+from collections import OrderedDict
 import settings
-from database import SessionLocal, DetectionHistory
+from database import SessionLocal, DetectionHistory, DetectionObject, DetectionRollup, ROLLUP_ALL_LABEL, engine
+from image_store import get_image_store
+from image_codec import ENCODE_POOL, submit_encode, encode_image, encode_with_policy
+from metrics import timed, register_gauge
+from inference_pool import InferenceWorkerPool
 from datetime import datetime
+from sqlalchemy import func, or_, and_, exists, distinct
+from sqlalchemy.orm import defer
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from zoneinfo import ZoneInfo
 
+# --- Pencatatan Waktu Startup ---
+@contextmanager
+def timed_phase(phase_name):
+    """Mencatat lama sebuah fase (mis. import, muat model, warm-up) ke log."""
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        print(f"[startup] {phase_name}: {(time.perf_counter() - started_at) * 1000:.0f} ms")
+
 # --- Fungsi Model YOLO ---
+# ultralytics (dan torch) berat untuk di-import, jadi baru dimuat saat model dibutuhkan
 MODEL_YOLO = None
+ACTIVE_MODEL_NAME = None
+INFERENCE_POOL = None # Pool proses untuk model default jika INFERENCE_WORKERS > 0
 
-def load_yolo_model(model_path=settings.DETECTION_MODEL_PATH):
-    """Memuat model YOLO. Dipanggil dari app.py agar model tidak selalu reload."""
-    global MODEL_YOLO
-    if MODEL_YOLO is None:
+def _resolve_weights_path(model_path, backend=settings.INFERENCE_BACKEND):
+    """Path file yang akan dimuat: bobot .pt, atau artefak backend (diekspor dulu bila perlu)."""
+    if backend == 'pytorch':
+        return model_path
+    try:
+        return export_model(backend, model_path)
+    except Exception as e:
+        print(f"Error ekspor model ke backend {backend}, memakai PyTorch: {e}")
+        return model_path
+
+def _load_weights_file(weights_path):
+    """Memuat model YOLO dari file bobot/artefak yang sudah ada, tanpa ekspor."""
+    with timed_phase("import ultralytics"):
+        from ultralytics import YOLO # Asumsi menggunakan ultralytics untuk YOLOv11
+    configure_inference_threads(settings.INFERENCE_THREADS)
+    with timed_phase(f"muat model {Path(weights_path).name}"):
+        model = YOLO(str(weights_path), task='detect')
+    print(f"Model YOLOv11 berhasil dimuat ({weights_path}).")
+    return model
+
+def _load_model_weights(model_path, backend=settings.INFERENCE_BACKEND):
+    """Memuat satu model YOLO dari bobot .pt atau artefak backend hasil ekspor."""
+    return _load_weights_file(_resolve_weights_path(model_path, backend))
+
+class ModelRegistry:
+    """Menyimpan beberapa model bernama di memori sekaligus, dengan eviksi LRU.
+
+    Setiap model yang baru dimuat langsung di-warm-up di thread latar belakang.
+    """
+
+    def __init__(self, max_models=settings.MODEL_REGISTRY_MAX_MODELS):
+        self.max_models = max_models
+        self._models = OrderedDict()
+        self._warm_events = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_name, model_path=None, backend=settings.INFERENCE_BACKEND):
+        with self._lock:
+            if model_name in self._models:
+                self._models.move_to_end(model_name)
+                return self._models[model_name]
+
+            model = _load_model_weights(model_path or settings.MODEL_WEIGHTS[model_name], backend)
+            self._models[model_name] = model
+            while len(self._models) > self.max_models:
+                evicted_name, evicted_model = self._models.popitem(last=False)
+                self._warm_events.pop(id(evicted_model), None)
+                print(f"Model '{evicted_name}' dikeluarkan dari registry (LRU).")
+            self._warm_events[id(model)] = warm_up_model(model)
+            return model
+
+    def wait_until_warm(self, model, timeout=None):
+        warm_event = self._warm_events.get(id(model))
+        if warm_event is not None:
+            warm_event.wait(timeout)
+
+    def loaded_model_names(self):
+        with self._lock:
+            return list(self._models)
+
+MODELS = ModelRegistry()
+
+def warm_up_model(model):
+    """Menjalankan satu inferensi dummy di background agar inisialisasi graf tidak dibayar deteksi pertama.
+
+    Mengembalikan threading.Event yang di-set setelah warm-up selesai.
+    """
+    warm_event = threading.Event()
+
+    def _run():
         try:
-            MODEL_YOLO = YOLO(model_path)
-            print("Model YOLOv11 berhasil dimuat.")
+            with timed_phase("warm-up model"):
+                dummy_frame = np.zeros((settings.INFERENCE_IMGSZ, settings.INFERENCE_IMGSZ, 3), dtype=np.uint8)
+                model(dummy_frame, verbose=False)
         except Exception as e:
-            print(f"Error memuat model YOLOv11: {e}")
-            MODEL_YOLO = None
+            print(f"Error warm-up model: {e}")
+        finally:
+            warm_event.set()
+
+    threading.Thread(target=_run, daemon=True).start()
+    return warm_event
+
+def load_yolo_model(model_path=settings.DETECTION_MODEL_PATH, backend=settings.INFERENCE_BACKEND):
+    """Memuat model YOLO. Dipanggil dari app.py agar model tidak selalu reload.
+
+    Untuk backend selain 'pytorch', artefak hasil ekspor dipakai (dan dibuat jika belum ada).
+    Jika ekspor gagal, model PyTorch dipakai sebagai cadangan. Jika sudah ada model aktif,
+    model tersebut dikembalikan; untuk berganti model gunakan use_model().
+    """
+    if MODEL_YOLO is None:
+        use_model(settings.DEFAULT_MODEL_NAME, model_path, backend)
+    return MODEL_YOLO
+
+def start_inference_pool(num_workers, model_path=settings.DETECTION_MODEL_PATH, backend=settings.INFERENCE_BACKEND):
+    """Menjalankan pool proses inferensi; dipakai oleh perform_detection* sebagai pengganti model.
+
+    Ekspor backend dilakukan sekali di sini, sehingga worker hanya memuat artefak yang sudah jadi.
+    """
+    weights_path = _resolve_weights_path(model_path, backend)
+    with timed_phase(f"start {num_workers} worker inferensi"):
+        pool = InferenceWorkerPool(num_workers, weights_path)
+    atexit.register(pool.close)
+    register_gauge('inference_pool_busy_slots', pool.busy_slots)
+    return pool
+
+def use_model(model_name, model_path=None, backend=settings.INFERENCE_BACKEND):
+    """Menjadikan model bernama dari registry sebagai model aktif (MODEL_YOLO).
+
+    MODEL_YOLO dan ACTIVE_MODEL_NAME selalu diperbarui bersama karena nama model menjadi
+    bagian kunci cache deteksi. Model default dilayani pool proses jika INFERENCE_WORKERS > 0.
+    """
+    global MODEL_YOLO, ACTIVE_MODEL_NAME, INFERENCE_POOL
+    try:
+        if model_name == settings.DEFAULT_MODEL_NAME and settings.INFERENCE_WORKERS > 0:
+            if INFERENCE_POOL is None:
+                # Model dimuat di proses worker; proses utama hanya memegang pool-nya
+                INFERENCE_POOL = start_inference_pool(
+                    settings.INFERENCE_WORKERS, model_path or settings.DETECTION_MODEL_PATH, backend
+                )
+            model = INFERENCE_POOL
+        else:
+            model = MODELS.get(model_name, model_path, backend)
+        MODEL_YOLO, ACTIVE_MODEL_NAME = model, model_name
+    except Exception as e:
+        print(f"Error memuat model '{model_name}': {e}")
+        MODEL_YOLO, ACTIVE_MODEL_NAME = None, None
     return MODEL_YOLO
 
-def perform_detection(image_pil, confidence_threshold=0.35):
+def _active_model():
+    """Model aktif yang siap dipakai; menunggu warm-up selesai agar tidak berjalan bersamaan."""
     if MODEL_YOLO is None:
         raise Exception("Model YOLOv11 belum dimuat.")
+    MODELS.wait_until_warm(MODEL_YOLO)
+    return MODEL_YOLO
+
+def configure_inference_threads(num_threads):
+    """Mengatur jumlah thread CPU inferensi PyTorch.
+
+    Hanya backend 'pytorch' yang terpengaruh: ultralytics membuat sesi ONNX Runtime dan
+    model OpenVINO tanpa opsi jumlah thread, sehingga keduanya memakai bawaan runtime
+    (semua core fisik).
+    """
+    try:
+        import torch
+        torch.set_num_threads(num_threads)
+    except ImportError:
+        pass
+
+def exported_model_path(backend, model_path=settings.DETECTION_MODEL_PATH):
+    """Lokasi artefak hasil ekspor untuk backend tertentu (mengikuti penamaan ultralytics)."""
+    model_path = Path(model_path)
+    return {
+        'onnx': model_path.with_suffix('.onnx'),
+        'onnx-int8': model_path.with_name(f"{model_path.stem}-int8.onnx"),
+        'openvino': model_path.with_name(f"{model_path.stem}_openvino_model"),
+        'openvino-int8': model_path.with_name(f"{model_path.stem}_int8_openvino_model"),
+    }[backend]
+
+def export_model(backend, model_path=settings.DETECTION_MODEL_PATH, force=False):
+    """Mengekspor bobot .pt ke backend CPU dan mengembalikan path artefaknya.
+
+    Artefak yang sudah ada dan lebih baru dari file .pt langsung dipakai ulang.
+    """
+    model_path = Path(model_path)
+    target_path = exported_model_path(backend, model_path)
+    if not force and target_path.exists() and target_path.stat().st_mtime >= model_path.stat().st_mtime:
+        return target_path
+
+    from ultralytics import YOLO
+    print(f"Mengekspor {model_path.name} ke backend {backend}...")
+    source_model = YOLO(str(model_path))
+    if backend == 'onnx':
+        exported = source_model.export(format='onnx', imgsz=settings.INFERENCE_IMGSZ, simplify=True)
+    elif backend == 'onnx-int8':
+        # Kuantisasi dinamis ONNX Runtime tidak membutuhkan data kalibrasi
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        fp32_path = export_model('onnx', model_path, force=force)
+        quantize_dynamic(str(fp32_path), str(target_path), weight_type=QuantType.QUInt8)
+        exported = target_path
+    elif backend == 'openvino':
+        exported = source_model.export(format='openvino', imgsz=settings.INFERENCE_IMGSZ)
+    elif backend == 'openvino-int8':
+        export_kwargs = {'data': settings.INT8_CALIBRATION_DATA} if settings.INT8_CALIBRATION_DATA else {}
+        exported = source_model.export(format='openvino', imgsz=settings.INFERENCE_IMGSZ, int8=True, **export_kwargs)
+    else:
+        raise ValueError(f"Backend inferensi tidak dikenal: {backend}")
+    return Path(exported)
+
+# --- Cache Hasil Inferensi ---
+_CACHE_ENTRY_OVERHEAD = 512 # Perkiraan overhead per entri (tuple, kunci, dict names)
+
+class DetectionResultCache:
+    """Cache LRU hasil deteksi mentah, dibatasi total ukuran dalam bytes.
+
+    Kunci berupa (id model, hash isi gambar). Nilai berupa array (cls, conf, xyxy) dari satu
+    inferensi dengan ambang rendah, sehingga ambang yang lebih tinggi cukup difilter ulang.
+    """
+
+    def __init__(self, max_bytes=settings.DETECTION_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._current_bytes = 0
+        self._lock = threading.Lock()
 
-    results = MODEL_YOLO(image_pil, conf=confidence_threshold)
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        class_ids, confidences, bboxes, _ = value
+        for array in (class_ids, confidences, bboxes):
+            array.setflags(write=False) # Cegah hasil cache termodifikasi pemanggil
+        size = class_ids.nbytes + confidences.nbytes + bboxes.nbytes + _CACHE_ENTRY_OVERHEAD
+        with self._lock:
+            if key in self._entries:
+                self._current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._current_bytes += size
+            while self._current_bytes > self.max_bytes and self._entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._current_bytes -= evicted_size
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'bytes': self._current_bytes,
+            }
+
+DETECTION_CACHE = DetectionResultCache()
+
+def image_content_hash(image_pil):
+    """Hash SHA-256 dari isi piksel gambar (bukan dari file), beserta mode dan ukurannya."""
+    digest = hashlib.sha256(f"{image_pil.mode}:{image_pil.size}".encode())
+    digest.update(image_pil.tobytes())
+    return digest.hexdigest()
+
+def perform_detection(image_pil, confidence_threshold=0.35, render=True, use_cache=True, tiled=None):
+    """Deteksi APD pada satu gambar.
+
+    Jika render=False, plotting dilewati dan gambar hasil dikembalikan sebagai None.
+    Dengan use_cache=True, gambar yang sama tidak diinferensi ulang; perubahan ambang
+    kepercayaan cukup memfilter box hasil cache lalu menggambarnya kembali.
+    tiled=None memakai inferensi tile otomatis untuk gambar besar; True/False memaksa.
+    """
+    model = _active_model()
+    if tiled is None:
+        tiled = max(image_pil.size) > settings.TILED_INFERENCE_MIN_SIDE
+
+    if use_cache and confidence_threshold >= settings.DETECTION_CACHE_BASE_CONFIDENCE:
+        cache_key = (ACTIVE_MODEL_NAME, settings.INFERENCE_BACKEND, tiled, image_content_hash(image_pil))
+        cached = DETECTION_CACHE.get(cache_key)
+        if cached is None:
+            with timed('detect.inference'):
+                cached = _detect_arrays(model, image_pil, settings.DETECTION_CACHE_BASE_CONFIDENCE, tiled)
+            DETECTION_CACHE.put(cache_key, cached)
+
+        class_ids, confidences, bboxes, names = cached
+        keep = confidences >= confidence_threshold
+        detections_data = _detections_from_arrays(class_ids[keep], confidences[keep], bboxes[keep], names)
+        with timed('detect.plot'):
+            result_image_pil = draw_detections(image_pil, detections_data) if render else None
+        return result_image_pil, detections_data
+
+    if tiled or isinstance(model, InferenceWorkerPool):
+        with timed('detect.inference'):
+            detection_arrays = _detect_arrays(model, image_pil, confidence_threshold, tiled=tiled)
+        detections_data = _detections_from_arrays(*detection_arrays)
+        with timed('detect.plot'):
+            result_image_pil = draw_detections(image_pil, detections_data) if render else None
+        return result_image_pil, detections_data
+
+    with timed('detect.inference'):
+        results = model(image_pil, conf=confidence_threshold)
 
     # Dapatkan gambar hasil dengan bounding box dari ultralytics
-    annotated_frame_bgr = results[0].plot() # Menghasilkan numpy array BGR
-    annotated_frame_rgb = annotated_frame_bgr[..., ::-1] # Konversi BGR ke RGB
-    result_image_pil = Image.fromarray(annotated_frame_rgb)
+    with timed('detect.plot'):
+        result_image_pil = _result_to_pil(results[0]) if render else None
 
     # Ekstrak data deteksi
-    detections_data = []
-    names = MODEL_YOLO.names 
-    for r in results:
-        for box in r.boxes:
-            class_id = int(box.cls[0])
-            label = names.get(class_id, f'Class_{class_id}')
-            confidence = float(box.conf[0])
-            # Koordinat bbox dalam format [x1, y1, x2, y2]
-            bbox = [int(coord) for coord in box.xyxy[0].tolist()]
-            
-            detections_data.append({
-                'label': label,
-                'confidence': round(confidence, 3),
-                'bbox': bbox
-            })
+    with timed('detect.extract'):
+        detections_data = []
+        for r in results:
+            detections_data.extend(_extract_detections(r))
             
     return result_image_pil, detections_data
 
+def _detect_arrays(model, image_pil, confidence_threshold, tiled=False):
+    """Inferensi mentah; mengembalikan (cls, conf, xyxy, names)."""
+    if isinstance(model, InferenceWorkerPool):
+        return model.detect(image_pil, confidence_threshold, tiled)
+    if tiled:
+        return _detect_tiled_arrays(model, image_pil, confidence_threshold)
+    results = model(image_pil, conf=confidence_threshold)
+    return (*_result_to_arrays(results[0]), results[0].names)
+
+# --- Inferensi Tile (Sliced) ---
+def _tile_starts(length, tile_size, stride):
+    """Posisi awal tile pada satu sumbu; tile terakhir selalu menempel ke tepi gambar."""
+    if length <= tile_size:
+        return [0]
+    starts = list(range(0, length - tile_size + 1, stride))
+    if starts[-1] != length - tile_size:
+        starts.append(length - tile_size)
+    return starts
+
+def _detect_tiled_arrays(model, image_pil, confidence_threshold,
+                         tile_size=settings.TILE_SIZE, overlap=settings.TILE_OVERLAP):
+    """Inferensi per tile yang saling tumpang tindih, digabung kembali ke koordinat gambar penuh.
+
+    Tile dikirim ke model per batch sehingga diproses paralel dalam satu forward pass;
+    box dari tile yang bertumpang tindih digabung dengan NMS per kelas.
+    """
+    if isinstance(image_pil, np.ndarray):
+        image_bgr = image_pil # Worker pool mengirim frame sebagai array BGR
+    else:
+        image_bgr = np.ascontiguousarray(np.asarray(image_pil.convert('RGB'))[..., ::-1])
+    height, width = image_bgr.shape[:2]
+    stride = max(int(tile_size * (1 - overlap)), 1)
+    # Tile berupa view dari satu buffer, tanpa salinan tambahan
+    tiles = [
+        (x, y, image_bgr[y:y + tile_size, x:x + tile_size])
+        for y in _tile_starts(height, tile_size, stride)
+        for x in _tile_starts(width, tile_size, stride)
+    ]
+
+    all_class_ids, all_confidences, all_bboxes = [], [], []
+    names = model.names
+    for start in range(0, len(tiles), settings.TILE_BATCH_SIZE):
+        batch = tiles[start:start + settings.TILE_BATCH_SIZE]
+        results = model([tile for _, _, tile in batch], conf=confidence_threshold)
+        for (x, y, _), result in zip(batch, results):
+            class_ids, confidences, bboxes = _result_to_arrays(result)
+            all_class_ids.append(class_ids)
+            all_confidences.append(confidences)
+            all_bboxes.append(bboxes + np.array([x, y, x, y]))
+
+    if settings.TILE_INCLUDE_FULL_IMAGE:
+        # Pass gambar utuh menjaga objek besar yang terpotong oleh tile
+        results = model(image_bgr, conf=confidence_threshold)
+        class_ids, confidences, bboxes = _result_to_arrays(results[0])
+        all_class_ids.append(class_ids)
+        all_confidences.append(confidences)
+        all_bboxes.append(bboxes)
+
+    class_ids = np.concatenate(all_class_ids)
+    confidences = np.concatenate(all_confidences)
+    bboxes = np.concatenate(all_bboxes).reshape(-1, 4)
+    keep = _nms_per_class(bboxes, confidences, class_ids, settings.TILE_NMS_IOU)
+    return class_ids[keep], confidences[keep], bboxes[keep], names
+
+def _nms_per_class(bboxes, confidences, class_ids, iou_threshold):
+    """Non-maximum suppression greedy per kelas. Mengembalikan indeks box yang dipertahankan."""
+    if len(bboxes) == 0:
+        return np.empty(0, dtype=int)
+    # Geser box per kelas agar box beda kelas tidak saling menekan
+    offsets = class_ids.astype(np.float64)[:, None] * (bboxes.max() + 1)
+    boxes = bboxes.astype(np.float64) + offsets
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    order = np.argsort(-confidences)
+    keep = []
+    while order.size:
+        best = order[0]
+        keep.append(best)
+        rest = order[1:]
+        x1 = np.maximum(boxes[best, 0], boxes[rest, 0])
+        y1 = np.maximum(boxes[best, 1], boxes[rest, 1])
+        x2 = np.minimum(boxes[best, 2], boxes[rest, 2])
+        y2 = np.minimum(boxes[best, 3], boxes[rest, 3])
+        intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+        iou = intersection / np.maximum(areas[best] + areas[rest] - intersection, 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=int)
+
+def perform_detection_batch(images_pil, confidence_threshold=0.35, batch_size=settings.DETECTION_BATCH_SIZE, render=True):
+    """Deteksi pada banyak gambar, dikirim ke model per batch.
+
+    Hasil di-yield bertahap per gambar sebagai tuple
+    (index, original_image_pil, result_image_pil, detections_data).
+    """
+    model = _active_model()
+
+    images_iter = iter(images_pil)
+    start_index = 0
+    while True:
+        batch = list(islice(images_iter, max(int(batch_size), 1)))
+        if not batch:
+            break
+        if isinstance(model, InferenceWorkerPool):
+            # Pool worker: semua gambar dikirim sekaligus, tile ditentukan per gambar oleh worker
+            with timed('detect.batch_inference'):
+                futures = [
+                    model.submit(image_pil, confidence_threshold, max(image_pil.size) > settings.TILED_INFERENCE_MIN_SIDE)
+                    for image_pil in batch
+                ]
+                batch_arrays = [future.result(timeout=settings.INFERENCE_WORKER_TIMEOUT) for future in futures]
+            for offset, (image_pil, detection_arrays) in enumerate(zip(batch, batch_arrays)):
+                detections_data = _detections_from_arrays(*detection_arrays, model.names)
+                result_image_pil = draw_detections(image_pil, detections_data) if render else None
+                yield start_index + offset, image_pil, result_image_pil, detections_data
+            start_index += len(batch)
+            continue
+        # Gambar beresolusi tinggi diproses dengan inferensi tile, sisanya dalam satu batch
+        regular_images = [image_pil for image_pil in batch if max(image_pil.size) <= settings.TILED_INFERENCE_MIN_SIDE]
+        with timed('detect.batch_inference'):
+            regular_results = iter(model(regular_images, conf=confidence_threshold) if regular_images else [])
+        for offset, image_pil in enumerate(batch):
+            if max(image_pil.size) > settings.TILED_INFERENCE_MIN_SIDE:
+                detections_data = _detections_from_arrays(
+                    *_detect_arrays(model, image_pil, confidence_threshold, tiled=True)
+                )
+                result_image_pil = draw_detections(image_pil, detections_data) if render else None
+            else:
+                result = next(regular_results)
+                detections_data = _extract_detections(result)
+                result_image_pil = _result_to_pil(result) if render else None
+            yield start_index + offset, image_pil, result_image_pil, detections_data
+        start_index += len(batch)
+
+def _result_to_pil(result):
+    """Mengubah hasil plot ultralytics (numpy BGR) menjadi PIL Image RGB."""
+    annotated_frame_bgr = result.plot() # Menghasilkan numpy array BGR
+    annotated_frame_rgb = annotated_frame_bgr[..., ::-1] # Konversi BGR ke RGB
+    return Image.fromarray(annotated_frame_rgb)
+
+def _result_to_arrays(result):
+    """Konversi box satu hasil ultralytics ke array NumPy (cls, conf, xyxy) sekaligus."""
+    if result.boxes is None or len(result.boxes) == 0:
+        return np.empty(0, dtype=int), np.empty(0, dtype=np.float64), np.empty((0, 4), dtype=int)
+    boxes = result.boxes.cpu().numpy()
+    class_ids = boxes.cls.astype(int)
+    confidences = boxes.conf.astype(np.float64)
+    # Koordinat bbox dalam format [x1, y1, x2, y2]
+    bboxes = boxes.xyxy.astype(int)
+    return class_ids, confidences, bboxes
+
+def _extract_detections(result):
+    """Mengekstrak daftar label/confidence/bbox dari satu hasil ultralytics."""
+    return _detections_from_arrays(*_result_to_arrays(result), result.names)
+
+def _detections_from_arrays(class_ids, confidences, bboxes, names):
+    return [
+        {
+            'label': names.get(class_id, f'Class_{class_id}'),
+            'confidence': round(confidence, 3),
+            'bbox': bbox
+        }
+        for class_id, confidence, bbox in zip(class_ids.tolist(), confidences.tolist(), bboxes.tolist())
+    ]
+
+def perform_detection_ndarray(image_bgr, confidence_threshold=0.35, render=True):
+    """Deteksi APD langsung pada array BGR (mis. frame webcam) tanpa konversi ke PIL.
+
+    Jika render=True, box dan label digambar in-place ke buffer image_bgr.
+    """
+    model = _active_model()
+
+    if isinstance(model, InferenceWorkerPool):
+        with timed('detect.inference'):
+            detections_data = _detections_from_arrays(*model.detect(image_bgr, confidence_threshold))
+    else:
+        with timed('detect.inference'):
+            results = model(image_bgr, conf=confidence_threshold)
+        with timed('detect.extract'):
+            detections_data = _extract_detections(results[0])
+    if render:
+        image_bgr = draw_detections_ndarray(image_bgr, detections_data)
+    return image_bgr, detections_data
+
+def perform_detection_ndarray_batch(images_bgr, confidence_threshold=0.35):
+    """Deteksi pada beberapa array BGR (mis. frame dari banyak kamera) dalam satu forward pass.
+
+    Mengembalikan list data deteksi dengan urutan yang sama seperti images_bgr.
+    """
+    if not images_bgr:
+        return []
+    model = _active_model()
+    with timed('detect.batch_inference'):
+        if isinstance(model, InferenceWorkerPool):
+            # Frame dibagi ke worker dan diproses paralel lintas proses
+            return [_detections_from_arrays(*arrays) for arrays in model.detect_many(images_bgr, confidence_threshold)]
+        results = model(list(images_bgr), conf=confidence_threshold, verbose=False)
+    return [_extract_detections(result) for result in results]
+
+@timed('detect.draw')
+def draw_detections_ndarray(image_bgr, detections_data):
+    """Menggambar box dan label in-place ke array BGR dengan gaya yang sama seperti results.plot()."""
+    from ultralytics.utils.plotting import Annotator, colors
+    names = MODEL_YOLO.names
+    label_to_id = {name: class_id for class_id, name in names.items()}
+    annotator = Annotator(image_bgr, example=str(names))
+    for det in detections_data:
+        class_id = label_to_id.get(det['label'], 0)
+        track_prefix = f"#{det['track_id']} " if det.get('track_id') is not None else ""
+        annotator.box_label(det['bbox'], f"{track_prefix}{det['label']} {det['confidence']:.2f}", color=colors(class_id, True))
+    return annotator.result()
+
+def draw_detections(image_pil, detections_data):
+    """Menggambar box dan label dari data deteksi di atas salinan PIL Image."""
+    image_bgr = np.ascontiguousarray(np.asarray(image_pil.convert('RGB'))[..., ::-1])
+    return ndarray_to_pil(draw_detections_ndarray(image_bgr, detections_data))
+
+def ndarray_to_pil(image_bgr):
+    """Mengubah array BGR menjadi PIL Image RGB."""
+    with timed('convert.ndarray_to_pil'):
+        return Image.fromarray(image_bgr[..., ::-1])
+
 # --- Fungsi Konversi Gambar & BLOB ---
-def pil_to_blob(image_pil):
-    """Mengkonversi objek PIL Image ke data byte (BLOB)."""
-    byte_io = io.BytesIO()
-    image_pil.save(byte_io, format=image_pil.format if image_pil.format else 'PNG')
-    return byte_io.getvalue()
+def pil_to_blob(image_pil, codec=None):
+    """Mengkonversi objek PIL Image ke data byte (BLOB).
+
+    codec berupa dict (format/quality/compress_level); tanpa codec, format asli gambar
+    dipakai atau PNG jika formatnya tidak diketahui.
+    """
+    if codec is None:
+        codec = {'format': image_pil.format if image_pil.format else 'PNG'}
+    return encode_image(image_pil, codec)[0]
 
 def blob_to_pil(image_blob):
     """Mengkonversi data byte (BLOB) kembali ke objek PIL Image."""
@@ -67,22 +576,201 @@ def blob_to_base64(image_blob):
     """Mengkonversi data byte (BLOB) ke string base64 untuk ditampilkan di HTML."""
     return base64.b64encode(image_blob).decode('utf-8')
 
-# --- Fungsi Database ---
-def save_detection_to_db(original_image_name, original_image_pil, detected_image_pil, detections_data_list):
-    """Menyimpan hasil deteksi ke database."""
+# --- Fungsi Image Store ---
+IMAGE_STORE = get_image_store()
+
+# Gambar disimpan ke image store sebelum record yang merujuknya ter-commit. Selama jeda itu
+# hash-nya di-pin; penghapusan gambar tak terpakai memegang lock yang sama dan melewatinya.
+_IMAGE_PIN_LOCK = threading.Lock()
+_PINNED_IMAGE_HASHES = Counter()
+
+def _put_pinned(image_bytes):
+    """Menyimpan bytes ke image store; hash-nya ter-pin sampai _unpin_images dipanggil."""
+    image_hash = IMAGE_STORE.hash_bytes(image_bytes)
+    with _IMAGE_PIN_LOCK:
+        _PINNED_IMAGE_HASHES[image_hash] += 1
+    return IMAGE_STORE.put(image_bytes)
+
+def _unpin_images(image_hashes):
+    with _IMAGE_PIN_LOCK:
+        for image_hash in filter(None, image_hashes):
+            _PINNED_IMAGE_HASHES[image_hash] -= 1
+            if _PINNED_IMAGE_HASHES[image_hash] <= 0:
+                del _PINNED_IMAGE_HASHES[image_hash]
+
+def _record_image_hashes(records):
+    return [getattr(record, column.key) for record in records for column in _IMAGE_HASH_COLUMNS]
+
+def _store_image(image_pil, policy_name):
+    """Encode gambar sesuai kebijakan codec lalu simpan ke image store. Mengembalikan (hash, ukuran_bytes, format)."""
+    image_bytes, image_format = encode_with_policy(image_pil, policy_name)
+    return _put_pinned(image_bytes), len(image_bytes), image_format
+
+def _store_thumbnail(image_pil):
+    return _put_pinned(make_thumbnail_bytes(image_pil))
+
+def _load_image_bytes(record, image_hash, blob_column):
+    """Mengambil bytes gambar dari image store, atau dari kolom BLOB untuk record lama.
+
+    Kolom BLOB bisa di-defer, jadi untuk record lama BLOB diambil dengan query terpisah.
+    """
+    if image_hash:
+        return IMAGE_STORE.get(image_hash)
+    db = SessionLocal()
+    try:
+        return db.query(blob_column).filter(DetectionHistory.id == record.id).scalar()
+    finally:
+        db.close()
+
+def get_original_image_bytes(record):
+    return _load_image_bytes(record, record.original_image_hash, DetectionHistory.original_image_blob)
+
+def get_detected_image_bytes(record):
+    return _load_image_bytes(record, record.detected_image_hash, DetectionHistory.detected_image_blob)
+
+def make_thumbnail_bytes(image_pil, max_width=settings.THUMBNAIL_MAX_WIDTH):
+    """Membuat thumbnail terkompresi (JPEG/PNG sesuai settings) dari PIL Image."""
+    thumb = image_pil.copy()
+    # Batasi lebar saja; tinggi mengikuti rasio aspek
+    thumb.thumbnail((max_width, max_width * 100))
+    byte_io = io.BytesIO()
+    thumb.convert('RGB').save(byte_io, format=settings.THUMBNAIL_FORMAT, quality=settings.THUMBNAIL_QUALITY)
+    return byte_io.getvalue()
+
+def _is_passthrough_image(image_bytes):
+    """True jika bytes berupa JPEG/PNG, satu-satunya format yang diteruskan st.image tanpa encode ulang."""
+    return image_bytes.startswith(b'\xff\xd8') or image_bytes.startswith(b'\x89PNG')
+
+def _get_thumbnail_bytes(record, thumb_hash_attr, full_bytes_loader):
+    """Mengambil bytes thumbnail; record lama tanpa thumbnail dibuatkan sekali lalu disimpan.
+
+    Thumbnail WebP dari versi sebelumnya juga dibuat ulang sekali sebagai JPEG/PNG.
+    """
+    thumb_hash = getattr(record, thumb_hash_attr)
+    if thumb_hash:
+        thumb_bytes = IMAGE_STORE.get(thumb_hash)
+        if thumb_bytes is not None and _is_passthrough_image(thumb_bytes):
+            return thumb_bytes
+
+    full_bytes = full_bytes_loader(record)
+    if full_bytes is None:
+        return None
+    thumb_bytes = make_thumbnail_bytes(blob_to_pil(full_bytes))
+    thumb_hash = _put_pinned(thumb_bytes)
+
     db = SessionLocal()
     try:
-        original_blob = pil_to_blob(original_image_pil)
-        detected_blob = pil_to_blob(detected_image_pil)
+        db.query(DetectionHistory).filter(DetectionHistory.id == record.id).update({
+            thumb_hash_attr: thumb_hash,
+            'thumbnail_format': settings.THUMBNAIL_FORMAT,
+        })
+        db.commit()
+        setattr(record, thumb_hash_attr, thumb_hash)
+    except Exception as e:
+        db.rollback()
+        print(f"Error menyimpan thumbnail: {e}")
+    finally:
+        db.close()
+        _unpin_images([thumb_hash])
+    return thumb_bytes
 
-        new_record = DetectionHistory(
+def get_original_thumbnail_bytes(record):
+    return _get_thumbnail_bytes(record, 'original_thumb_hash', get_original_image_bytes)
+
+def get_detected_thumbnail_bytes(record):
+    return _get_thumbnail_bytes(record, 'detected_thumb_hash', get_detected_image_bytes)
+
+_IMAGE_HASH_COLUMNS = (
+    DetectionHistory.original_image_hash,
+    DetectionHistory.detected_image_hash,
+    DetectionHistory.original_thumb_hash,
+    DetectionHistory.detected_thumb_hash,
+)
+
+def _release_unreferenced_images(db, image_hashes, chunk_size=500):
+    """Menghapus gambar dari image store jika sudah tidak dirujuk oleh record mana pun.
+
+    Gambar yang sedang di-pin oleh penyimpanan yang belum ter-commit dilewati. Pengecekan
+    rujukan dan penghapusan berjalan di bawah lock pin, jadi penyimpanan baru tidak bisa
+    mem-pin hash di antara keduanya. Mengembalikan jumlah bytes yang dibebaskan.
+    """
+    candidates = list(set(filter(None, image_hashes)))
+    with _IMAGE_PIN_LOCK:
+        referenced = {image_hash for image_hash in candidates if _PINNED_IMAGE_HASHES[image_hash] > 0}
+        # Dipecah per chunk agar tidak melewati batas jumlah parameter SQLite
+        for start in range(0, len(candidates), chunk_size):
+            chunk = candidates[start:start + chunk_size]
+            for column in _IMAGE_HASH_COLUMNS:
+                referenced.update(h for (h,) in db.query(column).filter(column.in_(chunk)).distinct())
+        return sum(IMAGE_STORE.delete(image_hash) for image_hash in candidates if image_hash not in referenced)
+
+# --- Fungsi Database ---
+def _build_detection_objects(detections_data_list, timestamp, record_id=None):
+    """Membuat baris DetectionObject (satu per deteksi) dari list data deteksi JSON."""
+    objects = []
+    for det in detections_data_list or []:
+        x1, y1, x2, y2 = det.get('bbox') or (None, None, None, None)
+        extra = {'record_id': record_id} if record_id is not None else {}
+        objects.append(DetectionObject(
+            label=det['label'],
+            confidence=det['confidence'],
+            x1=x1, y1=y1, x2=x2, y2=y2,
+            track_id=det.get('track_id'),
+            timestamp=timestamp,
+            **extra
+        ))
+    return objects
+
+@timed('db.encode')
+def build_detection_records(records):
+    """Membuat objek DetectionHistory dari tuple (nama, gambar_asli, gambar_hasil, data_deteksi).
+
+    Semua gambar di-encode dan disimpan paralel di thread pool sebelum record dibuat.
+    """
+    encode_jobs = [
+        (
+            submit_encode(_store_image, original_image_pil, 'original'),
+            submit_encode(_store_image, detected_image_pil, 'annotated'),
+            submit_encode(_store_thumbnail, original_image_pil),
+            submit_encode(_store_thumbnail, detected_image_pil),
+        )
+        for _, original_image_pil, detected_image_pil, _ in records
+    ]
+
+    new_records = []
+    for (original_image_name, _, _, detections_data_list), jobs in zip(records, encode_jobs):
+        original_job, detected_job, original_thumb_job, detected_thumb_job = jobs
+        original_hash, original_size, original_format = original_job.result()
+        detected_hash, detected_size, detected_format = detected_job.result()
+        timestamp = datetime.now(ZoneInfo("Asia/Jakarta"))
+        new_records.append(DetectionHistory(
             original_image_name=original_image_name,
-            original_image_blob=original_blob,
-            detected_image_blob=detected_blob,
+            original_image_hash=original_hash,
+            original_image_size=original_size,
+            original_image_format=original_format,
+            detected_image_hash=detected_hash,
+            detected_image_size=detected_size,
+            detected_image_format=detected_format,
+            original_thumb_hash=original_thumb_job.result(),
+            detected_thumb_hash=detected_thumb_job.result(),
+            thumbnail_format=settings.THUMBNAIL_FORMAT,
             detections_data=detections_data_list,
-            timestamp=datetime.now(ZoneInfo("Asia/Jakarta"))
-        )
+            timestamp=timestamp,
+            objects=_build_detection_objects(detections_data_list, timestamp)
+        ))
+    return new_records
+
+@timed('db.save')
+def save_detection_to_db(original_image_name, original_image_pil, detected_image_pil, detections_data_list):
+    """Menyimpan hasil deteksi ke database."""
+    new_record = None
+    db = SessionLocal()
+    try:
+        new_record = build_detection_records(
+            [(original_image_name, original_image_pil, detected_image_pil, detections_data_list)]
+        )[0]
         db.add(new_record)
+        _apply_rollup_deltas(db, _rollup_deltas([(new_record.timestamp, detections_data_list)]))
         db.commit()
         db.refresh(new_record)
         return new_record
@@ -92,7 +780,49 @@ def save_detection_to_db(original_image_name, original_image_pil, detected_image
         return None
     finally:
         db.close()
+        if new_record is not None:
+            _unpin_images(_record_image_hashes([new_record]))
+
+def save_detections_batch_to_db(records):
+    """Menyimpan banyak hasil deteksi dalam satu transaksi.
+
+    records berisi tuple (original_image_name, original_image_pil, detected_image_pil, detections_data_list).
+    Mengembalikan list ID record yang tersimpan, atau None jika gagal.
+    """
+    try:
+        new_records = build_detection_records(records)
+    except Exception as e:
+        print(f"Error menyimpan batch ke database: {e}")
+        return None
+    return persist_detection_records(new_records)
+
+@timed('db.commit')
+def persist_detection_records(new_records):
+    """Menyimpan record hasil build_detection_records() dalam satu transaksi beserta rollup-nya.
+
+    Dipisah dari proses encoding agar pipeline batch bisa menjalankan keduanya di tahap berbeda.
+    Pin gambar dari build_detection_records() dilepas setelah commit (berhasil atau gagal).
+    Mengembalikan list ID record yang tersimpan, atau None jika gagal.
+    """
+    db = SessionLocal()
+    try:
+        db.add_all(new_records)
+        _apply_rollup_deltas(db, _rollup_deltas(
+            (record.timestamp, record.detections_data) for record in new_records
+        ))
+        db.flush()
+        record_ids = [record.id for record in new_records]
+        db.commit()
+        return record_ids
+    except Exception as e:
+        db.rollback()
+        print(f"Error menyimpan batch ke database: {e}")
+        return None
+    finally:
+        db.close()
+        _unpin_images(_record_image_hashes(new_records))
 
+@timed('db.fetch_all')
 def get_all_detection_results_from_db():
     """Mengambil semua riwayat deteksi dari database, diurutkan terbaru dulu."""
     db = SessionLocal()
@@ -101,19 +831,324 @@ def get_all_detection_results_from_db():
     finally:
         db.close()
 
+def _apply_date_filter(query, start_datetime=None, end_datetime=None, column=DetectionHistory.timestamp):
+    """Filter rentang waktu; end_datetime bersifat eksklusif."""
+    if start_datetime is not None:
+        query = query.filter(column >= start_datetime)
+    if end_datetime is not None:
+        query = query.filter(column < end_datetime)
+    return query
+
+def _apply_label_filter(query, labels=None):
+    """Hanya record yang memiliki minimal satu objek dengan salah satu label."""
+    if labels:
+        query = query.filter(exists().where(
+            DetectionObject.record_id == DetectionHistory.id,
+            DetectionObject.label.in_(list(labels))
+        ))
+    return query
+
+@timed('db.fetch_page')
+def get_detection_results_page(page_size=10, cursor=None, start_datetime=None, end_datetime=None, labels=None):
+    """Mengambil satu halaman riwayat (terbaru dulu) dengan keyset pagination.
+
+    cursor adalah tuple (timestamp, id) dari record terakhir halaman sebelumnya.
+    Kolom BLOB di-defer sehingga tidak ikut terbaca. Mengembalikan (records, next_cursor);
+    next_cursor bernilai None jika tidak ada halaman berikutnya.
+    """
+    db = SessionLocal()
+    try:
+        query = db.query(DetectionHistory).options(
+            defer(DetectionHistory.original_image_blob),
+            defer(DetectionHistory.detected_image_blob),
+        )
+        query = _apply_date_filter(query, start_datetime, end_datetime)
+        query = _apply_label_filter(query, labels)
+        if cursor is not None:
+            cursor_timestamp, cursor_id = cursor
+            query = query.filter(or_(
+                DetectionHistory.timestamp < cursor_timestamp,
+                and_(DetectionHistory.timestamp == cursor_timestamp, DetectionHistory.id < cursor_id)
+            ))
+        # Ambil satu record ekstra untuk mengetahui apakah masih ada halaman berikutnya
+        records = query.order_by(
+            DetectionHistory.timestamp.desc(), DetectionHistory.id.desc()
+        ).limit(page_size + 1).all()
+    finally:
+        db.close()
+
+    next_cursor = None
+    if len(records) > page_size:
+        records = records[:page_size]
+        next_cursor = (records[-1].timestamp, records[-1].id)
+    return records, next_cursor
+
+def count_detection_results(start_datetime=None, end_datetime=None, labels=None):
+    """Menghitung jumlah record tanpa menyentuh data gambar."""
+    db = SessionLocal()
+    try:
+        query = _apply_date_filter(db.query(func.count(DetectionHistory.id)), start_datetime, end_datetime)
+        return _apply_label_filter(query, labels).scalar()
+    finally:
+        db.close()
+
+def get_detection_labels():
+    """Daftar label unik yang pernah terdeteksi (memakai index label)."""
+    db = SessionLocal()
+    try:
+        return [label for (label,) in db.query(DetectionObject.label).distinct().order_by(DetectionObject.label)]
+    finally:
+        db.close()
+
+def count_detections_by_label(start_datetime=None, end_datetime=None):
+    """Agregat SQL per label: jumlah objek dan jumlah gambar yang memuat label tersebut.
+
+    Mengembalikan dict {label: {'objects': int, 'images': int}}.
+    """
+    db = SessionLocal()
+    try:
+        query = db.query(
+            DetectionObject.label,
+            func.count(DetectionObject.id),
+            func.count(distinct(DetectionObject.record_id))
+        )
+        query = _apply_date_filter(query, start_datetime, end_datetime, column=DetectionObject.timestamp)
+        return {
+            label: {'objects': object_count, 'images': image_count}
+            for label, object_count, image_count in query.group_by(DetectionObject.label).all()
+        }
+    finally:
+        db.close()
+
 def delete_detection_record_from_db(record_id):
     """Menghapus record deteksi berdasarkan ID."""
+    result = delete_detection_records(record_ids=[record_id])
+    return result is not None and result['deleted'] > 0
+
+@timed('db.delete')
+def delete_detection_records(record_ids=None, start_datetime=None, end_datetime=None,
+                             delete_all=False, full_vacuum=False):
+    """Menghapus banyak record sekaligus dalam satu transaksi.
+
+    Target dipilih lewat daftar record_ids, rentang waktu, atau delete_all=True.
+    Setelah itu ruang database dikembalikan dengan incremental vacuum (atau VACUUM
+    penuh jika full_vacuum=True). Mengembalikan dict berisi jumlah record terhapus dan
+    bytes yang dibebaskan, atau None jika gagal.
+    """
+    if record_ids is None and start_datetime is None and end_datetime is None and not delete_all:
+        raise ValueError("Tentukan record_ids, rentang tanggal, atau delete_all=True.")
+
+    size_before = _database_file_size()
     db = SessionLocal()
     try:
-        record = db.query(DetectionHistory).get(record_id)
-        if record:
-            db.delete(record)
-            db.commit()
-            return True
-        return False
+        query = _apply_date_filter(db.query(DetectionHistory), start_datetime, end_datetime)
+        if record_ids is not None:
+            query = query.filter(DetectionHistory.id.in_(list(record_ids)))
+
+        image_hashes = [h for row in query.with_entities(*_IMAGE_HASH_COLUMNS) for h in row]
+        if delete_all:
+            db.query(DetectionRollup).delete(synchronize_session=False)
+        else:
+            deleted_rows = query.with_entities(DetectionHistory.timestamp, DetectionHistory.detections_data)
+            _apply_rollup_deltas(db, _rollup_deltas(deleted_rows), sign=-1)
+        db.query(DetectionObject).filter(
+            DetectionObject.record_id.in_(query.with_entities(DetectionHistory.id).statement)
+        ).delete(synchronize_session=False)
+        deleted_count = query.delete(synchronize_session=False)
+        db.commit()
+        freed_image_bytes = _release_unreferenced_images(db, image_hashes)
     except Exception as e:
         db.rollback()
         print(f"Error menghapus record: {e}")
-        return False
+        return None
+    finally:
+        db.close()
+
+    if deleted_count:
+        _reclaim_database_space(full_vacuum)
+    freed_db_bytes = max(size_before - _database_file_size(), 0)
+    return {
+        'deleted': deleted_count,
+        'freed_db_bytes': freed_db_bytes,
+        'freed_image_bytes': freed_image_bytes,
+    }
+
+# --- Fungsi Rollup Kepatuhan ---
+def _truncate_to_period(timestamp, period):
+    """Membulatkan timestamp ke awal jam/hari (tanpa tzinfo, sama seperti yang tersimpan di SQLite)."""
+    timestamp = timestamp.replace(minute=0, second=0, microsecond=0, tzinfo=None)
+    if period == 'day':
+        timestamp = timestamp.replace(hour=0)
+    return timestamp
+
+def _rollup_deltas(entries):
+    """Menghitung perubahan rollup dari iterable (timestamp, detections_data).
+
+    Mengembalikan dict {(period, period_start, label): [object_count, image_count]}.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    for timestamp, detections_data in entries:
+        label_counts = Counter(det['label'] for det in detections_data or [])
+        for period in settings.ROLLUP_PERIODS:
+            period_start = _truncate_to_period(timestamp, period)
+            total = deltas[(period, period_start, ROLLUP_ALL_LABEL)]
+            total[0] += sum(label_counts.values())
+            total[1] += 1
+            for label, count in label_counts.items():
+                bucket = deltas[(period, period_start, label)]
+                bucket[0] += count
+                bucket[1] += 1
+    return deltas
+
+def _apply_rollup_deltas(db, deltas, sign=1):
+    """Menambahkan (sign=1) atau mengurangi (sign=-1) nilai rollup dengan upsert SQLite."""
+    table = DetectionRollup.__table__
+    for (period, period_start, label), (object_count, image_count) in deltas.items():
+        stmt = sqlite_insert(table).values(
+            period=period, period_start=period_start, label=label,
+            object_count=sign * object_count, image_count=sign * image_count
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['period', 'period_start', 'label'],
+            set_={
+                'object_count': table.c.object_count + stmt.excluded.object_count,
+                'image_count': table.c.image_count + stmt.excluded.image_count,
+            }
+        )
+        db.execute(stmt)
+    if sign < 0:
+        db.query(DetectionRollup).filter(DetectionRollup.image_count <= 0).delete(synchronize_session=False)
+
+def get_rollup_series(period='day', start_datetime=None, end_datetime=None):
+    """Mengambil data rollup untuk dashboard, urut berdasarkan waktu.
+
+    Mengembalikan list tuple (period_start, label, object_count, image_count).
+    """
+    db = SessionLocal()
+    try:
+        query = db.query(
+            DetectionRollup.period_start, DetectionRollup.label,
+            DetectionRollup.object_count, DetectionRollup.image_count
+        ).filter(DetectionRollup.period == period)
+        query = _apply_date_filter(query, start_datetime, end_datetime, column=DetectionRollup.period_start)
+        return query.order_by(DetectionRollup.period_start, DetectionRollup.label).all()
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def rebuild_rollups(batch_size=1000):
+    """Menghitung ulang seluruh tabel rollup dari riwayat deteksi (untuk data lama)."""
+    db = SessionLocal()
+    try:
+        db.query(DetectionRollup).delete(synchronize_session=False)
+        rows = db.query(DetectionHistory.timestamp, DetectionHistory.detections_data).yield_per(batch_size)
+        deltas = _rollup_deltas(rows)
+        _apply_rollup_deltas(db, deltas)
+        db.commit()
+        return len(deltas)
+    except Exception as e:
+        db.rollback()
+        print(f"Error menghitung ulang rollup: {e}")
+        raise
+    finally:
+        db.close()
+
+def _database_file_size():
+    """Ukuran file database termasuk file WAL."""
+    db_path = engine.url.database
+    if not db_path:
+        return 0
+    return sum(os.path.getsize(path) for path in (db_path, f"{db_path}-wal") if os.path.exists(path))
+
+def _reclaim_database_space(full_vacuum=False):
+    """Mengembalikan halaman kosong SQLite ke sistem berkas."""
+    raw_connection = engine.raw_connection()
+    try:
+        cursor = raw_connection.cursor()
+        # pysqlite hanya melangkah sekali untuk pragma tanpa kolom hasil, sehingga
+        # incremental_vacuum cuma membebaskan satu halaman; executescript menjalankannya
+        # sampai selesai (dan di luar transaksi, syarat untuk VACUUM)
+        cursor.executescript("VACUUM;" if full_vacuum else "PRAGMA incremental_vacuum;")
+        # Pada mode WAL, perubahan baru masuk ke file utama setelah checkpoint
+        cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        cursor.close()
+    finally:
+        raw_connection.close()
+
+def migrate_blobs_to_image_store(batch_size=50, vacuum=True):
+    """Memindahkan BLOB gambar lama dari database ke image store.
+
+    Diproses per batch agar memori tetap kecil. Mengembalikan dict berisi jumlah record
+    yang dimigrasikan serta ukuran file database sebelum dan sesudah.
+    """
+    size_before = _database_file_size()
+    migrated_count = 0
+    db = SessionLocal()
+    try:
+        while True:
+            records = db.query(DetectionHistory).filter(
+                DetectionHistory.original_image_blob.isnot(None) |
+                DetectionHistory.detected_image_blob.isnot(None)
+            ).limit(batch_size).all()
+            if not records:
+                break
+            for record in records:
+                if record.original_image_blob is not None:
+                    record.original_image_hash = _put_pinned(record.original_image_blob)
+                    record.original_image_size = len(record.original_image_blob)
+                    record.original_image_format = blob_to_pil(record.original_image_blob).format
+                    record.original_image_blob = None
+                if record.detected_image_blob is not None:
+                    record.detected_image_hash = _put_pinned(record.detected_image_blob)
+                    record.detected_image_size = len(record.detected_image_blob)
+                    record.detected_image_format = blob_to_pil(record.detected_image_blob).format
+                    record.detected_image_blob = None
+            db.commit()
+            _unpin_images(_record_image_hashes(records))
+            db.expunge_all()
+            migrated_count += len(records)
+            print(f"{migrated_count} record dimigrasikan ke image store...")
+    except Exception as e:
+        db.rollback()
+        print(f"Error migrasi BLOB ke image store: {e}")
+        raise
+    finally:
+        db.close()
+
+    if vacuum and migrated_count:
+        _reclaim_database_space(full_vacuum=True)
+    return {'migrated': migrated_count, 'db_size_before': size_before, 'db_size_after': _database_file_size()}
+
+
+def backfill_detection_objects(batch_size=500):
+    """Mengisi tabel detection_objects dari kolom JSON detections_data untuk record lama.
+
+    Aman dijalankan berulang: record yang sudah memiliki baris objek dilewati.
+    Mengembalikan jumlah baris objek yang dibuat.
+    """
+    created_count = 0
+    last_id = 0
+    db = SessionLocal()
+    try:
+        while True:
+            rows = db.query(
+                DetectionHistory.id, DetectionHistory.timestamp, DetectionHistory.detections_data
+            ).filter(
+                DetectionHistory.id > last_id,
+                ~exists().where(DetectionObject.record_id == DetectionHistory.id)
+            ).order_by(DetectionHistory.id).limit(batch_size).all()
+            if not rows:
+                break
+            for record_id, timestamp, detections_data in rows:
+                objects = _build_detection_objects(detections_data, timestamp, record_id=record_id)
+                db.add_all(objects)
+                created_count += len(objects)
+            db.commit()
+            last_id = rows[-1].id
+            print(f"Backfill sampai record ID {last_id}: {created_count} objek dibuat...")
+    except Exception as e:
+        db.rollback()
+        print(f"Error backfill detection_objects: {e}")
+        raise
+    finally:
+        db.close()
+    return created_count
@@ -0,0 +1,194 @@
+"""Ekspor riwayat deteksi ke ZIP: gambar asli/hasil deteksi plus manifest CSV atau Parquet.
+
+Record dibaca bertahap dengan `yield_per` (kolom BLOB di-defer) dan setiap gambar langsung
+ditulis ke ZIP, sehingga pemakaian memori tetap datar berapa pun jumlah riwayatnya.
+Manifest ditulis ke file sementara selama ekspor lalu disalin ke ZIP di akhir.
+
+Isi ZIP:
+    images/original/<id>.<ext>
+    images/detected/<id>.<ext>
+    detections.csv | detections.parquet   satu baris per objek terdeteksi
+"""
+import csv
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime
+from sqlalchemy.orm import defer
+import settings
+import helper
+from database import SessionLocal, DetectionHistory
+
+
+MANIFEST_COLUMNS = [
+    'record_id', 'timestamp', 'image_name', 'original_image', 'detected_image',
+    'label', 'confidence', 'x1', 'y1', 'x2', 'y2', 'track_id',
+]
+
+# Format di kolom *_image_format -> ekstensi file
+_FORMAT_EXTENSIONS = {'JPEG': 'jpg', 'JPG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'AVIF': 'avif'}
+
+
+# --- Membaca Record Bertahap ---
+def iter_export_records(start_datetime=None, end_datetime=None, labels=None, batch_size=settings.EXPORT_BATCH_SIZE):
+    """Yield record riwayat (terlama dulu) per batch dari cursor database, tanpa memuat kolom BLOB."""
+    db = SessionLocal()
+    try:
+        query = db.query(DetectionHistory).options(
+            defer(DetectionHistory.original_image_blob),
+            defer(DetectionHistory.detected_image_blob),
+        )
+        query = helper._apply_date_filter(query, start_datetime, end_datetime)
+        query = helper._apply_label_filter(query, labels)
+        query = query.order_by(DetectionHistory.timestamp, DetectionHistory.id)
+        yield from query.yield_per(batch_size)
+    finally:
+        db.close()
+
+
+def _image_extension(image_bytes, image_format):
+    if image_format:
+        return _FORMAT_EXTENSIONS.get(image_format.upper(), image_format.lower())
+    # Record lama (BLOB) tidak menyimpan format; kenali dari signature file
+    if image_bytes.startswith(b'\x89PNG'):
+        return 'png'
+    if image_bytes.startswith(b'\xff\xd8'):
+        return 'jpg'
+    if image_bytes[:4] == b'RIFF' and image_bytes[8:12] == b'WEBP':
+        return 'webp'
+    return 'bin'
+
+
+def manifest_rows(record, original_path, detected_path):
+    """Baris manifest untuk satu record; record tanpa objek tetap mendapat satu baris kosong."""
+    base_row = {
+        'record_id': record.id,
+        'timestamp': record.timestamp.isoformat() if record.timestamp else None,
+        'image_name': record.original_image_name,
+        'original_image': original_path,
+        'detected_image': detected_path,
+    }
+    detections_data = record.detections_data or []
+    if not detections_data:
+        return [{**base_row, 'label': None, 'confidence': None, 'x1': None, 'y1': None, 'x2': None, 'y2': None, 'track_id': None}]
+    rows = []
+    for det in detections_data:
+        x1, y1, x2, y2 = det.get('bbox') or (None, None, None, None)
+        rows.append({
+            **base_row,
+            'label': det.get('label'),
+            'confidence': det.get('confidence'),
+            'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2,
+            'track_id': det.get('track_id'),
+        })
+    return rows
+
+
+# --- Penulis Manifest ---
+class CsvManifestWriter:
+    filename = 'detections.csv'
+
+    def __init__(self, file_path):
+        self._file = open(file_path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=MANIFEST_COLUMNS)
+        self._writer.writeheader()
+
+    def write_rows(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetManifestWriter:
+    """Menulis manifest sebagai Parquet per row group, jadi baris tidak menumpuk di memori."""
+    filename = 'detections.parquet'
+
+    def __init__(self, file_path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Manifest Parquet membutuhkan paket pyarrow (pip install pyarrow).")
+        self._pa = pa
+        self._schema = pa.schema([
+            ('record_id', pa.int64()), ('timestamp', pa.string()), ('image_name', pa.string()),
+            ('original_image', pa.string()), ('detected_image', pa.string()), ('label', pa.string()),
+            ('confidence', pa.float64()), ('x1', pa.int64()), ('y1', pa.int64()), ('x2', pa.int64()),
+            ('y2', pa.int64()), ('track_id', pa.int64()),
+        ])
+        self._writer = pq.ParquetWriter(str(file_path), self._schema)
+
+    def write_rows(self, rows):
+        if rows:
+            self._writer.write_table(self._pa.Table.from_pylist(rows, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+MANIFEST_WRITERS = {'csv': CsvManifestWriter, 'parquet': ParquetManifestWriter}
+
+
+# --- Ekspor ZIP ---
+def export_history_zip(output, start_datetime=None, end_datetime=None, labels=None, manifest_format='csv',
+                       include_images=True, batch_size=settings.EXPORT_BATCH_SIZE, progress_callback=None):
+    """Menulis riwayat deteksi ke ZIP di `output` (path atau file object yang bisa ditulis).
+
+    progress_callback(jumlah_record_selesai) dipanggil setiap batch. Mengembalikan ringkasan
+    jumlah record, objek, gambar, serta gambar yang hilang dari image store.
+    """
+    if manifest_format not in MANIFEST_WRITERS:
+        raise ValueError(f"Format manifest tidak dikenal: {manifest_format}")
+    summary = {'records': 0, 'objects': 0, 'images': 0, 'missing_images': 0}
+
+    with tempfile.TemporaryDirectory(prefix="sidetek-export-") as tmp_dir:
+        manifest_writer = MANIFEST_WRITERS[manifest_format](f"{tmp_dir}/manifest")
+        # Gambar sudah terkompresi (JPEG/WebP), jadi disimpan tanpa kompresi ulang
+        with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as zip_file:
+            pending_rows = []
+            try:
+                for record in iter_export_records(start_datetime, end_datetime, labels, batch_size):
+                    original_path = detected_path = None
+                    if include_images:
+                        original_path = _write_image(zip_file, summary, 'original', record,
+                                                     helper.get_original_image_bytes(record), record.original_image_format)
+                        detected_path = _write_image(zip_file, summary, 'detected', record,
+                                                     helper.get_detected_image_bytes(record), record.detected_image_format)
+                    rows = manifest_rows(record, original_path, detected_path)
+                    pending_rows.extend(rows)
+                    summary['records'] += 1
+                    summary['objects'] += sum(1 for row in rows if row['label'] is not None)
+                    if summary['records'] % batch_size == 0:
+                        manifest_writer.write_rows(pending_rows)
+                        pending_rows = []
+                        if progress_callback:
+                            progress_callback(summary['records'])
+                manifest_writer.write_rows(pending_rows)
+            finally:
+                manifest_writer.close()
+
+            manifest_info = zipfile.ZipInfo(manifest_writer.filename, datetime.now().timetuple()[:6])
+            manifest_info.compress_type = zipfile.ZIP_DEFLATED
+            with open(f"{tmp_dir}/manifest", 'rb') as manifest_file, zip_file.open(manifest_info, 'w') as zip_entry:
+                shutil.copyfileobj(manifest_file, zip_entry)
+    if progress_callback:
+        progress_callback(summary['records'])
+    return summary
+
+
+def _write_image(zip_file, summary, kind, record, image_bytes, image_format):
+    if image_bytes is None:
+        summary['missing_images'] += 1
+        return None
+    path = f"images/{kind}/{record.id}.{_image_extension(image_bytes, image_format)}"
+    # Waktu file di ZIP mengikuti waktu deteksi, bukan waktu ekspor
+    date_time = (record.timestamp or datetime.now()).timetuple()[:6]
+    zip_file.writestr(zipfile.ZipInfo(path, date_time), image_bytes)
+    summary['images'] += 1
+    return path
+
+
+def default_export_path(manifest_format='csv'):
+    settings.EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+    return settings.EXPORT_DIR / f"riwayat-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{manifest_format}.zip"
@@ -0,0 +1,47 @@
+import io
+from concurrent.futures import Future, ThreadPoolExecutor
+import settings
+
+
+# --- Codec Gambar ---
+# Encoder PIL melepas GIL, jadi encoding beberapa gambar bisa berjalan paralel di thread pool
+ENCODE_POOL = ThreadPoolExecutor(max_workers=settings.IMAGE_ENCODE_WORKERS, thread_name_prefix="image-encode")
+
+def submit_encode(fn, *args):
+    """Menjalankan fn di ENCODE_POOL; jika pool sudah ditutup (proses sedang berhenti), fn
+    dijalankan langsung agar flush terakhir antrian penyimpanan tidak kehilangan data."""
+    try:
+        return ENCODE_POOL.submit(fn, *args)
+    except RuntimeError as e:
+        print(f"Pool encode tidak menerima tugas ({e}), encode dijalankan langsung.")
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+def resolve_codec(image_pil, policy_name):
+    """Menentukan codec (dict format/quality) untuk gambar berdasarkan kebijakan di settings."""
+    codec = dict(settings.IMAGE_CODEC_POLICIES[policy_name])
+    if codec.pop('keep_source_format', False) and image_pil.format:
+        codec['format'] = image_pil.format
+    return codec
+
+def encode_image(image_pil, codec):
+    """Encode PIL Image dengan codec tertentu. Mengembalikan (bytes, format)."""
+    image_format = codec['format'].upper()
+    save_kwargs = {}
+    if image_format in ('JPEG', 'WEBP'):
+        save_kwargs['quality'] = codec.get('quality', 90)
+        if image_format == 'JPEG' and image_pil.mode not in ('RGB', 'L'):
+            image_pil = image_pil.convert('RGB') # JPEG tidak mendukung kanal alpha
+    elif image_format == 'PNG':
+        save_kwargs['compress_level'] = codec.get('compress_level', settings.PNG_COMPRESS_LEVEL)
+
+    byte_io = io.BytesIO()
+    image_pil.save(byte_io, format=image_format, **save_kwargs)
+    return byte_io.getvalue(), image_format
+
+def encode_with_policy(image_pil, policy_name):
+    return encode_image(image_pil, resolve_codec(image_pil, policy_name))
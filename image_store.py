@@ -0,0 +1,94 @@
+import hashlib
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+import settings
+
+
+# --- Penyimpanan Gambar Berbasis Konten (Content-Addressed) ---
+class ImageStore(ABC):
+    """Antarmuka penyimpanan gambar; setiap gambar dialamatkan dengan hash SHA-256 isinya."""
+
+    @abstractmethod
+    def put(self, data):
+        """Menyimpan bytes gambar dan mengembalikan hash SHA-256-nya. Data yang sama hanya disimpan sekali."""
+
+    @abstractmethod
+    def get(self, image_hash):
+        """Mengambil bytes gambar berdasarkan hash, atau None jika tidak ada."""
+
+    @abstractmethod
+    def delete(self, image_hash):
+        """Menghapus gambar berdasarkan hash. Mengembalikan jumlah bytes yang dibebaskan (0 jika tidak ada)."""
+
+    @abstractmethod
+    def exists(self, image_hash):
+        """True jika gambar dengan hash tersebut tersimpan."""
+
+    @staticmethod
+    def hash_bytes(data):
+        return hashlib.sha256(data).hexdigest()
+
+
+class LocalImageStore(ImageStore):
+    """Menyimpan gambar di direktori lokal, di-shard dengan dua level prefix hash (ab/cd/abcd...)."""
+
+    def __init__(self, root_dir):
+        self.root_dir = Path(root_dir)
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path_for(self, image_hash):
+        return self.root_dir / image_hash[:2] / image_hash[2:4] / image_hash
+
+    def put(self, data):
+        image_hash = self.hash_bytes(data)
+        path = self._path_for(image_hash)
+        if path.exists():
+            return image_hash # Deduplikasi: gambar identik sudah tersimpan
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Tulis ke file sementara (nama unik per penulis) lalu rename agar tidak ada file
+        # setengah jadi; bytes identik bisa ditulis bersamaan dari beberapa thread encode
+        with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f"{image_hash}.", suffix=".tmp", delete=False) as f:
+            f.write(data)
+            tmp_path = f.name
+        try:
+            os.replace(tmp_path, path)
+        except OSError:
+            os.unlink(tmp_path)
+            if not path.exists():
+                raise
+            # Penulis lain sudah menyimpan bytes yang sama lebih dulu
+        return image_hash
+
+    def get(self, image_hash):
+        try:
+            with open(self._path_for(image_hash), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def delete(self, image_hash):
+        path = self._path_for(image_hash)
+        try:
+            freed_bytes = path.stat().st_size
+            path.unlink()
+            return freed_bytes
+        except FileNotFoundError:
+            return 0
+
+    def exists(self, image_hash):
+        return self._path_for(image_hash).exists()
+
+
+# Backend yang tersedia; backend lain (mis. S3) cukup didaftarkan di sini
+IMAGE_STORE_BACKENDS = {
+    'local': lambda: LocalImageStore(settings.IMAGE_STORE_DIR),
+}
+
+def get_image_store(backend=settings.IMAGE_STORE_BACKEND):
+    """Membuat instance image store sesuai backend di settings."""
+    if backend not in IMAGE_STORE_BACKENDS:
+        raise ValueError(f"Backend image store tidak dikenal: {backend}")
+    return IMAGE_STORE_BACKENDS[backend]()
@@ -0,0 +1,241 @@
+"""Pool proses inferensi dengan serah-terima frame lewat shared memory.
+
+Setiap worker adalah proses terpisah yang memuat model sekali. Proses utama menyalin frame
+ke slot ring buffer `multiprocessing.shared_memory` milik worker dan hanya mengirim metadata
+kecil (slot, shape, ambang) lewat queue. Worker mengembalikan hasil sebagai array ringkas
+(cls int32, conf float32, xyxy int32), sehingga pre/post-processing model tidak berebut GIL
+dengan rerun Streamlit dan thread webrtc.
+"""
+import itertools
+import multiprocessing as mp
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+import numpy as np
+import settings
+
+
+# --- Proses Worker ---
+def _worker_main(worker_index, shm_name, slot_bytes, request_queue, result_queue, weights_path, num_threads):
+    """Loop utama proses worker: muat model, lalu layani permintaan sampai menerima None."""
+    # Dengan konteks spawn, worker memakai resource tracker proses utama; registrasi segmen
+    # dibiarkan agar tracker tetap bisa membersihkan /dev/shm jika proses utama crash
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        import helper # Import di sini agar proses utama tidak ikut mengimpor ulang saat spawn
+        settings.INFERENCE_THREADS = num_threads
+        model = helper._load_weights_file(weights_path)
+        model(np.zeros((settings.INFERENCE_IMGSZ, settings.INFERENCE_IMGSZ, 3), dtype=np.uint8), verbose=False)
+        result_queue.put(('ready', worker_index, dict(model.names)))
+    except Exception as e:
+        result_queue.put(('failed', worker_index, str(e)))
+        shm.close()
+        return
+
+    while True:
+        request = request_queue.get()
+        if request is None:
+            break
+        request_id, slot_index, shape, dtype, inline_frame, confidence_threshold, tiled = request
+        try:
+            if inline_frame is not None:
+                image_bgr = inline_frame
+            else:
+                # View langsung ke slot shared memory, tanpa salinan
+                image_bgr = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=slot_index * slot_bytes)
+            class_ids, confidences, bboxes, _ = helper._detect_arrays(model, image_bgr, confidence_threshold, tiled)
+            result_queue.put((
+                'result', request_id,
+                (class_ids.astype(np.int32), confidences.astype(np.float32), bboxes.astype(np.int32)), None
+            ))
+        except Exception as e:
+            result_queue.put(('result', request_id, None, str(e)))
+        finally:
+            image_bgr = None # Lepaskan view sebelum slot dipakai ulang atau shm ditutup
+    shm.close()
+
+
+# --- Pool di Proses Utama ---
+class InferenceWorkerPool:
+    """Mendistribusikan frame ke beberapa proses worker lewat slot shared memory.
+
+    Slot yang kosong dibagikan lewat satu antrian bersama, sehingga frame otomatis menuju
+    worker yang lebih dulu selesai. Jika semua slot terpakai, pemanggil menunggu (backpressure).
+    `weights_path` harus berupa file yang siap dimuat (bobot .pt atau artefak hasil ekspor);
+    worker tidak mengekspor model sendiri.
+    """
+
+    def __init__(self, num_workers, weights_path=settings.DETECTION_MODEL_PATH,
+                 slots_per_worker=settings.INFERENCE_WORKER_SLOTS, slot_mb=settings.INFERENCE_WORKER_SLOT_MB):
+        self.num_workers = max(int(num_workers), 1)
+        self.slot_bytes = int(slot_mb * 1024 * 1024)
+        self.names = {}
+        context = mp.get_context('spawn') # fork tidak aman bersama thread dan runtime torch
+        self._result_queue = context.Queue()
+        self._free_slots = queue.Queue()
+        self._pending = {} # request_id -> (future, worker_index, slot_index)
+        self._pending_lock = threading.Lock()
+        self._request_ids = itertools.count()
+        self._workers = []
+        self._dead_workers = set()
+        self._closed = False
+
+        num_threads = max(settings.INFERENCE_THREADS // self.num_workers, 1)
+        for worker_index in range(self.num_workers):
+            shm = shared_memory.SharedMemory(create=True, size=self.slot_bytes * slots_per_worker)
+            request_queue = context.Queue()
+            process = context.Process(
+                target=_worker_main,
+                args=(worker_index, shm.name, self.slot_bytes, request_queue, self._result_queue,
+                      str(weights_path), num_threads),
+                daemon=True,
+                name=f"inference-worker-{worker_index}",
+            )
+            process.start()
+            self._workers.append({'process': process, 'shm': shm, 'requests': request_queue})
+            for slot_index in range(slots_per_worker):
+                self._free_slots.put((worker_index, slot_index))
+
+        self._wait_until_ready()
+        self._listener = threading.Thread(target=self._collect_results, daemon=True)
+        self._listener.start()
+
+    def _wait_until_ready(self):
+        ready_count = 0
+        while ready_count < self.num_workers:
+            try:
+                status, worker_index, payload = self._result_queue.get(timeout=settings.INFERENCE_WORKER_START_TIMEOUT)
+            except queue.Empty:
+                self.close()
+                raise TimeoutError("Worker inferensi tidak siap dalam batas waktu.")
+            if status == 'failed':
+                self.close()
+                raise RuntimeError(f"Worker inferensi {worker_index} gagal memuat model: {payload}")
+            self.names = payload
+            ready_count += 1
+        print(f"Pool inferensi siap: {self.num_workers} worker proses.")
+
+    def submit(self, image, confidence_threshold=0.35, tiled=False):
+        """Mengirim satu gambar (PIL atau array BGR) ke worker. Mengembalikan Future berisi (cls, conf, xyxy)."""
+        if self._closed:
+            raise RuntimeError("Pool inferensi sudah ditutup.")
+        image_bgr = image if isinstance(image, np.ndarray) else np.asarray(image.convert('RGB'))[..., ::-1]
+        worker_index, slot_index = self._acquire_slot()
+        worker = self._workers[worker_index]
+        request_id = next(self._request_ids)
+        future = Future()
+        with self._pending_lock:
+            self._pending[request_id] = (future, worker_index, slot_index)
+        if worker_index in self._dead_workers:
+            # Worker mati tepat setelah slotnya diambil; _check_workers mungkin tidak melihat permintaan ini
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+            raise RuntimeError(f"Worker inferensi {worker_index} berhenti.")
+
+        inline_frame = None
+        if image_bgr.nbytes <= self.slot_bytes:
+            slot_view = np.ndarray(image_bgr.shape, dtype=image_bgr.dtype, buffer=worker['shm'].buf,
+                                   offset=slot_index * self.slot_bytes)
+            slot_view[...] = image_bgr # Satu salinan ke shared memory, sekaligus menjadikannya contiguous
+        else:
+            # Frame melebihi ukuran slot: kirim lewat queue (di-pickle), slot tetap dipesan sebagai kuota
+            inline_frame = np.ascontiguousarray(image_bgr)
+        worker['requests'].put((
+            request_id, slot_index, image_bgr.shape, image_bgr.dtype.str, inline_frame, confidence_threshold, tiled
+        ))
+        return future
+
+    def _acquire_slot(self):
+        """Mengambil slot kosong; menunggu jika semua slot sedang dipakai (backpressure)."""
+        deadline = time.monotonic() + settings.INFERENCE_WORKER_TIMEOUT
+        while True:
+            if len(self._dead_workers) == self.num_workers:
+                raise RuntimeError("Semua worker inferensi berhenti.")
+            try:
+                worker_index, slot_index = self._free_slots.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                raise TimeoutError("Tidak ada slot worker inferensi yang kosong dalam batas waktu.")
+            if worker_index not in self._dead_workers:
+                return worker_index, slot_index
+            # Slot milik worker yang sudah mati dibuang
+
+    def detect(self, image, confidence_threshold=0.35, tiled=False):
+        """Deteksi sinkron; mengembalikan (cls, conf, xyxy, names) seperti helper._detect_arrays."""
+        return self.detect_many([image], confidence_threshold, tiled)[0]
+
+    def detect_many(self, images, confidence_threshold=0.35, tiled=False):
+        """Mengirim semua gambar sekaligus agar diproses paralel oleh worker, lalu menunggu hasilnya."""
+        futures = [self.submit(image, confidence_threshold, tiled) for image in images]
+        return [
+            (*future.result(timeout=settings.INFERENCE_WORKER_TIMEOUT), self.names)
+            for future in futures
+        ]
+
+    def busy_slots(self):
+        with self._pending_lock:
+            return len(self._pending)
+
+    def _collect_results(self):
+        last_check = time.monotonic()
+        while True:
+            # Status worker juga diperiksa saat worker lain terus mengirim hasil
+            if time.monotonic() - last_check >= 1:
+                self._check_workers()
+                last_check = time.monotonic()
+            try:
+                message = self._result_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            if message is None:
+                return
+            _, request_id, arrays, error = message
+            with self._pending_lock:
+                pending = self._pending.pop(request_id, None)
+            if pending is None:
+                continue # Sudah digagalkan karena worker-nya dianggap mati
+            future, worker_index, slot_index = pending
+            if worker_index not in self._dead_workers:
+                self._free_slots.put((worker_index, slot_index))
+            if error is not None:
+                future.set_exception(RuntimeError(f"Worker inferensi: {error}"))
+            else:
+                future.set_result(arrays)
+
+    def _check_workers(self):
+        """Worker yang mati (OOM, segfault runtime) tidak akan mengirim hasil lagi: gagalkan
+        permintaan yang menunggunya dan jangan pakai slotnya lagi."""
+        if self._closed:
+            return
+        for worker_index, worker in enumerate(self._workers):
+            if worker_index in self._dead_workers or worker['process'].is_alive():
+                continue
+            self._dead_workers.add(worker_index)
+            print(f"Worker inferensi {worker_index} berhenti (exit code {worker['process'].exitcode}).")
+            with self._pending_lock:
+                failed = [
+                    (request_id, future) for request_id, (future, pending_worker, _) in self._pending.items()
+                    if pending_worker == worker_index
+                ]
+                for request_id, _ in failed:
+                    del self._pending[request_id]
+            for _, future in failed:
+                future.set_exception(RuntimeError(f"Worker inferensi {worker_index} berhenti."))
+
+    def close(self):
+        """Menghentikan semua worker dan melepas shared memory."""
+        if self._closed:
+            return
+        self._closed = True
+        for worker in self._workers:
+            worker['requests'].put(None)
+        for worker in self._workers:
+            worker['process'].join(timeout=10)
+            if worker['process'].is_alive():
+                worker['process'].terminate()
+            worker['shm'].close()
+            worker['shm'].unlink()
+        self._result_queue.put(None)
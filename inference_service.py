@@ -0,0 +1,233 @@
+"""Layanan HTTP inferensi APD untuk sistem lain (kamera gerbang, aplikasi mobile).
+
+Endpoint:
+    POST /detect?confidence=0.35&save=1   body: bytes gambar atau multipart/form-data (field 'file')
+    GET  /health
+    GET  /metrics                          format teks Prometheus
+
+Permintaan yang datang bersamaan digabung menjadi satu batch inferensi (micro-batching).
+Antrian permintaan dibatasi; jika penuh, layanan menjawab HTTP 429 agar klien mencoba lagi.
+"""
+import io
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from datetime import datetime
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from zoneinfo import ZoneInfo
+from PIL import Image
+import settings
+import helper
+import metrics
+import persistence
+
+
+# --- Micro-Batching ---
+class MicroBatcher:
+    """Mengumpulkan permintaan deteksi dan menjalankannya sebagai satu batch.
+
+    Batch dijalankan saat penuh atau setelah max_wait_ms sejak permintaan pertama di batch.
+    Model dijalankan dengan ambang terendah di batch, lalu hasil difilter per permintaan.
+    """
+
+    def __init__(self, max_batch_size=settings.SERVICE_MAX_BATCH_SIZE, max_wait_ms=settings.SERVICE_MAX_WAIT_MS,
+                 queue_size=settings.SERVICE_QUEUE_SIZE):
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._batch_count = 0
+        self._request_count = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, image_pil, confidence_threshold):
+        """Memasukkan permintaan tanpa menunggu. Mengembalikan Future berisi data deteksi.
+
+        Melempar queue.Full jika antrian penuh.
+        """
+        future = Future()
+        self._queue.put_nowait((image_pil, confidence_threshold, future))
+        return future
+
+    def pending_count(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        with self._lock:
+            avg_batch_size = self._request_count / self._batch_count if self._batch_count else 0.0
+            return {
+                'batches': self._batch_count,
+                'requests': self._request_count,
+                'avg_batch_size': avg_batch_size,
+                'queue_depth': self.pending_count(),
+            }
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            # Permintaan yang sudah dibatalkan (klien timeout) tidak perlu diinferensi
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                base_confidence = min(confidence for _, confidence, _ in batch)
+                results = helper.perform_detection_batch(
+                    [image_pil for image_pil, _, _ in batch], base_confidence, batch_size=len(batch), render=False
+                )
+                for index, _, _, detections_data in results:
+                    _, confidence, future = batch[index]
+                    future.set_result([det for det in detections_data if det['confidence'] >= confidence])
+            except Exception as e:
+                print(f"Error pada MicroBatcher: {e}")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            with self._lock:
+                self._batch_count += 1
+                self._request_count += len(batch)
+
+
+# --- Handler HTTP ---
+def _read_upload(content_type, body):
+    """Mengambil bytes gambar dari body mentah atau dari field 'file'/'image' multipart/form-data."""
+    if not content_type.startswith('multipart/form-data'):
+        return body
+    message = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+    for part in message.iter_parts():
+        if part.get_param('name', header='content-disposition') in ('file', 'image'):
+            return part.get_payload(decode=True)
+    return None
+
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    server_version = "SiDetekAPD/1.0"
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/metrics':
+            body = metrics.METRICS.render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if path != '/health':
+            self._send_json(404, {'error': 'Endpoint tidak ditemukan.'})
+            return
+        self._send_json(200, {
+            'status': 'ok' if helper.MODEL_YOLO is not None else 'model_not_loaded',
+            'model': helper.ACTIVE_MODEL_NAME,
+            'backend': settings.INFERENCE_BACKEND,
+            **self.server.batcher.stats(),
+        })
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/detect':
+            self._send_json(404, {'error': 'Endpoint tidak ditemukan.'})
+            return
+        started_at = time.perf_counter()
+        params = parse_qs(url.query)
+        try:
+            confidence_threshold = float(params.get('confidence', ['0.35'])[0])
+        except ValueError:
+            self._send_json(400, {'error': "Parameter 'confidence' harus berupa angka."})
+            return
+        save = params.get('save', ['1' if self.server.persist_default else '0'])[0] in ('1', 'true')
+
+        content_length = int(self.headers.get('Content-Length') or 0)
+        if content_length <= 0:
+            self._send_json(411, {'error': 'Body permintaan kosong.'})
+            return
+        if content_length > settings.SERVICE_MAX_UPLOAD_BYTES:
+            self._send_json(413, {'error': 'Ukuran gambar melebihi batas.'})
+            return
+        image_bytes = _read_upload(self.headers.get('Content-Type', ''), self.rfile.read(content_length))
+        try:
+            image_pil = Image.open(io.BytesIO(image_bytes))
+            image_pil.load()
+        except Exception:
+            self._send_json(400, {'error': 'Body bukan gambar yang valid.'})
+            return
+
+        try:
+            future = self.server.batcher.submit(image_pil, confidence_threshold)
+        except queue.Full:
+            self._send_json(429, {'error': 'Layanan sedang sibuk, coba lagi.'}, headers={'Retry-After': '1'})
+            return
+        try:
+            detections_data = future.result(timeout=settings.SERVICE_REQUEST_TIMEOUT)
+        except FutureTimeoutError:
+            future.cancel()
+            self._send_json(504, {'error': 'Inferensi melebihi batas waktu.'})
+            return
+        except Exception as e:
+            self._send_json(500, {'error': f'Inferensi gagal: {e}'})
+            return
+
+        saved = False
+        if save:
+            image_name = f"API {datetime.now(ZoneInfo('Asia/Jakarta')).strftime('%Y-%m-%d %H_%M_%S')}.{(image_pil.format or 'jpg').lower()}"
+            saved = persistence.get_write_behind_queue().submit(
+                original_image_name=image_name,
+                original_image=image_pil,
+                detected_image=helper.draw_detections(image_pil, detections_data),
+                detections_data_list=detections_data,
+            )
+        latency_seconds = time.perf_counter() - started_at
+        metrics.observe('service.request', latency_seconds)
+        self._send_json(200, {
+            'detections': detections_data,
+            'image_size': list(image_pil.size),
+            'latency_ms': round(latency_seconds * 1000, 1),
+            'saved': saved,
+        })
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Log per permintaan terlalu ramai saat beban tinggi
+
+
+class InferenceHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Backlog bawaan (5) membuat koneksi ditolak saat banyak klien datang bersamaan;
+    # pembatasan beban dilakukan oleh antrian micro-batcher (HTTP 429)
+    request_queue_size = 128
+
+
+def create_server(host=settings.SERVICE_HOST, port=settings.SERVICE_PORT, persist_default=False, **batcher_kwargs):
+    """Membuat server HTTP beserta micro-batcher-nya. Model harus sudah dimuat (helper.load_yolo_model)."""
+    server = InferenceHTTPServer((host, port), InferenceRequestHandler)
+    server.batcher = MicroBatcher(**batcher_kwargs)
+    metrics.register_gauge('service_queue_depth', server.batcher.pending_count)
+    server.persist_default = persist_default
+    return server
@@ -0,0 +1,258 @@
+"""Metrik performa ringan: latensi per tahap, FPS, kedalaman antrian dan profiling frame.
+
+Tahap diukur dengan `with metrics.timed('webcam.to_ndarray'):`. Setiap tahap menyimpan
+histogram bergulir (sampel terakhir untuk p50/p95 dan laju per detik) serta histogram
+kumulatif untuk format teks Prometheus.
+"""
+import bisect
+import cProfile
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import settings
+
+
+# --- Histogram Bergulir ---
+class RollingHistogram:
+    """Sampel durasi terakhir (untuk persentil dan laju) plus bucket kumulatif Prometheus."""
+
+    def __init__(self, window=settings.METRICS_WINDOW, buckets=settings.METRICS_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1) # Bucket terakhir = +Inf
+        self.total_count = 0
+        self.total_seconds = 0.0
+        self._samples = deque(maxlen=window) # Tuple (waktu selesai, durasi)
+
+    def observe(self, seconds, finished_at):
+        self._samples.append((finished_at, seconds))
+        self.bucket_counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.total_count += 1
+        self.total_seconds += seconds
+
+    def percentiles(self, *percents):
+        if not self._samples:
+            return [0.0] * len(percents)
+        durations = sorted(seconds for _, seconds in self._samples)
+        # Persentil nearest-rank; cukup akurat untuk jendela ratusan sampel
+        return [durations[min(int(len(durations) * percent / 100), len(durations) - 1)] for percent in percents]
+
+    def rate_per_second(self, now):
+        """Jumlah observasi per detik dalam jendela sampel (mis. FPS untuk tahap per frame)."""
+        if len(self._samples) < 2:
+            return 0.0
+        span = now - self._samples[0][0]
+        return len(self._samples) / span if span > 0 else 0.0
+
+
+# --- Registry Metrik ---
+class MetricsRegistry:
+    def __init__(self, enabled=settings.METRICS_ENABLED):
+        self.enabled = enabled
+        self._histograms = {}
+        self._gauges = {} # nama -> fungsi tanpa argumen yang mengembalikan angka
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def timed(self, stage_name):
+        if not self.enabled:
+            yield
+            return
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            finished_at = time.perf_counter()
+            self.observe(stage_name, finished_at - started_at, finished_at)
+
+    def observe(self, stage_name, seconds, finished_at=None):
+        if not self.enabled:
+            return
+        finished_at = finished_at if finished_at is not None else time.perf_counter()
+        with self._lock:
+            histogram = self._histograms.get(stage_name)
+            if histogram is None:
+                histogram = self._histograms[stage_name] = RollingHistogram()
+            histogram.observe(seconds, finished_at)
+
+    def register_gauge(self, gauge_name, value_fn):
+        """Mendaftarkan gauge yang nilainya dibaca saat snapshot (mis. kedalaman antrian)."""
+        with self._lock:
+            self._gauges[gauge_name] = value_fn
+
+    def gauge_values(self):
+        with self._lock:
+            gauges = dict(self._gauges)
+        values = {}
+        for gauge_name, value_fn in gauges.items():
+            try:
+                values[gauge_name] = float(value_fn())
+            except Exception as e:
+                print(f"Error membaca gauge {gauge_name}: {e}")
+        return values
+
+    def snapshot(self):
+        """Ringkasan per tahap: jumlah, p50/p95 (ms) dan laju per detik dalam jendela sampel."""
+        now = time.perf_counter()
+        with self._lock:
+            stages = {}
+            for stage_name, histogram in sorted(self._histograms.items()):
+                p50, p95 = histogram.percentiles(50, 95)
+                stages[stage_name] = {
+                    'count': histogram.total_count,
+                    'p50_ms': p50 * 1000,
+                    'p95_ms': p95 * 1000,
+                    'rate_per_second': histogram.rate_per_second(now),
+                }
+        return stages
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def render_prometheus(self):
+        """Metrik dalam format teks eksposisi Prometheus."""
+        lines = [
+            "# HELP sidetek_stage_duration_seconds Durasi tiap tahap pemrosesan.",
+            "# TYPE sidetek_stage_duration_seconds histogram",
+        ]
+        quantile_lines = [
+            "# HELP sidetek_stage_duration_rolling_seconds Persentil durasi pada jendela sampel terakhir.",
+            "# TYPE sidetek_stage_duration_rolling_seconds gauge",
+        ]
+        with self._lock:
+            for stage_name, histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip(list(histogram.buckets) + ['+Inf'], histogram.bucket_counts):
+                    cumulative += count
+                    lines.append(f'sidetek_stage_duration_seconds_bucket{{stage="{stage_name}",le="{bound}"}} {cumulative}')
+                lines.append(f'sidetek_stage_duration_seconds_sum{{stage="{stage_name}"}} {histogram.total_seconds}')
+                lines.append(f'sidetek_stage_duration_seconds_count{{stage="{stage_name}"}} {histogram.total_count}')
+                for quantile, value in zip(('0.5', '0.95'), histogram.percentiles(50, 95)):
+                    quantile_lines.append(
+                        f'sidetek_stage_duration_rolling_seconds{{stage="{stage_name}",quantile="{quantile}"}} {value}'
+                    )
+        gauge_lines = [
+            "# HELP sidetek_gauge Nilai sesaat seperti kedalaman antrian.",
+            "# TYPE sidetek_gauge gauge",
+        ]
+        for gauge_name, value in sorted(self.gauge_values().items()):
+            gauge_lines.append(f'sidetek_gauge{{name="{gauge_name}"}} {value}')
+        return "\n".join(lines + quantile_lines + gauge_lines) + "\n"
+
+    def write_prometheus_file(self, path):
+        # Tulis ke file sementara lalu rename agar collector tidak membaca file setengah jadi
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+
+METRICS = MetricsRegistry()
+timed = METRICS.timed
+observe = METRICS.observe
+register_gauge = METRICS.register_gauge
+
+
+# --- Profiling Sejumlah Frame ---
+class FrameProfiler:
+    """Merekam cProfile selama N frame berikutnya lalu menyimpannya sebagai file .prof.
+
+    File .prof bisa dibuka dengan pstats, snakeviz, atau dikonversi ke flamegraph
+    (mis. flameprof / py-spy untuk perbandingan).
+    """
+
+    def __init__(self, output_dir=settings.PROFILE_DIR):
+        self.output_dir = output_dir
+        self.last_profile_path = None
+        self._lock = threading.Lock()
+        self._profile = None
+        self._remaining_frames = 0
+        self._label = None
+
+    def request(self, frame_count, label='webcam'):
+        with self._lock:
+            self._profile = cProfile.Profile()
+            self._remaining_frames = max(int(frame_count), 1)
+            self._label = label
+
+    def is_active(self):
+        with self._lock:
+            return self._remaining_frames > 0
+
+    def remaining_frames(self):
+        with self._lock:
+            return self._remaining_frames
+
+    @contextmanager
+    def frame(self):
+        """Membungkus pemrosesan satu frame; hanya merekam jika ada permintaan profiling."""
+        with self._lock:
+            profile = self._profile if self._remaining_frames > 0 else None
+        if profile is None:
+            yield
+            return
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._finish_frame(profile)
+
+    def _finish_frame(self, profile):
+        with self._lock:
+            if profile is not self._profile:
+                return
+            self._remaining_frames -= 1
+            if self._remaining_frames > 0:
+                return
+            self._profile = None
+            label = self._label
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        profile_path = self.output_dir / f"{label}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.prof"
+        profile.dump_stats(str(profile_path))
+        self.last_profile_path = profile_path
+        print(f"Profil frame disimpan ke {profile_path}")
+
+
+PROFILER = FrameProfiler()
+
+
+# --- Ekspor Prometheus ---
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = METRICS.render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_exporter(port=settings.METRICS_PORT, file_path=settings.METRICS_FILE,
+                           file_interval=settings.METRICS_FILE_INTERVAL, host=settings.METRICS_HOST):
+    """Menjalankan endpoint /metrics (jika port diisi) dan/atau penulis file metrik berkala."""
+    if port:
+        server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"Endpoint metrik Prometheus: http://{host}:{port}/metrics")
+    if file_path:
+        def _write_periodically():
+            while True:
+                try:
+                    METRICS.write_prometheus_file(file_path)
+                except Exception as e:
+                    print(f"Error menulis file metrik: {e}")
+                time.sleep(file_interval)
+
+        threading.Thread(target=_write_periodically, daemon=True).start()
@@ -0,0 +1,270 @@
+"""Deteksi multi kamera: banyak stream RTSP/file video, satu scheduler inferensi bersama.
+
+Setiap kamera dibaca oleh thread sendiri, tetapi inferensi dilakukan oleh satu scheduler yang
+menggabungkan frame dari beberapa stream menjadi satu batch. File video lokal diputar sesuai
+FPS aslinya sehingga bisa dipakai sebagai pengganti kamera saat pengujian.
+"""
+import threading
+import time
+import av
+import settings
+import helper
+
+
+# --- Scheduler Batch Lintas Stream ---
+class CrossStreamScheduler:
+    """Membentuk batch inferensi dari frame terbaru setiap stream.
+
+    - Setiap stream hanya punya satu slot frame; frame baru menggantikan frame yang belum
+      diproses (frame lama dihitung sebagai drop), sehingga stream cepat tidak menumpuk antrian.
+    - Batch dijalankan saat sudah penuh atau saat frame tertua mencapai batas tunggu
+      (max_wait_ms), jadi latensi tetap terbatas walaupun stream sedikit.
+    - Stream dipilih bergiliran (round-robin) mulai dari stream setelah yang terakhir dilayani,
+      agar tidak ada kamera yang terus tertinggal saat jumlah stream melebihi ukuran batch.
+    - Frame yang sudah lebih tua dari max_frame_age_ms dibuang tanpa inferensi.
+    """
+
+    def __init__(self, confidence_threshold=0.35, max_batch_size=settings.MULTICAM_MAX_BATCH_SIZE,
+                 max_wait_ms=settings.MULTICAM_MAX_WAIT_MS, max_frame_age_ms=settings.MULTICAM_MAX_FRAME_AGE_MS):
+        self.confidence_threshold = confidence_threshold
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self.max_wait = max_wait_ms / 1000
+        self.max_frame_age = max_frame_age_ms / 1000
+        self._condition = threading.Condition()
+        self._streams = {} # stream_id -> state (slot frame, hasil terbaru, statistik, callback)
+        self._order = [] # Urutan stream untuk round-robin
+        self._next_index = 0
+        self._batch_count = 0
+        self._batched_frames = 0
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def register_stream(self, stream_id, on_result=None):
+        """Mendaftarkan stream. on_result(stream_id, image_bgr, detections) dipanggil setiap ada hasil."""
+        with self._condition:
+            if stream_id not in self._streams:
+                self._order.append(stream_id)
+            self._streams[stream_id] = {
+                'pending': None, # Tuple (image_bgr, captured_at)
+                'latest': None, # Tuple (image_bgr, detections, captured_at, latency)
+                'on_result': on_result,
+                'submitted': 0,
+                'processed': 0,
+                'dropped': 0,
+                'latency_total': 0.0,
+            }
+
+    def submit(self, stream_id, image_bgr, captured_at=None):
+        """Menaruh frame terbaru sebuah stream ke slotnya tanpa menunggu inferensi."""
+        with self._condition:
+            state = self._streams[stream_id]
+            if state['pending'] is not None:
+                state['dropped'] += 1
+            state['pending'] = (image_bgr, captured_at if captured_at is not None else time.monotonic())
+            state['submitted'] += 1
+            self._condition.notify()
+
+    def latest_result(self, stream_id):
+        with self._condition:
+            return self._streams[stream_id]['latest']
+
+    def stream_ids(self):
+        with self._condition:
+            return list(self._order)
+
+    def stats(self):
+        with self._condition:
+            streams = {
+                stream_id: {
+                    'submitted': state['submitted'],
+                    'processed': state['processed'],
+                    'dropped': state['dropped'],
+                    'avg_latency_ms': state['latency_total'] / state['processed'] * 1000 if state['processed'] else 0.0,
+                }
+                for stream_id, state in self._streams.items()
+            }
+            avg_batch_size = self._batched_frames / self._batch_count if self._batch_count else 0.0
+            return {'streams': streams, 'batches': self._batch_count, 'avg_batch_size': avg_batch_size}
+
+    def stop(self):
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify_all()
+        self._thread.join(timeout=5)
+
+    def _pending_ids(self):
+        return [stream_id for stream_id in self._order if self._streams[stream_id]['pending'] is not None]
+
+    def _collect_batch(self):
+        """Menunggu sampai batch penuh atau batas tunggu frame tertua habis, lalu mengambil frame."""
+        with self._condition:
+            while not self._stop_event.is_set():
+                pending_ids = self._pending_ids()
+                if not pending_ids:
+                    self._condition.wait(0.1)
+                    continue
+                if len(pending_ids) >= self.max_batch_size:
+                    break
+                oldest = min(self._streams[stream_id]['pending'][1] for stream_id in pending_ids)
+                remaining = oldest + self.max_wait - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            if self._stop_event.is_set():
+                return []
+
+            # Round-robin: mulai dari stream setelah stream yang terakhir dilayani
+            now = time.monotonic()
+            rotated = self._order[self._next_index:] + self._order[:self._next_index]
+            batch = []
+            for stream_id in rotated:
+                state = self._streams[stream_id]
+                if state['pending'] is None:
+                    continue
+                image_bgr, captured_at = state['pending']
+                state['pending'] = None
+                if now - captured_at > self.max_frame_age:
+                    state['dropped'] += 1 # Terlalu usang; hasilnya tidak lagi berguna
+                    continue
+                batch.append((stream_id, image_bgr, captured_at))
+                if len(batch) >= self.max_batch_size:
+                    break
+            if batch:
+                self._next_index = (self._order.index(batch[-1][0]) + 1) % len(self._order)
+            return batch
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            batch = self._collect_batch()
+            if not batch:
+                continue
+            try:
+                detections_list = helper.perform_detection_ndarray_batch(
+                    [image_bgr for _, image_bgr, _ in batch], self.confidence_threshold
+                )
+            except Exception as e:
+                print(f"Error pada CrossStreamScheduler: {e}")
+                continue
+            self._publish(batch, detections_list)
+
+    def _publish(self, batch, detections_list):
+        finished_at = time.monotonic()
+        callbacks = []
+        with self._condition:
+            self._batch_count += 1
+            self._batched_frames += len(batch)
+            for (stream_id, image_bgr, captured_at), detections in zip(batch, detections_list):
+                state = self._streams[stream_id]
+                latency = finished_at - captured_at
+                state['latest'] = (image_bgr, detections, captured_at, latency)
+                state['processed'] += 1
+                state['latency_total'] += latency
+                if state['on_result'] is not None:
+                    callbacks.append((state['on_result'], stream_id, image_bgr, detections))
+        # Callback dipanggil di luar lock agar tidak menahan submit dari thread kamera
+        for on_result, stream_id, image_bgr, detections in callbacks:
+            try:
+                on_result(stream_id, image_bgr, detections)
+            except Exception as e:
+                print(f"Error pada callback hasil stream {stream_id}: {e}")
+
+
+# --- Pembaca Kamera/File Video ---
+def is_live_source(source):
+    return '://' in source
+
+
+class CameraReader:
+    """Thread yang membaca satu sumber video dengan av dan mengirim setiap frame ke scheduler.
+
+    Sumber live (RTSP/HTTP) disambung ulang jika terputus. File lokal diputar sesuai timestamp
+    frame agar berperilaku seperti kamera, dan bisa diulang dengan loop=True.
+    """
+
+    def __init__(self, stream_id, source, scheduler, loop=False):
+        self.stream_id = stream_id
+        self.source = source
+        self.scheduler = scheduler
+        self.loop = loop
+        self.live = is_live_source(source)
+        self.error = None
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join(timeout=5)
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self._read_once()
+                self.error = None
+            except Exception as e:
+                self.error = str(e)
+                print(f"Error membaca stream {self.stream_id} ({self.source}): {e}")
+                if not self.live:
+                    return
+            if not (self.live or self.loop):
+                return
+            if self.live:
+                self._stop_event.wait(settings.MULTICAM_RECONNECT_DELAY)
+
+    def _read_once(self):
+        # TCP lebih andal daripada UDP untuk RTSP di jaringan lokasi proyek
+        options = {'rtsp_transport': 'tcp'} if self.source.startswith('rtsp://') else {}
+        with av.open(self.source, options=options) as container:
+            stream = container.streams.video[0]
+            stream.thread_type = 'AUTO'
+            started_at = time.monotonic()
+            for frame in container.decode(stream):
+                if self._stop_event.is_set():
+                    return
+                if not self.live and frame.time is not None:
+                    # Putar file sesuai kecepatan aslinya, seperti kamera sungguhan
+                    delay = started_at + frame.time - time.monotonic()
+                    if delay > 0 and self._stop_event.wait(delay):
+                        return
+                self.scheduler.submit(self.stream_id, frame.to_ndarray(format="bgr24"))
+
+
+# --- Sesi Multi Kamera ---
+class MultiCameraSession:
+    """Menjalankan satu scheduler bersama dan satu CameraReader per sumber."""
+
+    def __init__(self, sources, confidence_threshold=0.35, loop=False, **scheduler_kwargs):
+        self.scheduler = CrossStreamScheduler(confidence_threshold, **scheduler_kwargs)
+        self.readers = []
+        for index, source in enumerate(sources, start=1):
+            stream_id = f"cam{index}"
+            self.scheduler.register_stream(stream_id)
+            self.readers.append(CameraReader(stream_id, source, self.scheduler, loop=loop))
+        for reader in self.readers:
+            reader.start()
+
+    def is_running(self):
+        return any(reader.is_alive() for reader in self.readers)
+
+    def update_confidence(self, confidence_threshold):
+        self.scheduler.confidence_threshold = confidence_threshold
+
+    def stats(self):
+        stats = self.scheduler.stats()
+        for reader in self.readers:
+            stream_stats = stats['streams'][reader.stream_id]
+            stream_stats['source'] = reader.source
+            stream_stats['alive'] = reader.is_alive()
+            stream_stats['error'] = reader.error
+        return stats
+
+    def stop(self):
+        for reader in self.readers:
+            reader.stop()
+        self.scheduler.stop()
@@ -0,0 +1,117 @@
+import atexit
+import queue
+import threading
+import numpy as np
+import settings
+import helper
+import metrics
+
+
+# --- Antrian Write-Behind untuk Penyimpanan Hasil Deteksi ---
+class DetectionWriteBehindQueue:
+    """Menyimpan hasil deteksi di thread latar belakang.
+
+    Encoding gambar dan commit database dilakukan di luar thread pemanggil. Record yang
+    menunggu digabung menjadi satu transaksi per batch, lalu hasilnya (ID record atau None)
+    dikirim ke result_queue milik masing-masing permintaan.
+    """
+
+    _STOP = object()
+
+    def __init__(self, max_queue_size=settings.PERSISTENCE_QUEUE_SIZE,
+                 max_batch_size=settings.PERSISTENCE_MAX_BATCH_SIZE):
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, original_image_name, original_image, detected_image, detections_data_list, result_queue=None):
+        """Memasukkan permintaan simpan tanpa menunggu.
+
+        Gambar boleh berupa PIL Image atau array BGR. Mengembalikan False jika antrian penuh.
+        """
+        item = (original_image_name, original_image, detected_image, detections_data_list, result_queue)
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            print("Antrian penyimpanan penuh, permintaan simpan dibuang.")
+            if result_queue is not None:
+                result_queue.put(None)
+            return False
+
+    def pending_count(self):
+        return self._queue.qsize()
+
+    def shutdown(self, timeout=None):
+        """Menunggu semua permintaan yang tersisa tersimpan, lalu menghentikan worker."""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(self._STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                return
+
+            # Gabungkan permintaan lain yang sudah menunggu ke batch yang sama
+            batch = [item]
+            stop_after_batch = False
+            while len(batch) < self.max_batch_size:
+                try:
+                    next_item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if next_item is self._STOP:
+                    stop_after_batch = True
+                    break
+                batch.append(next_item)
+
+            self._persist_batch(batch)
+            if stop_after_batch:
+                return
+
+    def _persist_batch(self, batch):
+        try:
+            records = [
+                (name, _to_pil(original_image), _to_pil(detected_image), detections)
+                for name, original_image, detected_image, detections, _ in batch
+            ]
+            record_ids = helper.save_detections_batch_to_db(records)
+        except Exception as e:
+            print(f"Error pada antrian penyimpanan: {e}")
+            record_ids = None
+        if record_ids is None:
+            print(f"{len(batch)} permintaan simpan gagal disimpan.")
+
+        for offset, (*_, result_queue) in enumerate(batch):
+            if result_queue is not None:
+                result_queue.put(record_ids[offset] if record_ids else None)
+
+
+def _to_pil(image):
+    if isinstance(image, np.ndarray):
+        return helper.ndarray_to_pil(image)
+    return image
+
+
+_write_behind_queue = None
+_write_behind_lock = threading.Lock()
+
+def get_write_behind_queue():
+    """Mengembalikan instance antrian write-behind bersama (dibuat sekali per proses)."""
+    global _write_behind_queue
+    with _write_behind_lock:
+        if _write_behind_queue is None:
+            _write_behind_queue = DetectionWriteBehindQueue()
+            # Pastikan antrian dikosongkan sebelum proses berhenti. atexit biasa berjalan setelah
+            # concurrent.futures menutup ENCODE_POOL, jadi flush didaftarkan di threading atexit
+            # yang dipanggil sebelumnya (urutan terbalik: yang didaftarkan terakhir jalan dulu).
+            # threading._register_atexit adalah API privat CPython; jika tidak tersedia, atexit
+            # biasa tetap aman karena submit_encode meng-encode langsung saat pool sudah ditutup
+            register_atexit = getattr(threading, '_register_atexit', None) or atexit.register
+            register_atexit(_write_behind_queue.shutdown)
+            metrics.register_gauge('persistence_queue_depth', _write_behind_queue.pending_count)
+        return _write_behind_queue
@@ -1,6 +1,6 @@
 from pathlib import Path
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 
 # Direktori utama proyek
 FILE = Path(__file__).resolve()
@@ -10,6 +10,29 @@ ROOT = FILE.parent
 MODEL_DIR = ROOT / 'weights'
 DETECTION_MODEL_PATH = MODEL_DIR / 'model-deteksi-apd.pt'
 
+# Registry model bernama; beberapa model bisa tetap dimuat di memori (eviksi LRU)
+DEFAULT_MODEL_NAME = 'default'
+MODEL_WEIGHTS = {
+    DEFAULT_MODEL_NAME: DETECTION_MODEL_PATH,
+}
+MODEL_REGISTRY_MAX_MODELS = 2
+
+# Backend inferensi: 'pytorch', 'onnx', 'onnx-int8', 'openvino' atau 'openvino-int8'.
+# Selain 'pytorch', bobot .pt diekspor sekali lalu artefaknya dipakai ulang (cache).
+INFERENCE_BACKEND = os.environ.get('SIDETEK_INFERENCE_BACKEND', 'pytorch')
+INFERENCE_BACKENDS = ['pytorch', 'onnx', 'onnx-int8', 'openvino', 'openvino-int8']
+INFERENCE_THREADS = int(os.environ.get('SIDETEK_INFERENCE_THREADS', os.cpu_count() or 1)) # Hanya untuk backend 'pytorch'
+INFERENCE_IMGSZ = 640
+INT8_CALIBRATION_DATA = os.environ.get('SIDETEK_INT8_CALIBRATION_DATA') # dataset .yaml untuk kalibrasi OpenVINO int8
+
+# Pool proses inferensi (opsional): N proses masing-masing memuat model sekali; frame dikirim
+# lewat ring buffer shared memory, bukan di-pickle. 0 = inferensi di proses utama.
+INFERENCE_WORKERS = int(os.environ.get('SIDETEK_INFERENCE_WORKERS', '0'))
+INFERENCE_WORKER_SLOTS = 2 # Slot ring buffer per worker (frame yang boleh menunggu/diproses bersamaan)
+INFERENCE_WORKER_SLOT_MB = 32 # Frame yang lebih besar dikirim lewat queue biasa (lebih lambat)
+INFERENCE_WORKER_TIMEOUT = 60 # Detik menunggu hasil satu frame
+INFERENCE_WORKER_START_TIMEOUT = 300 # Detik menunggu semua worker selesai memuat model
+
 # Path untuk aset
 IMAGES_DIR = ROOT / 'assets'
 DEFAULT_IMAGE = IMAGES_DIR / 'testing-apd-gundar5.jpg'
@@ -17,9 +40,142 @@ DEFAULT_DETECT_IMAGE = IMAGES_DIR / 'testing-apd-gundar5-detected.jpg'
 
 # Konfigurasi database
 DATABASE_NAME = "ppe_detection_history.db"
-DATABASE_URL = f"sqlite:///{ROOT / DATABASE_NAME}"
+DATABASE_URL = os.environ.get('SIDETEK_DATABASE_URL', f"sqlite:///{ROOT / DATABASE_NAME}")
+
+# Profil PRAGMA SQLite yang diterapkan pada setiap koneksi baru.
+# 'performance': WAL agar pembaca tidak memblokir penulis, synchronous=NORMAL (aman di WAL),
+# mmap dan cache lebih besar, serta busy_timeout untuk menghindari "database is locked".
+SQLITE_PROFILES = {
+    'default': {},
+    'performance': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64000, # Nilai negatif = dalam KiB (~64 MB)
+        'busy_timeout': 5000, # milidetik
+        'temp_store': 'MEMORY',
+    },
+}
+SQLITE_PROFILE = os.environ.get('SIDETEK_SQLITE_PROFILE', 'performance')
+
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False}) # check_same_thread untuk SQLite
 
+@event.listens_for(engine, "connect")
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # Harus sebelum journal_mode=WAL: WAL langsung menulis header file, setelah itu
+    # auto_vacuum database baru tidak bisa lagi diubah tanpa VACUUM penuh
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    for pragma, value in SQLITE_PROFILES[SQLITE_PROFILE].items():
+        cursor.execute(f"PRAGMA {pragma} = {value}")
+    cursor.close()
+
+# Konfigurasi penyimpanan gambar (di luar database)
+IMAGE_STORE_BACKEND = 'local'
+IMAGE_STORE_DIR = Path(os.environ.get('SIDETEK_IMAGE_STORE_DIR', ROOT / 'image_store'))
+
+# Kebijakan codec gambar yang disimpan. format: 'JPEG', 'WEBP' atau 'PNG'.
+# keep_source_format=True mempertahankan format file unggahan (mis. JPG tetap JPG).
+IMAGE_CODEC_POLICIES = {
+    'original': {'format': 'JPEG', 'quality': 92, 'keep_source_format': True},
+    'annotated': {'format': 'JPEG', 'quality': 85},
+}
+PNG_COMPRESS_LEVEL = 3 # 0-9; makin tinggi makin kecil namun makin lambat
+IMAGE_ENCODE_WORKERS = 4
+
+# Konfigurasi thumbnail untuk halaman riwayat. st.image hanya meneruskan bytes JPEG/PNG
+# apa adanya; format lain (mis. WebP) di-decode dan di-encode ulang setiap rerun.
+THUMBNAIL_MAX_WIDTH = 400
+THUMBNAIL_FORMAT = 'JPEG'
+THUMBNAIL_QUALITY = 80
+
+# Cache hasil inferensi (unggah gambar). Model dijalankan sekali dengan ambang rendah;
+# ambang yang lebih tinggi cukup memfilter hasil cache.
+DETECTION_CACHE_MAX_BYTES = 16 * 1024 * 1024
+DETECTION_CACHE_BASE_CONFIDENCE = 0.05
+
+# Inferensi tile untuk foto resolusi tinggi: gambar dipotong menjadi tile yang saling
+# tumpang tindih, diinferensi per batch, lalu hasilnya digabung dengan NMS.
+TILED_INFERENCE_MIN_SIDE = 2500 # Mode otomatis aktif jika sisi terpanjang gambar melebihi ini
+TILE_SIZE = 640
+TILE_OVERLAP = 0.2 # Proporsi tumpang tindih antar tile
+TILE_BATCH_SIZE = 8
+TILE_NMS_IOU = 0.5
+TILE_INCLUDE_FULL_IMAGE = True # Tambahkan satu pass gambar utuh untuk objek besar
+
+# Konfigurasi deteksi batch (unggah banyak gambar)
+DETECTION_BATCH_SIZE = 8
+DETECTION_MAX_BATCH_SIZE = 32
+
+# Konfigurasi halaman riwayat
+HISTORY_PAGE_SIZES = [5, 10, 20, 50]
+HISTORY_DEFAULT_PAGE_SIZE = 10
+
+# Konfigurasi dashboard tren kepatuhan
+ROLLUP_PERIODS = ['hour', 'day']
+DASHBOARD_DEFAULT_DAYS = 30
+
+# Konfigurasi antrian penyimpanan latar belakang (write-behind)
+PERSISTENCE_QUEUE_SIZE = 64
+PERSISTENCE_MAX_BATCH_SIZE = 16
+
+# Konfigurasi layanan HTTP inferensi (python -m sidetek serve). Permintaan yang datang
+# bersamaan digabung menjadi satu batch dalam jendela tunggu SERVICE_MAX_WAIT_MS.
+SERVICE_HOST = os.environ.get('SIDETEK_SERVICE_HOST', '127.0.0.1')
+SERVICE_PORT = int(os.environ.get('SIDETEK_SERVICE_PORT', '8502'))
+SERVICE_MAX_BATCH_SIZE = 8
+SERVICE_MAX_WAIT_MS = 10
+SERVICE_QUEUE_SIZE = 64 # Permintaan di atas batas ini ditolak dengan HTTP 429
+SERVICE_REQUEST_TIMEOUT = 30 # Detik
+SERVICE_MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+
+# Konfigurasi pemrosesan batch tanpa UI (python -m sidetek batch)
+BATCH_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+BATCH_VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+BATCH_STAGE_QUEUE_SIZE = 16 # Kapasitas antrian antar tahap pipeline
+BATCH_VIDEO_FRAME_STEP = 1 # Hanya setiap frame ke-N dari video yang dideteksi
+BATCH_PROGRESS_FILE = ROOT / 'batch_progress.json'
+
+# Konfigurasi deteksi realtime (webcam)
+# Mode pemrosesan: setiap frame, worker "frame terbaru" (frame usang dibuang), atau
+# deteksi tiap N frame dengan tracker yang membawa box maju di frame di antaranya
+WEBCAM_MODE_EVERY_FRAME = 'every_frame'
+WEBCAM_MODE_LATEST_FRAME = 'latest_frame'
+WEBCAM_MODE_TRACKING = 'tracking'
+WEBCAM_DEFAULT_MODE = WEBCAM_MODE_LATEST_FRAME
+WEBCAM_DEFAULT_TARGET_FPS = 10
+WEBCAM_MAX_TARGET_FPS = 30
+WEBCAM_MAX_DETECT_INTERVAL = 10 # Batas N untuk mode tracking adaptif
+
+# Konfigurasi multi kamera: satu scheduler membentuk batch lintas stream dengan batas latensi
+MULTICAM_MAX_BATCH_SIZE = 8
+MULTICAM_MAX_WAIT_MS = 50 # Batas tunggu frame tertua sebelum batch yang belum penuh dijalankan
+MULTICAM_MAX_FRAME_AGE_MS = 1000 # Frame yang lebih tua dari ini dibuang tanpa inferensi
+MULTICAM_RECONNECT_DELAY = 5 # Detik sebelum menyambung ulang stream RTSP yang terputus
+MULTICAM_DISPLAY_FPS = 5
+MULTICAM_SOURCES = [src.strip() for src in os.environ.get('SIDETEK_CAMERA_SOURCES', '').split(',') if src.strip()]
+
+# Konfigurasi tracker IoU
+TRACKER_IOU_THRESHOLD = 0.3
+TRACKER_MAX_MISSED = 3 # Jumlah siklus deteksi sebelum track yang hilang dihapus
+
+# Konfigurasi metrik performa per tahap (latensi, FPS, kedalaman antrian)
+METRICS_ENABLED = os.environ.get('SIDETEK_METRICS', '1') != '0'
+METRICS_WINDOW = 500 # Jumlah sampel terakhir untuk p50/p95 dan FPS
+METRICS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0) # Detik, histogram Prometheus
+METRICS_HOST = os.environ.get('SIDETEK_METRICS_HOST', '127.0.0.1') # Isi 0.0.0.0 agar bisa di-scrape dari mesin lain
+METRICS_PORT = int(os.environ.get('SIDETEK_METRICS_PORT', '0')) # 0 = endpoint /metrics tidak dijalankan
+METRICS_FILE = os.environ.get('SIDETEK_METRICS_FILE') # File teks Prometheus (node_exporter textfile collector)
+METRICS_FILE_INTERVAL = 10 # Detik antar penulisan file metrik
+PROFILE_DIR = ROOT / 'profiles'
+PROFILE_DEFAULT_FRAMES = 100
+
+# Konfigurasi ekspor riwayat (ZIP berisi gambar dan manifest deteksi)
+EXPORT_DIR = ROOT / 'exports'
+EXPORT_BATCH_SIZE = 200 # Jumlah record per fetch dari database (yield_per)
+EXPORT_MANIFEST_FORMATS = ['csv', 'parquet'] # parquet membutuhkan pyarrow
+EXPORT_UI_MAX_DOWNLOAD_MB = 500 # Ekspor lebih besar hanya ditulis ke disk, tanpa tombol unduh
+
 # Opsi untuk sidebar
 IMAGE = 'Gambar'
 SOURCES_LIST = [IMAGE]
\ No newline at end of file
@@ -0,0 +1,277 @@
+"""Perintah baris (CLI) SiDetek-APD.
+
+Contoh penggunaan:
+    python -m sidetek migrate-images
+    python -m sidetek vacuum
+    python -m sidetek backfill-detections
+    python -m sidetek rebuild-rollups
+    python -m sidetek export-model --backend onnx
+    python -m sidetek batch /data/foto-proyek --output hasil.jsonl
+    python -m sidetek multicam rtsp://kamera-1/stream rekaman.mp4 --duration 60
+    python -m sidetek serve --port 8502
+    python -m sidetek export-history --start 2025-01-01 --end 2025-03-31 --label No-Helmet
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+import database
+import helper
+import settings
+
+
+def cmd_migrate_images(args):
+    database.init_db()
+    summary = helper.migrate_blobs_to_image_store(batch_size=args.batch_size, vacuum=not args.no_vacuum)
+    print(
+        f"Selesai: {summary['migrated']} record dimigrasikan. "
+        f"Ukuran database {summary['db_size_before'] / 1e6:.1f} MB -> {summary['db_size_after'] / 1e6:.1f} MB."
+    )
+    return 0
+
+
+def cmd_vacuum(args):
+    database.init_db()
+    size_before = helper._database_file_size()
+    print("Menjalankan VACUUM penuh untuk mengaktifkan auto_vacuum INCREMENTAL (mungkin memakan waktu)...")
+    if not database.enable_incremental_auto_vacuum():
+        print("Selesai: auto_vacuum INCREMENTAL sudah aktif, tidak ada yang dikonversi.")
+        return 0
+    print(
+        f"Selesai: auto_vacuum INCREMENTAL aktif. "
+        f"Ukuran database {size_before / 1e6:.1f} MB -> {helper._database_file_size() / 1e6:.1f} MB."
+    )
+    return 0
+
+
+def cmd_backfill_detections(args):
+    database.init_db()
+    created_count = helper.backfill_detection_objects(batch_size=args.batch_size)
+    print(f"Selesai: {created_count} baris detection_objects dibuat.")
+    return 0
+
+
+def cmd_rebuild_rollups(args):
+    database.init_db()
+    bucket_count = helper.rebuild_rollups()
+    print(f"Selesai: {bucket_count} baris rollup dihitung ulang.")
+    return 0
+
+
+def cmd_export_model(args):
+    exported_path = helper.export_model(args.backend, force=args.force)
+    print(f"Selesai: artefak {args.backend} tersedia di {exported_path}")
+    return 0
+
+
+def cmd_batch(args):
+    import batch_pipeline
+    if args.no_db and not args.output:
+        print("Tidak ada keluaran: gunakan --output dan/atau simpan ke database (tanpa --no-db).")
+        return 2
+    if not args.no_db:
+        database.init_db()
+    if helper.load_yolo_model() is None:
+        return 1
+
+    summary = batch_pipeline.run_batch(
+        args.source, confidence_threshold=args.confidence, output_jsonl=args.output,
+        save_to_db=not args.no_db, frame_step=args.frame_step, batch_size=args.batch_size,
+        progress_file=args.progress_file, restart=args.restart
+    )
+    print(
+        f"Selesai: {summary['frames']} frame dalam {summary['elapsed_seconds']:.1f} s "
+        f"({summary['overall_fps']:.1f} frame/s keseluruhan)."
+    )
+    for stage_name, fps in summary['stage_fps'].items():
+        print(f"  {stage_name:<10} {fps:8.1f} frame/s")
+    if summary['error']:
+        print(f"Pipeline berhenti karena error ({summary['error']}); jalankan ulang untuk melanjutkan.")
+        return 1
+    return 0
+
+
+def _print_multicam_stats(stats):
+    print(f"Batch: {stats['batches']} (rata-rata {stats['avg_batch_size']:.1f} frame/batch)")
+    for stream_id, stream_stats in stats['streams'].items():
+        status = "aktif" if stream_stats['alive'] else f"berhenti ({stream_stats['error'] or 'selesai'})"
+        print(
+            f"  {stream_id} [{status}] diproses {stream_stats['processed']}/{stream_stats['submitted']}, "
+            f"dibuang {stream_stats['dropped']}, latensi {stream_stats['avg_latency_ms']:.0f} ms - {stream_stats['source']}"
+        )
+
+
+def cmd_multicam(args):
+    import multicam
+    sources = args.sources or settings.MULTICAM_SOURCES
+    if not sources:
+        print("Tidak ada sumber: berikan URL RTSP/file video atau isi SIDETEK_CAMERA_SOURCES.")
+        return 2
+    if helper.load_yolo_model() is None:
+        return 1
+
+    session = multicam.MultiCameraSession(
+        sources, confidence_threshold=args.confidence, loop=args.loop,
+        max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms
+    )
+    started_at = time.monotonic()
+    try:
+        while session.is_running() and (not args.duration or time.monotonic() - started_at < args.duration):
+            time.sleep(args.report_interval)
+            _print_multicam_stats(session.stats())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        session.stop()
+    print("Selesai.")
+    _print_multicam_stats(session.stats())
+    return 0
+
+
+def cmd_serve(args):
+    import inference_service
+    import metrics
+    database.init_db()
+    if helper.load_yolo_model() is None:
+        return 1
+
+    server = inference_service.create_server(
+        args.host, args.port, persist_default=args.persist,
+        max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms, queue_size=args.queue_size
+    )
+    # /metrics sudah dilayani server ini; exporter hanya untuk file metrik (jika diatur)
+    metrics.start_metrics_exporter(port=0)
+    print(f"Layanan inferensi berjalan di http://{args.host}:{args.port} (POST /detect, GET /health, GET /metrics)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def _parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d")
+
+
+def cmd_export_history(args):
+    import history_export
+    database.init_db()
+    # --end inklusif (satu hari penuh), sama seperti filter tanggal di halaman riwayat
+    end_datetime = args.end + timedelta(days=1) if args.end else None
+    output_path = args.output or history_export.default_export_path(args.format)
+    total_records = helper.count_detection_results(args.start, end_datetime, args.label)
+    print(f"Mengekspor {total_records} record ke {output_path}...")
+    summary = history_export.export_history_zip(
+        output_path, args.start, end_datetime, args.label, manifest_format=args.format,
+        include_images=not args.no_images, batch_size=args.batch_size,
+        progress_callback=lambda done: print(f"  {done}/{total_records} record")
+    )
+    print(
+        f"Selesai: {summary['records']} record, {summary['objects']} objek, {summary['images']} gambar "
+        f"({summary['missing_images']} gambar tidak ditemukan)."
+    )
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="sidetek", description="Perintah utilitas SiDetek-APD.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = subparsers.add_parser(
+        "migrate-images", help="Pindahkan BLOB gambar lama dari database ke image store."
+    )
+    migrate_parser.add_argument("--batch-size", type=int, default=50, help="Jumlah record per transaksi.")
+    migrate_parser.add_argument("--no-vacuum", action="store_true", help="Lewati VACUUM setelah migrasi.")
+    migrate_parser.set_defaults(func=cmd_migrate_images)
+
+    vacuum_parser = subparsers.add_parser(
+        "vacuum", help="Konversi database lama ke auto_vacuum INCREMENTAL (VACUUM penuh satu kali)."
+    )
+    vacuum_parser.set_defaults(func=cmd_vacuum)
+
+    backfill_parser = subparsers.add_parser(
+        "backfill-detections", help="Isi tabel detection_objects dari data deteksi JSON record lama."
+    )
+    backfill_parser.add_argument("--batch-size", type=int, default=500, help="Jumlah record per transaksi.")
+    backfill_parser.set_defaults(func=cmd_backfill_detections)
+
+    rollup_parser = subparsers.add_parser(
+        "rebuild-rollups", help="Hitung ulang tabel rollup kepatuhan dari seluruh riwayat."
+    )
+    rollup_parser.set_defaults(func=cmd_rebuild_rollups)
+
+    export_parser = subparsers.add_parser(
+        "export-model", help="Ekspor bobot .pt ke backend inferensi CPU (ONNX/OpenVINO/int8)."
+    )
+    export_parser.add_argument(
+        "--backend", choices=[b for b in settings.INFERENCE_BACKENDS if b != 'pytorch'], required=True
+    )
+    export_parser.add_argument("--force", action="store_true", help="Ekspor ulang walaupun artefak sudah ada.")
+    export_parser.set_defaults(func=cmd_export_model)
+
+    batch_parser = subparsers.add_parser(
+        "batch", help="Deteksi APD pada direktori gambar/video atau satu file video tanpa UI."
+    )
+    batch_parser.add_argument("source", help="File video/gambar atau direktori (dipindai rekursif).")
+    batch_parser.add_argument("--output", help="Tulis hasil deteksi per frame ke file JSONL ini.")
+    batch_parser.add_argument("--no-db", action="store_true", help="Jangan simpan hasil ke riwayat deteksi.")
+    batch_parser.add_argument("--confidence", type=float, default=0.35, help="Ambang kepercayaan deteksi.")
+    batch_parser.add_argument(
+        "--frame-step", type=int, default=settings.BATCH_VIDEO_FRAME_STEP, help="Deteksi setiap frame ke-N video."
+    )
+    batch_parser.add_argument(
+        "--batch-size", type=int, default=settings.DETECTION_BATCH_SIZE, help="Jumlah frame per batch inferensi."
+    )
+    batch_parser.add_argument(
+        "--progress-file", default=settings.BATCH_PROGRESS_FILE, help="File progres untuk melanjutkan proses."
+    )
+    batch_parser.add_argument("--restart", action="store_true", help="Abaikan progres sebelumnya.")
+    batch_parser.set_defaults(func=cmd_batch)
+
+    multicam_parser = subparsers.add_parser(
+        "multicam", help="Deteksi dari banyak kamera RTSP/file video dengan satu scheduler batch bersama."
+    )
+    multicam_parser.add_argument("sources", nargs="*", help="URL RTSP atau file video (default: SIDETEK_CAMERA_SOURCES).")
+    multicam_parser.add_argument("--confidence", type=float, default=0.35, help="Ambang kepercayaan deteksi.")
+    multicam_parser.add_argument("--duration", type=float, default=0, help="Lama berjalan dalam detik (0 = sampai dihentikan).")
+    multicam_parser.add_argument("--loop", action="store_true", help="Ulangi file video lokal saat selesai.")
+    multicam_parser.add_argument("--max-batch-size", type=int, default=settings.MULTICAM_MAX_BATCH_SIZE)
+    multicam_parser.add_argument("--max-wait-ms", type=float, default=settings.MULTICAM_MAX_WAIT_MS)
+    multicam_parser.add_argument("--report-interval", type=float, default=5, help="Jeda antar laporan statistik (detik).")
+    multicam_parser.set_defaults(func=cmd_multicam)
+
+    serve_parser = subparsers.add_parser(
+        "serve", help="Jalankan layanan HTTP inferensi dengan micro-batching."
+    )
+    serve_parser.add_argument("--host", default=settings.SERVICE_HOST)
+    serve_parser.add_argument("--port", type=int, default=settings.SERVICE_PORT)
+    serve_parser.add_argument("--persist", action="store_true", help="Simpan setiap hasil ke riwayat kecuali save=0.")
+    serve_parser.add_argument("--max-batch-size", type=int, default=settings.SERVICE_MAX_BATCH_SIZE)
+    serve_parser.add_argument("--max-wait-ms", type=float, default=settings.SERVICE_MAX_WAIT_MS)
+    serve_parser.add_argument("--queue-size", type=int, default=settings.SERVICE_QUEUE_SIZE)
+    serve_parser.set_defaults(func=cmd_serve)
+
+    history_parser = subparsers.add_parser(
+        "export-history", help="Ekspor riwayat deteksi ke ZIP berisi gambar dan manifest CSV/Parquet."
+    )
+    history_parser.add_argument("--output", help="File ZIP tujuan (default: exports/riwayat-<waktu>.zip).")
+    history_parser.add_argument("--start", type=_parse_date, help="Tanggal awal (YYYY-MM-DD).")
+    history_parser.add_argument("--end", type=_parse_date, help="Tanggal akhir, inklusif (YYYY-MM-DD).")
+    history_parser.add_argument("--label", action="append", help="Hanya record dengan label ini (boleh diulang).")
+    history_parser.add_argument("--format", choices=settings.EXPORT_MANIFEST_FORMATS, default='csv', help="Format manifest deteksi.")
+    history_parser.add_argument("--no-images", action="store_true", help="Hanya manifest, tanpa file gambar.")
+    history_parser.add_argument("--batch-size", type=int, default=settings.EXPORT_BATCH_SIZE, help="Jumlah record per fetch.")
+    history_parser.set_defaults(func=cmd_export_history)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
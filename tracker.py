@@ -0,0 +1,105 @@
+import numpy as np
+import settings
+
+
+# --- Tracker Objek Ringan Berbasis IoU ---
+class IoUTracker:
+    """Tracker multi-objek sederhana: asosiasi greedy berbasis IoU per label dan prediksi kecepatan konstan.
+
+    update() dipanggil pada frame yang dideteksi, predict() pada frame di antaranya untuk
+    membawa box maju. Setiap track memiliki track_id yang stabil selama objek masih terlihat.
+    """
+
+    def __init__(self, iou_threshold=settings.TRACKER_IOU_THRESHOLD, max_missed=settings.TRACKER_MAX_MISSED):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self._tracks = []
+        self._next_id = 1
+
+    def predict(self):
+        """Memajukan semua track satu frame. Mengembalikan daftar deteksi hasil prediksi."""
+        for track in self._tracks:
+            track['bbox'] = track['bbox'] + track['velocity']
+            track['frames_since_detection'] += 1
+        return self._visible_detections()
+
+    def update(self, detections_data):
+        """Mencocokkan deteksi baru dengan track yang ada. Mengembalikan deteksi beserta track_id."""
+        self.predict()
+        detection_boxes = np.array([det['bbox'] for det in detections_data], dtype=np.float64).reshape(-1, 4)
+
+        # Asosiasi greedy: pasangan dengan IoU tertinggi dicocokkan lebih dulu
+        candidate_pairs = []
+        for track_idx, track in enumerate(self._tracks):
+            ious = box_iou(track['bbox'], detection_boxes)
+            for det_idx, iou in enumerate(ious):
+                if iou >= self.iou_threshold and detections_data[det_idx]['label'] == track['label']:
+                    candidate_pairs.append((iou, track_idx, det_idx))
+        matched_tracks, matched_detections = set(), set()
+        for _, track_idx, det_idx in sorted(candidate_pairs, reverse=True):
+            if track_idx in matched_tracks or det_idx in matched_detections:
+                continue
+            matched_tracks.add(track_idx)
+            matched_detections.add(det_idx)
+            self._refresh_track(self._tracks[track_idx], detections_data[det_idx], detection_boxes[det_idx])
+
+        for track_idx, track in enumerate(self._tracks):
+            if track_idx not in matched_tracks:
+                track['missed'] += 1
+        self._tracks = [track for track in self._tracks if track['missed'] <= self.max_missed]
+
+        for det_idx, det in enumerate(detections_data):
+            if det_idx not in matched_detections:
+                self._tracks.append(self._new_track(det, detection_boxes[det_idx]))
+        return self._visible_detections()
+
+    def _new_track(self, det, bbox):
+        track = {
+            'track_id': self._next_id,
+            'label': det['label'],
+            'confidence': det['confidence'],
+            'bbox': bbox,
+            'velocity': np.zeros(4),
+            'last_detected_bbox': bbox,
+            'frames_since_detection': 0,
+            'missed': 0,
+        }
+        self._next_id += 1
+        return track
+
+    def _refresh_track(self, track, det, bbox):
+        # Kecepatan per frame, dihaluskan agar box tidak bergetar
+        elapsed = max(track['frames_since_detection'], 1)
+        observed_velocity = (bbox - track['last_detected_bbox']) / elapsed
+        track['velocity'] = 0.5 * track['velocity'] + 0.5 * observed_velocity
+        track['bbox'] = bbox
+        track['last_detected_bbox'] = bbox
+        track['confidence'] = det['confidence']
+        track['frames_since_detection'] = 0
+        track['missed'] = 0
+
+    def _visible_detections(self):
+        # Track yang sedang tidak terdeteksi disimpan untuk asosiasi ulang, tapi tidak ditampilkan
+        return [
+            {
+                'label': track['label'],
+                'confidence': track['confidence'],
+                'bbox': [int(coord) for coord in track['bbox']],
+                'track_id': track['track_id'],
+            }
+            for track in self._tracks if track['missed'] == 0
+        ]
+
+
+def box_iou(box, boxes):
+    """IoU antara satu box [x1, y1, x2, y2] dan array box (N, 4)."""
+    if len(boxes) == 0:
+        return np.empty(0)
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return intersection / np.maximum(area + areas - intersection, 1e-9)
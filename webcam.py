@@ -0,0 +1,235 @@
+"""Komponen deteksi realtime via webcam.
+
+Modul ini sengaja dipisah dari app.py agar av dan streamlit_webrtc hanya di-import
+saat halaman webcam dibuka.
+"""
+import math
+import threading
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+import av
+from streamlit_webrtc import VideoTransformerBase
+import settings
+import helper
+import metrics
+import persistence
+from tracker import IoUTracker
+
+
+# --- Worker Inferensi "Frame Terbaru Menang" ---
+class LatestFrameInferenceWorker:
+    """Thread inferensi yang hanya memproses frame terbaru dan membuang frame yang usang."""
+
+    def __init__(self, confidence_threshold=0.35, target_fps=settings.WEBCAM_DEFAULT_TARGET_FPS):
+        self.confidence_threshold = confidence_threshold
+        self.target_fps = target_fps
+        self.processed_count = 0
+        self.dropped_count = 0
+        self._lock = threading.Lock()
+        self._frame_ready = threading.Event()
+        self._stop_event = threading.Event()
+        self._pending_frame = None
+        self._latest_result = None # Tuple (image_bgr, detections)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, image_bgr):
+        """Mengganti frame yang menunggu dengan frame terbaru; frame lama dihitung sebagai drop."""
+        with self._lock:
+            if self._pending_frame is not None:
+                self.dropped_count += 1
+            self._pending_frame = image_bgr
+        self._frame_ready.set()
+
+    def latest_result(self):
+        with self._lock:
+            return self._latest_result
+
+    def stats(self):
+        with self._lock:
+            return {'processed': self.processed_count, 'dropped': self.dropped_count}
+
+    def stop(self):
+        self._stop_event.set()
+        self._frame_ready.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._frame_ready.wait()
+            if self._stop_event.is_set():
+                break
+            with self._lock:
+                image_bgr = self._pending_frame
+                self._pending_frame = None
+                self._frame_ready.clear()
+            if image_bgr is None:
+                continue
+
+            started_at = time.perf_counter()
+            try:
+                # Anotasi dilakukan oleh pemanggil, jadi plotting tidak perlu di sini
+                _, detections = helper.perform_detection_ndarray(image_bgr, self.confidence_threshold, render=False)
+                with self._lock:
+                    self._latest_result = (image_bgr, detections)
+                    self.processed_count += 1
+            except Exception as e:
+                print(f"Error pada LatestFrameInferenceWorker: {e}")
+
+            # Batasi laju inferensi sesuai target FPS
+            min_interval = 1.0 / max(self.target_fps, 1)
+            elapsed = time.perf_counter() - started_at
+            if elapsed < min_interval:
+                self._stop_event.wait(min_interval - elapsed)
+
+
+# --- Kelas VideoTransformer ---
+class APDVideoTransformer(VideoTransformerBase):
+
+    # Modifikasi __init__ untuk menerima controller
+    def __init__(self, controller, model, confidence_threshold=0.35,
+                 processing_mode=settings.WEBCAM_DEFAULT_MODE,
+                 target_fps=settings.WEBCAM_DEFAULT_TARGET_FPS,
+                 detect_interval=None):
+        self.confidence_threshold = confidence_threshold
+        self.model = model
+        self.controller = controller # Simpan instance controller
+        self.processing_mode = processing_mode
+        self.target_fps = target_fps
+        self.worker = None
+        if processing_mode == settings.WEBCAM_MODE_LATEST_FRAME and self.model is not None:
+            self.worker = LatestFrameInferenceWorker(confidence_threshold, target_fps)
+
+        # Mode tracking: detect_interval=None berarti N ditentukan adaptif dari latensi deteksi
+        self.tracker = IoUTracker() if processing_mode == settings.WEBCAM_MODE_TRACKING else None
+        self.detect_interval = detect_interval
+        self._current_interval = detect_interval or 1
+        self._frames_since_detection = self._current_interval
+        self._detected_frames = 0
+        self._tracked_frames = 0
+
+    def update_confidence(self, new_confidence):
+        self.confidence_threshold = new_confidence
+        if self.worker is not None:
+            self.worker.confidence_threshold = new_confidence
+
+    def update_target_fps(self, new_target_fps):
+        self.target_fps = new_target_fps
+        if self.worker is not None:
+            self.worker.target_fps = new_target_fps
+
+    def update_detect_interval(self, new_detect_interval):
+        self.detect_interval = new_detect_interval
+        if new_detect_interval:
+            self._current_interval = new_detect_interval
+
+    def get_stats(self):
+        if self.worker is not None:
+            return self.worker.stats()
+        if self.tracker is not None:
+            return {
+                'detected': self._detected_frames,
+                'tracked': self._tracked_frames,
+                'interval': self._current_interval,
+            }
+        return None
+
+    def on_ended(self):
+        if self.worker is not None:
+            self.worker.stop()
+
+    def _save_frame(self, image_bgr, annotated_bgr, detections):
+        frame_name = f"Webcam Capture {datetime.now(ZoneInfo('Asia/Jakarta')).strftime('%Y-%m-%d %H_%M_%S')}.png"
+
+        # Encoding dan commit dikerjakan antrian write-behind agar stream tidak tertahan
+        with metrics.timed('webcam.save_submit'):
+            persistence.get_write_behind_queue().submit(
+                original_image_name=frame_name,
+                original_image=image_bgr,
+                detected_image=annotated_bgr,
+                detections_data_list=detections,
+                result_queue=self.controller.result_queue
+            )
+
+    def recv(self, frame: av.VideoFrame) -> av.VideoFrame:
+        with metrics.PROFILER.frame(), metrics.timed('webcam.frame'):
+            return self._process_frame(frame)
+
+    def _to_video_frame(self, annotated_bgr):
+        with metrics.timed('webcam.from_ndarray'):
+            return av.VideoFrame.from_ndarray(annotated_bgr, format="bgr24")
+
+    def _process_frame(self, frame):
+        with metrics.timed('webcam.to_ndarray'):
+            image_np_bgr = frame.to_ndarray(format="bgr24")
+
+        if self.model is None:
+            return frame
+
+        try:
+            if self.worker is not None:
+                # Worker butuh salinan bersih karena buffer ini akan dianotasi in-place
+                self.worker.submit(image_np_bgr.copy())
+                latest = self.worker.latest_result()
+                if latest is None:
+                    return frame
+
+                latest_image_bgr, detections = latest
+                if self.controller.check_and_reset_request():
+                    latest_annotated_bgr = helper.draw_detections_ndarray(latest_image_bgr.copy(), detections)
+                    self._save_frame(latest_image_bgr, latest_annotated_bgr, detections)
+
+                # Gambar box terakhir di atas frame saat ini agar tampilan tetap live
+                annotated_bgr = helper.draw_detections_ndarray(image_np_bgr, detections)
+                return self._to_video_frame(annotated_bgr)
+
+            if self.tracker is not None:
+                return self._recv_tracking(image_np_bgr)
+
+            # Salinan frame asli hanya dibuat jika ada permintaan simpan
+            save_requested = self.controller.check_and_reset_request()
+            original_bgr = image_np_bgr.copy() if save_requested else None
+
+            annotated_bgr, detections = helper.perform_detection_ndarray(
+                image_np_bgr,
+                self.confidence_threshold
+            )
+
+            if save_requested:
+                self._save_frame(original_bgr, annotated_bgr, detections)
+
+            return self._to_video_frame(annotated_bgr)
+
+        except Exception as e:
+            print(f"Error processing webcam frame in APDVideoTransformer.recv: {e}")
+            return frame
+
+    def _recv_tracking(self, image_np_bgr):
+        """Deteksi penuh tiap N frame; frame di antaranya memakai posisi prediksi tracker."""
+        if self._frames_since_detection >= self._current_interval:
+            started_at = time.perf_counter()
+            _, detections = helper.perform_detection_ndarray(image_np_bgr, self.confidence_threshold, render=False)
+            detection_seconds = time.perf_counter() - started_at
+            with metrics.timed('webcam.tracker'):
+                tracked_detections = self.tracker.update(detections)
+            self._frames_since_detection = 0
+            self._detected_frames += 1
+            if not self.detect_interval:
+                # N adaptif: berapa frame yang lewat selama satu deteksi pada target FPS
+                self._current_interval = min(
+                    max(math.ceil(detection_seconds * self.target_fps), 1),
+                    settings.WEBCAM_MAX_DETECT_INTERVAL
+                )
+        else:
+            with metrics.timed('webcam.tracker'):
+                tracked_detections = self.tracker.predict()
+            self._tracked_frames += 1
+        self._frames_since_detection += 1
+
+        # Deteksi yang disimpan membawa track_id sehingga identitas tiap pekerja ikut tercatat
+        save_requested = self.controller.check_and_reset_request()
+        original_bgr = image_np_bgr.copy() if save_requested else None
+        annotated_bgr = helper.draw_detections_ndarray(image_np_bgr, tracked_detections)
+        if save_requested:
+            self._save_frame(original_bgr, annotated_bgr, tracked_detections)
+        return self._to_video_frame(annotated_bgr)